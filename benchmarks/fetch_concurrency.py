@@ -0,0 +1,56 @@
+"""
+Benchmarks sequential vs concurrent comment fetching against the local stand-in API.
+
+Run from the repository root:
+
+    python -m benchmarks.fetch_concurrency --videos 50 --comments 300 --workers 1 4 8 16
+"""
+
+import argparse
+import tempfile
+import time
+
+from youtube_analytics.data import channel_data
+from youtube_analytics.data.client import configure_client_pool
+from youtube_analytics.data.stand_in_api import serve
+from youtube_analytics.data.synthetic import SyntheticDataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--comments", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--rps", type=float, default=None, help="Shared rate limit (requests/second)")
+    args = parser.parse_args()
+
+    dataset = SyntheticDataset.generate(1, num_videos=args.videos, max_comments=args.comments, min_comments=args.comments)
+    server, url = serve(dataset, latency=args.latency, jitter=args.jitter, error_rates={429: args.error_rate})
+
+    baseline = None
+    print(f"{'workers':>8} {'seconds':>10} {'speedup':>8}")
+    for workers in args.workers:
+        pool = configure_client_pool(api_endpoint=url, size=workers)
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            channel_data.fetch_channel_data(
+                "stand_in",
+                num_videos=args.videos,
+                num_comments=args.comments,
+                data_dir=tmp,
+                max_workers=workers,
+                requests_per_second=args.rps,
+            )
+            elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>10.2f} {baseline / elapsed:>7.1f}x")
+        pool.report()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
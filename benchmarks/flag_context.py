@@ -0,0 +1,104 @@
+"""
+Tokens and time saved by encoding each video's title/description context once
+for the comment-flag classifier (comment_flags.encode_flag_inputs), against
+tokenizing "Title: ...\nDescription: ...\nComment: ..." for every comment. Uses
+one synthetic video with --comments comments and a description of about
+--description-chars characters (the classifier trims descriptions to 500).
+Needs transformers and the fine-tuned model's tokenizer (--model-dir, or the
+base model's with --tokenizer); inference is timed too when the model is there.
+
+Run from the repository root:
+
+    python -m benchmarks.flag_context --comments 1000
+"""
+
+import argparse
+import os
+import time
+
+from youtube_analytics.data.synthetic import TOPICS, SyntheticChannel
+from youtube_analytics.nlp.comment_flags import (
+    MAX_LENGTH,
+    MODEL_DIR,
+    TOKEN_BUDGET,
+    encode_flag_inputs,
+    flag_context,
+    load_flag_model,
+)
+from youtube_analytics.nlp.sentiment import token_batches
+
+
+def _infer(tokenizer, model, device, input_ids, batch_size, token_budget):
+    import torch
+
+    for batch in token_batches([len(ids) for ids in input_ids], token_budget, batch_size):
+        inputs = tokenizer.pad([{"input_ids": input_ids[i]} for i in batch], return_tensors="pt").to(device)
+        with torch.no_grad():
+            model(**inputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--comments", type=int, default=1000)
+    parser.add_argument("--description-chars", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--tokenizer", default="jhu-clsp/mmBERT-base", help="Used when --model-dir does not exist")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    channel = SyntheticChannel(seed=args.seed, num_videos=1, max_comments=args.comments)
+    video = channel.video(0)
+    description = video["description"]
+    words = iter(TOPICS * (args.description_chars // 4 + 1))
+    while len(description) < args.description_chars:
+        description += " " + next(words)
+    context = flag_context(video["title"], description)
+    comments = [c["comment"] for c in channel.iter_comments(0)]
+    pairs = [(context, comment) for comment in comments]
+
+    model = None
+    if os.path.isdir(args.model_dir):
+        tokenizer, model, device = load_flag_model(args.model_dir)
+    else:
+        from transformers import AutoTokenizer
+
+        print(f"No model at {args.model_dir}, timing tokenization only")
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+
+    # Per comment: the whole input string, as fine_tuning.py used to tokenize it
+    start = time.perf_counter()
+    full = tokenizer([f"{c} {comment}" for c, comment in pairs], truncation=True, max_length=MAX_LENGTH)["input_ids"]
+    full_seconds = time.perf_counter() - start
+    full_tokens = sum(len(ids) for ids in full) - len(full) * tokenizer.num_special_tokens_to_add()
+
+    start = time.perf_counter()
+    shared, stats = encode_flag_inputs(tokenizer, pairs)
+    shared_seconds = time.perf_counter() - start
+    differ = sum(a != b for a, b in zip(full, shared))
+
+    print(f"1 video, {len(pairs)} comments, {len(set(comments))} distinct, context of {len(context)} characters")
+    print(f"{'encoding':<16} {'tokens tokenized':>17} {'tokenize s':>11}")
+    print(f"{'per comment':<16} {full_tokens:>17} {full_seconds:>11.3f}")
+    print(f"{'shared context':<16} {stats['tokenized']:>17} {shared_seconds:>11.3f}")
+    print(
+        f"saved {1 - stats['tokenized'] / full_tokens:.0%} of tokens and {full_seconds - shared_seconds:.3f}s; "
+        f"{differ} of {len(pairs)} inputs differ from per-comment tokenization"
+    )
+
+    if model is not None:
+        # Identical comments are scored once by predict_flags
+        first = {}
+        for i, comment in enumerate(comments):
+            first.setdefault(comment, i)
+        unique = list(first.values())
+        for name, input_ids in [("per comment", full), ("shared + dedup", [shared[i] for i in unique])]:
+            start = time.perf_counter()
+            _infer(tokenizer, model, device, input_ids, args.batch_size, args.token_budget)
+            seconds = time.perf_counter() - start
+            print(f"{name:<16} inference {seconds:.2f}s ({len(pairs) / seconds:.1f} comments/s)")
+
+
+if __name__ == "__main__":
+    main()
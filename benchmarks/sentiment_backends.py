@@ -0,0 +1,143 @@
+"""
+Compares the sentiment inference backends on the CPU: PyTorch, the exported
+float ONNX model and the INT8-quantized one (nlp/sentiment_onnx.py). Reports
+load time, single-comment latency, throughput over a sample of comments, peak
+RSS and agreement with the PyTorch scores. Needs torch, onnxruntime and an
+exported model (python -m youtube_analytics.nlp.sentiment_onnx export).
+
+Each backend runs in a fresh process, so peaks do not carry over. Run from the
+repository root:
+
+    python -m benchmarks.sentiment_backends --data-root data --sample 2000 --threads 4
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from youtube_analytics.nlp.sentiment import LABEL_MAPPING, load_sentiment_model, predict_sentiment
+from youtube_analytics.nlp.sentiment_onnx import ONNX_DIR, load_onnx_model, sample_comments
+
+BACKENDS = {
+    "torch": "PyTorch, float32",
+    "onnx": "ONNX Runtime, float32",
+    "onnx-int8": "ONNX Runtime, dynamic INT8",
+}
+
+
+def _load(backend, model_dir, threads):
+    if backend == "torch":
+        if threads:
+            import torch
+
+            torch.set_num_threads(threads)
+        return load_sentiment_model()
+    return load_onnx_model(model_dir, quantized=backend == "onnx-int8", threads=threads)
+
+
+def _child(backend, texts_path, out_path, model_dir, threads, batch_size, latency_samples):
+    with open(texts_path, encoding="utf-8") as f:
+        texts = json.load(f)
+    # ru_maxrss is in KiB on Linux
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    tokenizer, model, device = _load(backend, model_dir, threads)
+    load_seconds = time.perf_counter() - start
+
+    # warm-up, so one-time initialization is not timed
+    predict_sentiment(texts[:batch_size], tokenizer, model, device, batch_size)
+
+    latencies = []
+    for text in texts[:latency_samples]:
+        start = time.perf_counter()
+        predict_sentiment([text], tokenizer, model, device, batch_size)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    start = time.perf_counter()
+    scores = predict_sentiment(texts, tokenizer, model, device, batch_size)
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "load": load_seconds,
+                "p50": latencies[len(latencies) // 2],
+                "p95": latencies[int(len(latencies) * 0.95)],
+                "throughput": len(texts) / seconds,
+                "rss": peak / 1024,
+                "model_rss": (peak - before) / 1024,
+                "scores": scores,
+            },
+            f,
+        )
+
+
+def _agreement(reference, scores):
+    """(share with the same top label, mean absolute probability difference)"""
+    labels = list(LABEL_MAPPING.values())
+    same = sum(max(a, key=a.get) == max(b, key=b.get) for a, b in zip(reference, scores))
+    diffs = [abs(a[label] - b[label]) for a, b in zip(reference, scores) for label in labels]
+    return same / max(len(scores), 1), sum(diffs) / max(len(diffs), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data-root", default="data", help="Where to sample comments from (synthetic if empty)")
+    parser.add_argument("--sample", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--model-dir", default=ONNX_DIR)
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads per backend (0: library default)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--latency-samples", type=int, default=100)
+    parser.add_argument("--child", nargs=3, metavar=("BACKEND", "TEXTS", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child, args.model_dir, args.threads, args.batch_size, args.latency_samples)
+        return
+
+    texts = sample_comments(args.data_root, args.sample, args.seed)
+    print(f"{len(texts)} comments, batch size {args.batch_size}, threads {args.threads or 'default'}")
+    print(
+        f"{'backend':<10} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'comments/s':>11}"
+        f" {'peak MB':>8} {'model MB':>9} {'same label':>11} {'mean |dp|':>10}"
+    )
+    reference = None
+    with tempfile.TemporaryDirectory() as tmp:
+        texts_path = os.path.join(tmp, "texts.json")
+        with open(texts_path, "w", encoding="utf-8") as f:
+            json.dump(texts, f)
+        for backend in args.backends:
+            out_path = os.path.join(tmp, f"{backend}.json")
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.sentiment_backends", "--child", backend, texts_path, out_path]
+                + ["--model-dir", args.model_dir, "--threads", str(args.threads)]
+                + ["--batch-size", str(args.batch_size), "--latency-samples", str(args.latency_samples)],
+                capture_output=True,
+                text=True,
+            )
+            if out.returncode != 0:
+                print(f"{backend:<10} failed: {out.stderr.strip().splitlines()[-1:]}")
+                continue
+            with open(out_path, encoding="utf-8") as f:
+                result = json.load(f)
+            if backend == "torch":
+                reference = result["scores"]
+            same, diff = _agreement(reference, result["scores"]) if reference else (None, None)
+            agreement = f"{same:>11.2%} {diff:>10.4f}" if reference else f"{'-':>11} {'-':>10}"
+            print(
+                f"{backend:<10} {result['load']:>7.1f} {result['p50'] * 1000:>7.1f} {result['p95'] * 1000:>7.1f}"
+                f" {result['throughput']:>11.1f} {result['rss']:>8.0f} {result['model_rss']:>9.0f} {agreement}"
+            )
+
+
+if __name__ == "__main__":
+    main()
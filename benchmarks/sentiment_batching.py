@@ -0,0 +1,103 @@
+"""
+Compares sentiment inference throughput of the old per-video loop (fixed-size
+batches in file order) with cross-video pooling and length-bucketed batches
+(nlp/sentiment.py), on synthetic comments. Needs torch and the sentiment model.
+
+Run from the repository root:
+
+    python -m benchmarks.sentiment_batching --channels 2 --videos 40 --max-comments 400 --long-rate 0.03
+"""
+
+import argparse
+import random
+import time
+
+from youtube_analytics.data.synthetic import SyntheticDataset
+from youtube_analytics.nlp.sentiment import (
+    MAX_LENGTH,
+    POOL_SIZE,
+    TOKEN_BUDGET,
+    load_sentiment_model,
+    predict_sentiment,
+    token_batches,
+)
+
+
+def _videos(args):
+    """Comment texts per video; `long_rate` of them are made several paragraphs long."""
+    rng = random.Random(args.seed)
+    dataset = SyntheticDataset.generate(
+        args.channels, seed=args.seed, num_videos=args.videos, max_comments=args.max_comments, skew=args.skew
+    )
+    videos = []
+    for channel in dataset.channels:
+        for i in range(channel.num_videos):
+            texts = [c["comment"] for c in channel.iter_comments(i)]
+            videos.append([" ".join([t] * rng.randint(10, 60)) if rng.random() < args.long_rate else t for t in texts])
+    return videos
+
+
+def _padding(videos, tokenizer, batch_size, token_budget):
+    """Share of real (non-padding) tokens in the batches each mode builds."""
+    per_video = pooled = real = 0
+    all_lengths = []
+    for texts in videos:
+        lengths = [len(ids) for ids in tokenizer(texts, truncation=True, max_length=MAX_LENGTH)["input_ids"]]
+        all_lengths.extend(lengths)
+        real += sum(lengths)
+        for i in range(0, len(lengths), batch_size):
+            per_video += max(lengths[i : i + batch_size]) * len(lengths[i : i + batch_size])
+    for start in range(0, len(all_lengths), POOL_SIZE):
+        lengths = all_lengths[start : start + POOL_SIZE]
+        for batch in token_batches(lengths, token_budget, batch_size):
+            pooled += max(lengths[i] for i in batch) * len(batch)
+    return real / max(per_video, 1), real / max(pooled, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--videos", type=int, default=40)
+    parser.add_argument("--max-comments", type=int, default=400)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--long-rate", type=float, default=0.03, help="Fraction of comments made long")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    videos = _videos(args)
+    n = sum(len(texts) for texts in videos)
+    tokenizer, model, device = load_sentiment_model()
+    print(f"{len(videos)} videos, {n} comments, device {device}")
+
+    eff_per_video, eff_pooled = _padding(videos, tokenizer, args.batch_size, args.token_budget)
+
+    # warm-up, so one-time initialization is not timed
+    predict_sentiment([t for texts in videos[:2] for t in texts][:64], tokenizer, model, device, args.batch_size)
+
+    start = time.perf_counter()
+    per_video = [
+        predict_sentiment(texts, tokenizer, model, device, args.batch_size, token_budget=None) for texts in videos
+    ]
+    per_video_seconds = time.perf_counter() - start
+
+    texts = [t for video_texts in videos for t in video_texts]
+    start = time.perf_counter()
+    pooled = []
+    for i in range(0, len(texts), POOL_SIZE):
+        pooled.extend(
+            predict_sentiment(texts[i : i + POOL_SIZE], tokenizer, model, device, args.batch_size, args.token_budget)
+        )
+    pooled_seconds = time.perf_counter() - start
+
+    flat = [s for video in per_video for s in video]
+    differing = sum(a != b for a, b in zip(flat, pooled))
+    print(f"{'mode':<22} {'comments/s':>11} {'seconds':>8} {'real tokens':>12}")
+    print(f"{'per-video, fixed':<22} {n / per_video_seconds:>11.1f} {per_video_seconds:>8.1f} {eff_per_video:>12.1%}")
+    print(f"{'pooled, bucketed':<22} {n / pooled_seconds:>11.1f} {pooled_seconds:>8.1f} {eff_pooled:>12.1%}")
+    print(f"speedup {per_video_seconds / pooled_seconds:.2f}x, {differing} of {n} scores differ in the 2nd decimal")
+
+
+if __name__ == "__main__":
+    main()
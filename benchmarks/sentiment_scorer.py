@@ -0,0 +1,53 @@
+"""
+Throughput of the in-process sentiment scorer (SentimentScorer.iter_scores over
+a comment stream) against analyze_channel_sentiment on the same comments written
+to a data directory, to separate inference from file reading and sidecar
+writes. Needs torch and the sentiment model (or --backend onnx).
+
+Run from the repository root:
+
+    python -m benchmarks.sentiment_scorer --videos 20 --max-comments 500
+"""
+
+import argparse
+import tempfile
+import time
+
+from youtube_analytics.data.synthetic import SyntheticChannel, write_channel
+from youtube_analytics.nlp.sentiment import BACKENDS, SentimentScorer, analyze_channel_sentiment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--max-comments", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    args = parser.parse_args()
+
+    channel = SyntheticChannel(seed=args.seed, num_videos=args.videos, max_comments=args.max_comments)
+    stream = lambda: (c for i in range(channel.num_videos) for c in channel.iter_comments(i))
+    n = sum(1 for _ in stream())
+
+    # No score cache, so both paths run the model on every comment; both times
+    # include loading the model
+    start = time.perf_counter()
+    with SentimentScorer(backend=args.backend) as scorer:
+        for _ in scorer.iter_scores(stream()):
+            pass
+    scorer_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as data_root:
+        write_channel(channel, data_root)
+        start = time.perf_counter()
+        analyze_channel_sentiment(channel.channel_id, data_root, backend=args.backend, cache_dir=None)
+        channel_seconds = time.perf_counter() - start
+
+    print(f"{n} comments in {channel.num_videos} videos, times include the model load")
+    print(f"{'path':<28} {'comments/s':>11} {'seconds':>8}")
+    print(f"{'SentimentScorer.iter_scores':<28} {n / scorer_seconds:>11.1f} {scorer_seconds:>8.2f}")
+    print(f"{'analyze_channel_sentiment':<28} {n / channel_seconds:>11.1f} {channel_seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Scaling of multi-process sentiment inference (nlp/sentiment_workers.py) with
+the number of worker processes, against one process with default threading.
+Needs torch and the sentiment model (or an exported ONNX model with --backend onnx).
+
+Run from the repository root:
+
+    python -m benchmarks.sentiment_workers --workers 1 2 4 8 16 --sample 8000
+"""
+
+import argparse
+import functools
+import os
+import time
+
+from youtube_analytics.nlp.sentiment import BACKENDS, POOL_SIZE, TOKEN_BUDGET, load_sentiment_model, predict_sentiment
+from youtube_analytics.nlp.sentiment_onnx import sample_comments
+from youtube_analytics.nlp.sentiment_workers import ShardedPredictor, default_threads
+
+
+def _score(predict, texts):
+    """Scores `texts` in POOL_SIZE pools, as analyze_channel_sentiment does."""
+    results = []
+    for start in range(0, len(texts), POOL_SIZE):
+        results.extend(predict(texts[start : start + POOL_SIZE]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--threads", type=int, default=0, help="Threads per worker (0: cores / workers)")
+    parser.add_argument("--data-root", default="data", help="Where to sample comments from (synthetic if empty)")
+    parser.add_argument("--sample", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    parser.add_argument("--backend", choices=BACKENDS, default="torch")
+    args = parser.parse_args()
+
+    texts = sample_comments(args.data_root, args.sample, args.seed)
+    cores = os.cpu_count() or 1
+    print(f"{len(texts)} comments, {cores} cores, backend {args.backend}")
+
+    start = time.perf_counter()
+    tokenizer, model, device = load_sentiment_model(args.backend)
+    startup = time.perf_counter() - start
+    predict = functools.partial(
+        predict_sentiment, tokenizer=tokenizer, model=model, device=device, batch_size=args.batch_size, token_budget=args.token_budget
+    )
+    predict(texts[: args.batch_size])  # warm-up
+    start = time.perf_counter()
+    reference = _score(predict, texts)
+    base_seconds = time.perf_counter() - start
+    # Free the parent's copy of the model before the workers load theirs
+    del predict, model
+
+    print(
+        f"{'workers':>7} {'threads':>7} {'startup s':>9} {'comments/s':>11} {'speedup':>8} {'efficiency':>10} {'differ':>7}"
+    )
+    print(
+        f"{'1 proc':>7} {'default':>7} {startup:>9.1f} {len(texts) / base_seconds:>11.1f} {1.0:>7.2f}x {'-':>10} {0:>7}"
+    )
+    for workers in args.workers:
+        if workers > cores:
+            print(f"{workers:>7} skipped, more workers than cores")
+            continue
+        threads = args.threads or default_threads(workers)
+        start = time.perf_counter()
+        predictor = ShardedPredictor(workers, threads, args.batch_size, args.token_budget, args.backend)
+        startup = time.perf_counter() - start
+        try:
+            predictor(texts[: workers * args.batch_size])  # warm-up
+            start = time.perf_counter()
+            results = _score(predictor, texts)
+            seconds = time.perf_counter() - start
+        finally:
+            predictor.close()
+        speedup = base_seconds / seconds
+        differ = sum(a != b for a, b in zip(reference, results))
+        print(
+            f"{workers:>7} {threads:>7} {startup:>9.1f} {len(texts) / seconds:>11.1f} {speedup:>7.2f}x"
+            f" {speedup / workers:>10.0%} {differ:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compares file size and dump/load time of the data file encodings (video_io.py)
+on a large synthetic channel.
+
+Run from the repository root:
+
+    python -m benchmarks.serialization --videos 20 --max-comments 20000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from youtube_analytics.data import video_io
+from youtube_analytics.data.synthetic import SyntheticChannel
+
+# (label, format, compression, backend)
+VARIANTS = [
+    ("pretty, json", "pretty", "", "json"),
+    ("compact, json", "compact", "", "json"),
+    ("compact, orjson", "compact", "", "orjson"),
+    ("compact, orjson, gz", "compact", "gz", "orjson"),
+    ("compact, orjson, zst", "compact", "zst", "orjson"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--max-comments", type=int, default=20000)
+    parser.add_argument("--min-comments", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3, help="Loads per file, the best time is kept")
+    args = parser.parse_args()
+
+    channel = SyntheticChannel(num_videos=args.videos, max_comments=args.max_comments, min_comments=args.min_comments, skew=0.5)
+    videos = {
+        vid: (channel.video(i), list(channel.iter_comments(i)))
+        for i, vid in enumerate(channel.video_ids)
+    }
+    print(f"{args.videos} videos, {sum(len(c) for _, c in videos.values())} comments")
+    print(f"{'encoding':<22} {'MB':>8} {'dump s':>8} {'load s':>8}")
+
+    for label, fmt, compression, backend in VARIANTS:
+        if (backend == "orjson" and video_io.orjson is None) or (compression == "zst" and video_io.zstandard is None):
+            print(f"{label:<22} {'(not installed)':>26}")
+            continue
+        video_io.configure(format=fmt, compression=compression, backend=backend)
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            for vid, (metadata, comments) in videos.items():
+                video_io.write_video_file(tmp, vid, metadata, comments)
+            dump_seconds = time.perf_counter() - start
+
+            size = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+            load_seconds = min(
+                _timed(lambda: [video_io.read_json(tmp, vid) for vid in videos]) for _ in range(args.repeat)
+            )
+        print(f"{label:<22} {size / 1e6:>8.1f} {dump_seconds:>8.2f} {load_seconds:>8.2f}")
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
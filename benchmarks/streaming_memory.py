@@ -0,0 +1,121 @@
+"""
+Measures peak RSS of reading and analyzing one very large video file, whole vs
+streamed (video_io.iter_video_file / annotations.iter_video).
+
+Each mode runs in a fresh process, so peaks do not carry over. Run from the
+repository root:
+
+    python -m benchmarks.streaming_memory --comments 100000 400000
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from youtube_analytics.data.annotations import commit, iter_video, load_video
+from youtube_analytics.data.synthetic import SyntheticChannel, write_channel
+from youtube_analytics.data.video_io import read_json
+
+MODES = {
+    "read_json": "whole raw file",
+    "load_video": "whole merged view",
+    "iter_video": "streamed merged view",
+    "weighted (whole)": "load_video + compute_video_weighted_metrics",
+    "weighted": "calculate_weighted_metrics, streamed",
+    "sentiment": "analyze_channel_sentiment, streamed (needs torch)",
+}
+
+
+def _run_mode(mode, channel_id, data_root, video_id):
+    channel_dir = os.path.join(data_root, channel_id)
+    if mode == "read_json":
+        read_json(channel_dir, video_id)
+    elif mode == "load_video":
+        load_video(channel_dir, video_id)
+    elif mode == "iter_video":
+        _, comments = iter_video(channel_dir, video_id)
+        for _ in comments:
+            pass
+    elif mode == "weighted (whole)":
+        from youtube_analytics.analytics.weighted_metrics import compute_video_weighted_metrics
+
+        compute_video_weighted_metrics(load_video(channel_dir, video_id)["comments"], 1.0, 1.5)
+    elif mode == "weighted":
+        from youtube_analytics.analytics.weighted_metrics import calculate_weighted_metrics
+
+        calculate_weighted_metrics(channel_id, data_root, force=True)
+    elif mode == "sentiment":
+        from youtube_analytics.nlp.sentiment import analyze_channel_sentiment
+
+        analyze_channel_sentiment(channel_id, data_root, force=True)
+
+
+def _child(mode, channel_id, data_root, video_id):
+    # ru_maxrss is in KiB on Linux
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    _run_mode(mode, channel_id, data_root, video_id)
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"RESULT {before} {peak} {seconds}")
+
+
+def _prepare(num_comments, data_root):
+    """One channel with one video of `num_comments` comments, plus their sentiment."""
+    channel = SyntheticChannel(num_videos=1, max_comments=num_comments, min_comments=num_comments)
+    channel_dir = write_channel(channel, data_root)
+    video_id = channel.video_ids[0]
+    chunk = {}
+    for comment in channel.iter_comments(0):
+        p = (hash(comment["comment"]) % 100) / 100
+        chunk[comment["comment_id"]] = {
+            "sentiment": {"Negative": round(1 - p, 2), "Neutral": 0.0, "Positive": round(p, 2)}
+        }
+        if len(chunk) == 10000:
+            commit(channel_dir, "sentiment", video_id, comments=chunk)
+            chunk = {}
+    if chunk:
+        commit(channel_dir, "sentiment", video_id, comments=chunk)
+    return channel.channel_id, video_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--comments", type=int, nargs="+", default=[100000, 400000])
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=[m for m in MODES if m != "sentiment"])
+    parser.add_argument("--child", nargs=4, metavar=("MODE", "CHANNEL_ID", "DATA_ROOT", "VIDEO_ID"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    print(f"{'comments':>9} {'mode':<18} {'file MB':>8} {'peak MB':>8} {'+MB':>7} {'s':>7}")
+    for num_comments in args.comments:
+        with tempfile.TemporaryDirectory() as data_root:
+            channel_id, video_id = _prepare(num_comments, data_root)
+            channel_dir = os.path.join(data_root, channel_id)
+            size = sum(os.path.getsize(os.path.join(channel_dir, f)) for f in os.listdir(channel_dir) if f.startswith(video_id))
+            for mode in args.modes:
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.streaming_memory", "--child", mode, channel_id, data_root, video_id],
+                    capture_output=True,
+                    text=True,
+                )
+                result = [line for line in out.stdout.splitlines() if line.startswith("RESULT ")]
+                if not result:
+                    print(f"{num_comments:>9} {mode:<18} failed: {out.stderr.strip().splitlines()[-1:]}")
+                    continue
+                before, peak, seconds = result[0].split()[1:]
+                print(
+                    f"{num_comments:>9} {mode:<18} {size / 1e6:>8.1f} {int(peak) / 1024:>8.0f}"
+                    f" {(int(peak) - int(before)) / 1024:>7.0f} {float(seconds):>7.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ import asyncio
 import re
 from openai import AsyncOpenAI
 
+from youtube_analytics.nlp.comment_flags import flag_context
+
 # The 5 Actionable Creator Categories we defined earlier
 FLAGS = ["is_request", "is_question", "is_highlight", "is_feedback", "is_spam"]
 
@@ -53,8 +55,11 @@ def parse_reasoning_output(raw_output: str) -> dict:
         
     return None
 
-async def label_comment(client: AsyncOpenAI, model: str, title: str, desc: str, comment: str, semaphore: asyncio.Semaphore):
-    user_prompt = f"Title: {title}\nDescription: {desc}\nComment: {comment}"
+async def label_comment(client: AsyncOpenAI, model: str, context: str, comment: str, semaphore: asyncio.Semaphore):
+    # `context` (title + trimmed description) is the same for every comment of a
+    # video, so consecutive prompts share their prefix up to the comment and the
+    # server's prompt cache can reuse it
+    user_prompt = f"{context} {comment}"
     
     async with semaphore:
         try:
@@ -110,11 +115,11 @@ async def main():
         # if count == 5:
         #     break
         print(f"Processing video: {video['title']}")
+        # Built once per video
+        context = flag_context(video['title'], video["description"])
         tasks = []
         for comment in video['comments']:
-            description = video["description"]
-            description_trimmed = description[:500] + "..." if len(description) > 500 else description
-            tasks.append(label_comment(client, model_name, video['title'], description_trimmed, comment, semaphore))
+            tasks.append(label_comment(client, model_name, context, comment, semaphore))
             
         results = await asyncio.gather(*tasks)
         
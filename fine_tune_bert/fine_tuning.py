@@ -11,6 +11,8 @@ from sklearn.metrics import f1_score, roc_auc_score
 import json
 from transformers import EarlyStoppingCallback
 
+from youtube_analytics.nlp.comment_flags import calibrate_thresholds, encode_flag_inputs, flag_context, save_thresholds
+
 # 1. Load Data
 # Assuming `raw_data` is the JSON list you provided
 with open("classification_data/labeled_dataset.json", "r", encoding="utf-8") as f:
@@ -39,21 +41,15 @@ except:
 
 # 3. Preprocessing
 def preprocess_function(examples):
-    # Combine title and comment to give the model maximum context
-    description = examples["video_description"]
-    decription_trimmed = description if len(description) < 500 else description[:500] + "..."
-    texts = [f"Title: {t}\nDescription: {d}\nComment: {c}" for t, d, c in zip(examples["video_title"], decription_trimmed, examples["comment"])]
-    
-    # Tokenize texts
-    tokenized = tokenizer(
-        texts, 
-        padding="max_length", 
-        truncation=True, 
-        max_length=2048
-    )
+    # Combine title and comment to give the model maximum context. The
+    # title/description part is the same for every comment of a video, so it is
+    # tokenized once per video and its token IDs reused (as at inference)
+    pairs = [(flag_context(t, d), c) for t, d, c in zip(examples["video_title"], examples["video_description"], examples["comment"])]
+    input_ids, _ = encode_flag_inputs(tokenizer, pairs, max_length=2048)
+    tokenized = tokenizer.pad({"input_ids": input_ids}, padding="max_length", max_length=2048)
     
     # Multi-label classification requires labels to be formatted as a float array
-    labels_matrix = np.zeros((len(texts), len(LABELS)), dtype=np.float32)
+    labels_matrix = np.zeros((len(pairs), len(LABELS)), dtype=np.float32)
     for i, label in enumerate(LABELS):
         labels_matrix[:, i] = examples[label]
         
@@ -74,8 +70,8 @@ def compute_metrics(eval_preds):
     # Apply sigmoid to convert raw logits to probabilities
     probs = 1 / (1 + np.exp(-logits))
     
-    # Using a flat 0.5 threshold for training evaluation. 
-    # (In production, you should calibrate this threshold per class)
+    # Using a flat 0.5 threshold for training evaluation; per-class thresholds
+    # are calibrated on the eval split once training is done
     predictions = (probs > 0.5).astype(int)
     
     macro_f1 = f1_score(labels, predictions, average="macro")
@@ -126,4 +122,12 @@ if __name__ == "__main__":
     # Save the final model and tokenizer
     trainer.save_model("./modernbert-youtube-comments-final")
     tokenizer.save_pretrained("./modernbert-youtube-comments-final")
-    print("Training complete! Model saved.")
\ No newline at end of file
+
+    # Per-class thresholds with the best F1 on the eval split, used by
+    # youtube_analytics.nlp.comment_flags instead of a flat 0.5
+    eval_preds = trainer.predict(eval_dataset)
+    probs = 1 / (1 + np.exp(-eval_preds.predictions))
+    thresholds = calibrate_thresholds(probs.tolist(), eval_preds.label_ids.tolist())
+    save_thresholds(thresholds, "./modernbert-youtube-comments-final")
+    print("Training complete! Model saved.")
+    print("Calibrated thresholds: " + ", ".join(f"{f} {t:.2f}" for f, t in thresholds.items()))
\ No newline at end of file
@@ -2,8 +2,8 @@ import os
 import json
 import random
 import re
-from googleapiclient.discovery import build
-from config import API_KEY
+from youtube_analytics.data.client import get_client_pool
+from youtube_analytics.data.quota import QuotaExhausted
 
 VIDEOS_PER_QUERY = 3
 COMMENTS_PER_VIDEO = 10
@@ -44,31 +44,33 @@ def format_duration(iso_duration: str) -> int:
         total_seconds = (days * 86400) + (hours * 3600) + (minutes * 60) + seconds
     return total_seconds
 
-def get_random_videos(youtube, query, max_results):
+def get_random_videos(pool, query, max_results):
     """Searches YouTube for a query and returns video IDs."""
     print(f"Searching for: {query}")
     try:
         # We use videoCategoryId="10" (Music) or just broad search to get random stuff
         # Using type="video" is required
-        request = youtube.search().list(
+        request = pool.service.search().list(
             part="snippet",
             q=query,
             type="video",
             maxResults=max_results,
             order="relevance" # 'date' or 'rating' also work for OOD
         )
-        response = request.execute()
+        response = pool.execute(request)
         return [item["id"]["videoId"] for item in response.get("items", [])]
+    except QuotaExhausted:
+        raise
     except Exception as e:
         print(f"Error searching for {query}: {e}")
         return []
 
-def get_video_details_and_comments(youtube, video_id):
+def get_video_details_and_comments(pool, video_id):
     """Fetches video title, description, duration, and samples random comments."""
     try:
         # 1. Get Metadata (Added 'contentDetails' to the 'part' parameter)
-        vid_request = youtube.videos().list(part="snippet,contentDetails", id=video_id)
-        vid_response = vid_request.execute()
+        vid_request = pool.service.videos().list(part="snippet,contentDetails", id=video_id)
+        vid_response = pool.execute(vid_request)
         
         if not vid_response.get("items"):
             return None
@@ -87,13 +89,13 @@ def get_video_details_and_comments(youtube, video_id):
 
         # 2. Get Comments
         comments = []
-        comment_request = youtube.commentThreads().list(
+        comment_request = pool.service.commentThreads().list(
             part="snippet",
             videoId=video_id,
             textFormat="plainText",
             maxResults=100  # Pull 100 to ensure a good pool for random sampling
         )
-        comment_response = comment_request.execute()
+        comment_response = pool.execute(comment_request)
         
         for comment_item in comment_response.get("items", []):
             text = comment_item["snippet"]["topLevelComment"]["snippet"]["textDisplay"]
@@ -117,18 +119,20 @@ def get_video_details_and_comments(youtube, video_id):
             "duration_seconds": duration_seconds,  # New field added here
             "comments": comments
         }
+    except QuotaExhausted:
+        raise
     except Exception as e:
         # Comments might be disabled, ignore and move on
         return None
 
 def main():
-    youtube = build("youtube", "v3", developerKey=API_KEY)
+    pool = get_client_pool()
     dataset = []
 
     for query in SEARCH_QUERIES:
-        video_ids = get_random_videos(youtube, query, VIDEOS_PER_QUERY)
+        video_ids = get_random_videos(pool, query, VIDEOS_PER_QUERY)
         for vid in video_ids:
-            data = get_video_details_and_comments(youtube, vid)
+            data = get_video_details_and_comments(pool, vid)
             if data:
                 dataset.append(data)
 
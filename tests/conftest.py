@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.fixture
+def serve_channel(tmp_path, monkeypatch):
+    """Starts a stand-in API serving one synthetic channel and points the client pool at it."""
+    pytest.importorskip("googleapiclient")
+    from youtube_analytics.data import client
+    from youtube_analytics.data.stand_in_api import serve
+    from youtube_analytics.data.synthetic import SyntheticDataset
+
+    servers = []
+
+    def start(num_videos, num_comments, quota_per_key=None, **pool_kwargs):
+        dataset = SyntheticDataset.generate(1, num_videos=num_videos, max_comments=num_comments, min_comments=num_comments)
+        server, url = serve(dataset, latency=0, quota_per_key=quota_per_key)
+        servers.append(server)
+        client.configure_client_pool(api_endpoint=url, size=2, cache_dir=str(tmp_path / "discovery"), **pool_kwargs)
+        return dataset.channels[0]
+
+    monkeypatch.setattr(client, "_default_pool", None)
+    yield start
+    if client._default_pool is not None:
+        client._default_pool.close()
+    for server in servers:
+        server.shutdown()
@@ -0,0 +1,80 @@
+import os
+
+from youtube_analytics.data.annotations import (
+    commit,
+    dirty_comments,
+    input_hash,
+    load_video,
+    read_annotations,
+    read_inputs,
+    sidecar_path,
+)
+from youtube_analytics.data.video_io import write_video_file
+
+
+def _video(tmp_path):
+    channel_dir = str(tmp_path / "UCtest")
+    os.makedirs(channel_dir)
+    comments = [{"comment_id": f"c{i}", "comment": f"text {i}"} for i in range(3)]
+    write_video_file(channel_dir, "vid", {"title": "A video"}, comments)
+    return channel_dir
+
+
+def test_commits_merge_in_order(tmp_path):
+    channel_dir = _video(tmp_path)
+    commit(channel_dir, "sentiment", "vid", comments={"c0": {"sentiment": {"Positive": 0.1}}})
+    commit(channel_dir, "sentiment", "vid", comments={"c0": {"sentiment": {"Positive": 0.9}}})
+    commit(channel_dir, "engagement", "vid", video={"engagement_metrics": {"like_rate": 0.5}})
+
+    video = load_video(channel_dir, "vid")
+    assert video["engagement_metrics"] == {"like_rate": 0.5}
+    assert video["comments"][0]["sentiment"] == {"Positive": 0.9}
+    assert "sentiment" not in video["comments"][1]
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    channel_dir = _video(tmp_path)
+    commit(channel_dir, "sentiment", "vid", comments={"c0": {"sentiment": {"Positive": 0.9}}})
+    with open(sidecar_path(channel_dir, "sentiment", "vid"), "ab") as f:
+        f.write(b'{"video": {}, "comments": {"c1": {"sent')
+
+    _, comments = read_annotations(channel_dir, "vid")
+    assert comments == {"c0": {"sentiment": {"Positive": 0.9}}}
+
+
+def test_commit_after_truncated_line(tmp_path, capsys):
+    channel_dir = _video(tmp_path)
+    commit(channel_dir, "sentiment", "vid", comments={"c0": {"sentiment": {"Positive": 0.9}}})
+    with open(sidecar_path(channel_dir, "sentiment", "vid"), "ab") as f:
+        f.write(b'{"video": {}, "comments": {"c1": {"sent')
+    commit(channel_dir, "sentiment", "vid", comments={"c2": {"sentiment": {"Positive": 0.2}}})
+
+    _, comments = read_annotations(channel_dir, "vid")
+    assert comments == {"c0": {"sentiment": {"Positive": 0.9}}, "c2": {"sentiment": {"Positive": 0.2}}}
+    assert "Skipping unreadable line 2" in capsys.readouterr().out
+
+
+def test_undecodable_line_is_skipped(tmp_path):
+    channel_dir = _video(tmp_path)
+    path = sidecar_path(channel_dir, "weighted", "vid")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"video": {}, "comm\n')
+    commit(channel_dir, "weighted", "vid", comments={"c0": {"weight": 2.0}})
+
+    assert load_video(channel_dir, "vid")["comments"][0]["weight"] == 2.0
+
+
+def test_fingerprints_select_dirty_comments(tmp_path):
+    channel_dir = _video(tmp_path)
+    fingerprints = {f"c{i}": input_hash(f"text {i}") for i in range(3)}
+    commit(
+        channel_dir,
+        "sentiment",
+        "vid",
+        comments={"c0": {"sentiment": {}}, "c1": {"sentiment": {}}},
+        inputs={"video": "v1", "comments": {"c0": fingerprints["c0"], "c1": "stale"}},
+    )
+
+    assert read_inputs(channel_dir, "sentiment", "vid")[0] == "v1"
+    assert dirty_comments(channel_dir, "sentiment", "vid", fingerprints) == {"c1", "c2"}
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from youtube_analytics.data import batch_ingest
+from youtube_analytics.data.quota import KeyScheduler
+
+
+def test_failing_channel_does_not_stop_the_batch(tmp_path, serve_channel):
+    serve_channel(2, 5)
+    manifest = tmp_path / "channels.txt"
+    manifest.write_text("# channels\nstand_in\n\nhttps://www.youtube.com/@nobody\n")
+
+    summary = batch_ingest.run_batch(
+        batch_ingest.load_manifest(str(manifest)),
+        data_dir=str(tmp_path / "data"),
+        num_videos=2,
+        num_comments=5,
+        channel_workers=2,
+        retries=1,
+        retry_delay=0,
+        summary_path=str(tmp_path / "summary.json"),
+    )
+
+    assert [(c["channel"], c["status"], c["attempts"]) for c in summary["channels"]] == [
+        ("stand_in", "ok", 1),
+        ("https://www.youtube.com/@nobody", "failed", 2),
+    ]
+    assert summary["channels"][1]["error"] == "LookupError: Channel not found"
+    assert (summary["videos_fetched"], summary["comments_fetched"]) == (2, 10)
+    with open(tmp_path / "summary.json", encoding="utf-8") as f:
+        assert json.load(f) == summary
+
+
+def test_quota_exhaustion_skips_pending_channels(tmp_path, serve_channel, monkeypatch):
+    # One fetch of 2 videos with 5 comments each costs 6 units; the stand-in allows 8
+    keys = KeyScheduler(["key"], requests_per_second=1000, usage_path=None)
+    serve_channel(2, 5, keys=keys, quota_per_key=8)
+    started = []
+    run_job = batch_ingest._run_job
+
+    def recording(job, *args):
+        started.append(job["channel"])
+        return run_job(job, *args)
+
+    monkeypatch.setattr(batch_ingest, "_run_job", recording)
+    manifest = [{"channel": "stand_in", "num_videos": 2, "num_comments": 5, "tag": n} for n in range(6)]
+
+    summary = batch_ingest.run_batch(manifest, data_dir=str(tmp_path / "data"), channel_workers=1, retries=2, retry_delay=0, summary_path=str(tmp_path / "summary.json"))
+
+    assert [c["status"] for c in summary["channels"]] == ["ok"] + ["skipped"] * 5
+    assert (summary["channels_ok"], summary["channels_failed"], summary["channels_skipped"]) == (1, 0, 5)
+    assert "out of quota" in summary["quota_exhausted"]
+    assert all(c["error"] == summary["quota_exhausted"] for c in summary["channels"][1:])
+    # The job that ran into the limit is not retried and the rest never start
+    assert len(started) == 2
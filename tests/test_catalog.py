@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from youtube_analytics.data import annotations, catalog
+from youtube_analytics.data.synthetic import SyntheticChannel, write_channel
+from youtube_analytics.data.video_io import find_data_file, iter_video_file, write_video_file
+
+
+@pytest.fixture
+def channel(tmp_path):
+    channel = SyntheticChannel(num_videos=6, max_comments=10, min_comments=10)
+    write_channel(channel, str(tmp_path))
+    return channel
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Video IDs whose file the catalog opened."""
+    calls = []
+
+    def counting(channel_dir, video_id):
+        calls.append(video_id)
+        return iter_video_file(channel_dir, video_id)
+
+    monkeypatch.setattr(catalog, "iter_video_file", counting)
+    return calls
+
+
+def _video(data_root, video_id):
+    return catalog.find(video_id, data_root)
+
+
+def test_index_is_incremental(tmp_path, channel, opened):
+    data_root = str(tmp_path)
+    assert catalog.index_channel(channel.channel_id, data_root) == 7  # videos plus channel metadata
+    assert sorted(opened) == sorted(channel.video_ids)
+    assert _video(data_root, channel.video_ids[0])["stored_comments"] == 10
+    assert catalog.find(channel.comment(0, 3)["comment_id"], data_root)["video_id"] == channel.video_ids[0]
+
+    opened.clear()
+    assert catalog.index_channel(channel.channel_id, data_root) == 0
+    assert opened == []
+
+    # Rewritten video file: only that one is parsed again
+    channel_dir = os.path.join(data_root, channel.channel_id)
+    metadata, comments = iter_video_file(channel_dir, channel.video_ids[2])
+    write_video_file(channel_dir, channel.video_ids[2], metadata, list(comments)[:4])
+    os.utime(find_data_file(channel_dir, channel.video_ids[2]), ns=(1, 1))  # a different mtime even on coarse clocks
+    assert catalog.index_channel(channel.channel_id, data_root) == 1
+    assert opened == [channel.video_ids[2]]
+    assert _video(data_root, channel.video_ids[2])["stored_comments"] == 4
+    assert catalog.find(channel.comment(2, 5)["comment_id"], data_root) is None
+
+
+def test_stage_results_update_status_without_reparsing(tmp_path, channel, opened):
+    data_root = str(tmp_path)
+    channel_dir = os.path.join(data_root, channel.channel_id)
+    catalog.index_channel(channel.channel_id, data_root)
+    assert len(catalog.videos_needing("sentiment", channel.channel_id, data_root)) == 6
+    assert len(catalog.videos_needing("engagement", channel.channel_id, data_root)) == 6
+
+    vid = channel.video_ids[1]
+    sentiment = {"Negative": 0.1, "Neutral": 0.2, "Positive": 0.7}
+    scored = {c["comment_id"]: {"sentiment": sentiment} for c in channel.iter_comments(1, 0, 6)}
+    annotations.commit(channel_dir, "sentiment", vid, comments=scored)
+    annotations.commit(channel_dir, "engagement", vid, video={"engagement_metrics": {"like_rate": 0.1}})
+    opened.clear()
+
+    assert catalog.index_channel(channel.channel_id, data_root) == 0
+    assert opened == []
+    assert _video(data_root, vid)["comments_without_sentiment"] == 4
+    assert vid not in [row["video_id"] for row in catalog.videos_needing("engagement", channel.channel_id, data_root)]
+
+    rest = {c["comment_id"]: {"sentiment": sentiment} for c in channel.iter_comments(1, 6)}
+    annotations.commit(channel_dir, "sentiment", vid, comments=rest)
+    catalog.index_channel(channel.channel_id, data_root)
+    assert opened == []
+    assert vid not in [row["video_id"] for row in catalog.videos_needing("sentiment", channel.channel_id, data_root)]
+
+
+def test_videos_published_since(tmp_path, channel):
+    data_root = str(tmp_path)
+    catalog.index_channel(channel.channel_id, data_root)
+    since = channel.video(3)["published_at"]
+
+    # Newest upload first in the channel, oldest first in the result
+    assert catalog.videos_published_since(channel.channel_id, since, data_root) == channel.video_ids[3::-1]
+    assert catalog.videos_published_since(channel.channel_id, "2999-01-01", data_root) == []
+    assert catalog.videos_published_since("UCunknown", since, data_root) == []
+
+
+def test_old_catalog_is_rebuilt(tmp_path, channel):
+    data_root = str(tmp_path)
+    conn = catalog.sqlite3.connect(catalog.catalog_path(data_root))
+    conn.execute("CREATE TABLE videos (video_id TEXT PRIMARY KEY, file_mtime INTEGER)")
+    conn.commit()
+    conn.close()
+
+    assert catalog.index_channel(channel.channel_id, data_root) == 7
+    assert _video(data_root, channel.video_ids[0])["stored_comments"] == 10
@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from youtube_analytics.data import channel_data
+from youtube_analytics.data.video_io import iter_video_file, read_json, write_video_file
+
+
+@pytest.fixture
+def stand_in(serve_channel):
+    return serve_channel(3, 30)
+
+
+def _drop_newest(channel_dir, video_id, n):
+    """Pretends the newest `n` comments of a video were posted after it was fetched."""
+    metadata, comments = iter_video_file(channel_dir, video_id)
+    comments = list(comments)
+    write_video_file(channel_dir, video_id, metadata, comments[n:])
+    return comments
+
+
+def test_refresh_prepends_new_comments_to_the_json(tmp_path, stand_in):
+    data_dir = str(tmp_path / "data")
+    channel_data.fetch_channel_data("stand_in", num_videos=3, num_comments=30, data_dir=data_dir)
+    channel_dir = os.path.join(data_dir, stand_in.channel_id)
+    vid = stand_in.video_ids[0]
+    full = _drop_newest(channel_dir, vid, 5)
+
+    stats = {}
+    channel_data.refresh_channel_data("stand_in", num_videos=3, num_comments=30, data_dir=data_dir, stats=stats)
+
+    assert stats["comments"] == 5
+    assert [c["comment_id"] for c in read_json(channel_dir, vid)["comments"]] == [c["comment_id"] for c in full]
+
+
+def test_refresh_of_a_migrated_channel_updates_the_store(tmp_path, stand_in):
+    pytest.importorskip("pyarrow")
+    from youtube_analytics.data.comment_store import migrate_channel, read_comments
+
+    data_dir = str(tmp_path / "data")
+    channel_data.fetch_channel_data("stand_in", num_videos=3, num_comments=30, data_dir=data_dir)
+    channel_dir = os.path.join(data_dir, stand_in.channel_id)
+    vid = stand_in.video_ids[1]
+    full = _drop_newest(channel_dir, vid, 5)
+    migrate_channel(stand_in.channel_id, data_dir)
+
+    stats = {}
+    channel_data.refresh_channel_data("stand_in", num_videos=3, num_comments=30, data_dir=data_dir, stats=stats)
+
+    assert stats["comments"] == 5
+    assert "comments" not in read_json(channel_dir, vid)
+    rows = read_comments(channel_dir, ["comment_id", "video_id", "text"]).to_pylist()
+    assert len(rows) == 90
+    assert [(r["comment_id"], r["text"]) for r in rows if r["video_id"] == vid] == [(c["comment_id"], c["comment"]) for c in full]
+    # Nothing new the second time
+    channel_data.refresh_channel_data("stand_in", num_videos=3, num_comments=30, data_dir=data_dir, stats=stats)
+    assert stats["comments"] == 0
+    assert read_comments(channel_dir, ["comment_id"]).num_rows == 90
+
+
+def test_backfill_resumes_from_checkpoint(tmp_path, serve_channel, monkeypatch):
+    channel = serve_channel(120, 3)  # three playlist pages
+    data_dir = str(tmp_path / "data")
+    channel_dir = os.path.join(data_dir, channel.channel_id)
+    checkpoint_path = os.path.join(channel_dir, channel_data.CHECKPOINT_FILENAME)
+    get_video_metadata = channel_data.get_video_metadata
+    requested = []
+
+    def fail_on_third_page(video_ids, limiter=None):
+        if len(requested) == 2:
+            raise ConnectionError("interrupted")
+        requested.append(list(video_ids))
+        return get_video_metadata(video_ids, limiter)
+
+    monkeypatch.setattr(channel_data, "get_video_metadata", fail_on_third_page)
+    with pytest.raises(ConnectionError):
+        channel_data.backfill_channel("stand_in", num_comments=3, data_dir=data_dir, max_workers=4, max_pending_pages=0)
+
+    with open(checkpoint_path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    assert checkpoint["pages_done"] == 2
+    assert checkpoint["videos_done"] == 100
+    assert checkpoint["page_token"]
+
+    def count(video_ids, limiter=None):
+        requested.append(list(video_ids))
+        return get_video_metadata(video_ids, limiter)
+
+    requested.clear()
+    monkeypatch.setattr(channel_data, "get_video_metadata", count)
+    stats = {}
+    channel_data.backfill_channel("stand_in", num_comments=3, data_dir=data_dir, max_workers=4, stats=stats)
+
+    assert requested == [channel.video_ids[100:]]
+    assert stats == {"videos": 20, "comments": 60}
+    assert not os.path.exists(checkpoint_path)
+    for vid in channel.video_ids:
+        metadata, comments = iter_video_file(channel_dir, vid)
+        assert len(list(comments)) == 3
@@ -0,0 +1,73 @@
+import re
+
+import pytest
+
+pytest.importorskip("tqdm")
+
+from youtube_analytics.nlp.comment_flags import encode_flag_inputs, flag_context
+
+CLS, SEP = 1, 2
+
+
+class PieceTokenizer:
+    """Pieces are words with their leading space, as in byte-level BPE; IDs come from a growing vocabulary."""
+
+    def __init__(self):
+        self.vocab = {}
+        self.calls = []
+
+    def tokenize(self, text):
+        return [self.vocab.setdefault(piece, len(self.vocab) + 10) for piece in re.findall(r"\s?\S+", text)]
+
+    def __call__(self, texts, add_special_tokens=True):
+        self.calls.append(list(texts))
+        ids = [self.tokenize(text) for text in texts]
+        return {"input_ids": [self.build_inputs_with_special_tokens(i) for i in ids] if add_special_tokens else ids}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def build_inputs_with_special_tokens(self, ids):
+        return [CLS] + ids + [SEP]
+
+
+def test_context_and_comment_are_encoded_as_separate_segments():
+    tokenizer = PieceTokenizer()
+    context = flag_context("My video", "About things")
+    pairs = [(context, "nice one"), (context, "  spaced out"), (context, "")]
+
+    input_ids, _ = encode_flag_inputs(tokenizer, pairs)
+
+    for (context, comment), ids in zip(pairs, input_ids):
+        assert ids == [CLS] + tokenizer.tokenize(context) + tokenizer.tokenize(" " + comment) + [SEP]
+
+
+def test_each_context_is_tokenized_once():
+    tokenizer = PieceTokenizer()
+    first, second = flag_context("First", "one two"), flag_context("Second", "")
+    pairs = [(first, "a b"), (second, "c"), (first, "d"), (first, "a b")]
+
+    input_ids, stats = encode_flag_inputs(tokenizer, pairs)
+
+    assert tokenizer.calls[0] == [first, second]
+    assert input_ids[0] == input_ids[3]
+    n_first, n_second = len(tokenizer.tokenize(first)), len(tokenizer.tokenize(second))
+    n_comments = 2 + 1 + 1 + 2
+    assert stats == {"tokenized": n_first + n_second + n_comments, "per_comment": 3 * n_first + n_second + n_comments}
+
+
+def test_truncation_keeps_the_context_and_cuts_the_comment():
+    tokenizer = PieceTokenizer()
+    context = flag_context("Title", "")
+    n_context = len(tokenizer.tokenize(context))
+    pairs = [(context, " ".join(f"w{i}" for i in range(50))), (context, "short")]
+
+    input_ids, _ = encode_flag_inputs(tokenizer, pairs, max_length=n_context + 7)
+
+    assert len(input_ids[0]) == n_context + 7
+    assert input_ids[0] == [CLS] + tokenizer.tokenize(context) + tokenizer.tokenize(" w0 w1 w2 w3 w4") + [SEP]
+    assert input_ids[1] == [CLS] + tokenizer.tokenize(context + " short") + [SEP]
+
+    # A budget smaller than the context cuts into it
+    input_ids, _ = encode_flag_inputs(tokenizer, pairs, max_length=4)
+    assert input_ids == [[CLS] + tokenizer.tokenize(context)[:2] + [SEP]] * 2
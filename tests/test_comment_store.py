@@ -0,0 +1,136 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from youtube_analytics.data import comment_store
+from youtube_analytics.data.annotations import commit
+from youtube_analytics.data.comment_store import export_channel, has_store, migrate_channel, read_comments
+from youtube_analytics.data.synthetic import SyntheticChannel, write_channel
+from youtube_analytics.data.video_io import iter_video_file, read_json, write_video_file
+
+
+def _channel(tmp_path, num_videos=3, max_comments=40):
+    channel = SyntheticChannel(seed=3, num_videos=num_videos, max_comments=max_comments)
+    write_channel(channel, str(tmp_path))
+    return channel, os.path.join(str(tmp_path), channel.channel_id)
+
+
+def test_migrate_then_read_comments_matches_json(tmp_path):
+    channel, channel_dir = _channel(tmp_path)
+    vid = channel.video_ids[0]
+    commit(channel_dir, "sentiment", vid, comments={channel.comment(0, 0)["comment_id"]: {"sentiment": {"Negative": 0.05, "Neutral": 0.05, "Positive": 0.9}}})
+    expected = [c for i in range(channel.num_videos) for c in channel.iter_comments(i)]
+
+    assert migrate_channel(channel.channel_id, str(tmp_path)) == len(expected)
+
+    rows = read_comments(channel_dir).to_pylist()
+    assert [(r["comment_id"], r["video_id"], r["text"], r["likes"]) for r in rows] == [
+        (c["comment_id"], c["video_id"], c["comment"], c["likes"]) for c in expected
+    ]
+    assert rows[0]["sentiment_positive"] == 0.9
+    assert rows[1]["sentiment_positive"] is None
+    assert "comments" not in read_json(channel_dir, vid)
+
+
+def test_export_restores_the_json_comments(tmp_path):
+    channel, channel_dir = _channel(tmp_path)
+    vid = channel.video_ids[1]
+    before = list(iter_video_file(channel_dir, vid)[1])
+    migrate_channel(channel.channel_id, str(tmp_path))
+
+    export_channel(channel.channel_id, str(tmp_path), remove_store=True)
+
+    assert not has_store(channel_dir)
+    assert [(c["comment_id"], c["comment"]) for c in iter_video_file(channel_dir, vid)[1]] == [
+        (c["comment_id"], c["comment"]) for c in before
+    ]
+
+
+def _reimport_first_video(channel, channel_dir):
+    # A refresh writes the comments of one video back into its JSON, with one more comment
+    vid = channel.video_ids[0]
+    video_data = read_json(channel_dir, vid)
+    comments = [channel.comment(0, j) for j in range(channel.comment_counts[0])]
+    comments.append({**comments[0], "comment_id": "Ugznew", "comment": "new comment"})
+    write_video_file(channel_dir, vid, video_data, comments)
+    return vid
+
+
+def test_reimport_replaces_the_rows_of_a_video(tmp_path):
+    channel, channel_dir = _channel(tmp_path)
+    migrate_channel(channel.channel_id, str(tmp_path))
+    vid = _reimport_first_video(channel, channel_dir)
+
+    migrate_channel(channel.channel_id, str(tmp_path))
+
+    rows = read_comments(channel_dir, ["comment_id", "video_id"]).to_pylist()
+    assert sum(r["video_id"] == vid for r in rows) == channel.comment_counts[0] + 1
+    assert len(rows) == sum(channel.comment_counts) + 1
+    assert sorted(os.listdir(comment_store.store_dir(channel_dir))) == [
+        "base.2.parquet", "extra.2.parquet", "manifest.json", "sentiment.2.parquet", "topics.2.parquet", "weight.2.parquet"
+    ]
+
+
+def test_interrupted_reimport_leaves_the_store_and_json_intact(tmp_path, monkeypatch):
+    channel, channel_dir = _channel(tmp_path)
+    migrate_channel(channel.channel_id, str(tmp_path))
+    before = read_comments(channel_dir)
+    vid = _reimport_first_video(channel, channel_dir)
+
+    write_table = comment_store.pq.write_table
+    written = []
+
+    def dies_on_third_group(table, path, **kwargs):
+        if len(written) == 2:
+            raise OSError("disk full")
+        written.append(path)
+        write_table(table, path, **kwargs)
+
+    monkeypatch.setattr(comment_store.pq, "write_table", dies_on_third_group)
+    with pytest.raises(OSError):
+        migrate_channel(channel.channel_id, str(tmp_path))
+    monkeypatch.setattr(comment_store.pq, "write_table", write_table)
+
+    assert read_comments(channel_dir).equals(before)
+    assert len(list(iter_video_file(channel_dir, vid)[1])) == channel.comment_counts[0] + 1
+    # A rerun picks the video up again and cleans up the files of the failed write
+    migrate_channel(channel.channel_id, str(tmp_path))
+    assert read_comments(channel_dir).num_rows == before.num_rows + 1
+    assert len(os.listdir(comment_store.store_dir(channel_dir))) == 6
+
+
+def test_reads_stores_written_before_the_manifest(tmp_path):
+    channel, channel_dir = _channel(tmp_path)
+    migrate_channel(channel.channel_id, str(tmp_path))
+    before = read_comments(channel_dir)
+    directory = comment_store.store_dir(channel_dir)
+    for name in os.listdir(directory):
+        if name.endswith(".parquet"):
+            os.rename(os.path.join(directory, name), os.path.join(directory, name.split(".")[0] + ".parquet"))
+    os.remove(os.path.join(directory, "manifest.json"))
+
+    assert has_store(channel_dir)
+    assert read_comments(channel_dir).equals(before)
+    comment_store.write_columns(channel_dir, "weight", {"weight": [1.0] * before.num_rows})
+    assert read_comments(channel_dir, ["weight"]).column("weight").to_pylist() == [1.0] * before.num_rows
+    assert "base.parquet" in os.listdir(directory) and "weight.parquet" not in os.listdir(directory)
+
+
+def test_float32_sentiment_of_older_stores_reads_as_written(tmp_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    channel, channel_dir = _channel(tmp_path, num_videos=1, max_comments=3)
+    migrate_channel(channel.channel_id, str(tmp_path))
+    sentiment = {"sentiment_negative": [0.1] * 3, "sentiment_neutral": [0.2] * 3, "sentiment_positive": [0.7] * 3}
+    comment_store.write_columns(channel_dir, "sentiment", sentiment)
+    path = comment_store._group_path(channel_dir, "sentiment")
+    pq.write_table(pa.table({k: pa.array(v, pa.float32()) for k, v in sentiment.items()}), path)
+
+    assert read_comments(channel_dir, list(sentiment)).to_pydict() == sentiment
+    export_channel(channel.channel_id, str(tmp_path))
+    assert [c["sentiment"] for c in iter_video_file(channel_dir, channel.video_ids[0])[1]] == [
+        {"Negative": 0.1, "Neutral": 0.2, "Positive": 0.7}
+    ] * 3
@@ -0,0 +1,113 @@
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from youtube_analytics import pipeline
+from youtube_analytics.data.annotations import sidecar_path
+from youtube_analytics.data.synthetic import SyntheticChannel, write_channel
+from youtube_analytics.data.video_io import iter_video_file, list_video_ids, write_video_file
+from youtube_analytics.nlp.sentiment_service import DynamicBatcher, make_handler
+
+
+class RecordingPredict:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        # Depends on the text, so an edited comment changes what the weighted stage reads
+        return [{"positive": 1 / len(text), "neutral": 1 - 1 / len(text)} for text in texts]
+
+
+@pytest.fixture
+def channel_dir(tmp_path):
+    channel = SyntheticChannel(num_videos=4, max_comments=5, min_comments=3)
+    return write_channel(channel, str(tmp_path))
+
+
+def _run(channel_dir, stages, **kwargs):
+    data_root, channel_id = os.path.split(channel_dir)
+    return pipeline.run_pipeline(channel_id, data_root, stages=stages, **kwargs)
+
+
+def _commits(channel_dir, stage, video_ids):
+    """Number of commits of `stage` per video."""
+    counts = {}
+    for vid in video_ids:
+        with open(sidecar_path(channel_dir, stage, vid), encoding="utf-8") as f:
+            counts[vid] = sum(1 for _ in f)
+    return counts
+
+
+def test_resolve_stages_puts_dependencies_first():
+    assert pipeline.resolve_stages(["weighted", "rollup"]) == ["sentiment", "weighted", "engagement", "rollup"]
+    assert pipeline.resolve_stages(["sentiment", "weighted", "sentiment"]) == ["sentiment", "weighted"]
+
+
+def test_resolve_stages_rejects_unknown_stages_and_cycles(monkeypatch):
+    with pytest.raises(ValueError, match="Unknown stage 'topics'"):
+        pipeline.resolve_stages(["topics"])
+    monkeypatch.setattr(pipeline, "DEPENDENCIES", {**pipeline.DEPENDENCIES, "sentiment": ("weighted",)})
+    with pytest.raises(ValueError, match="Dependency cycle: weighted -> sentiment -> weighted"):
+        pipeline.resolve_stages(["weighted"])
+
+
+def test_engagement_skips_videos_with_unchanged_inputs(channel_dir, capsys):
+    video_ids = list_video_ids(channel_dir)
+    _run(channel_dir, ["engagement"])
+    assert _commits(channel_dir, "engagement", video_ids) == {vid: 1 for vid in video_ids}
+    capsys.readouterr()
+
+    _run(channel_dir, ["engagement"])
+    assert _commits(channel_dir, "engagement", video_ids) == {vid: 1 for vid in video_ids}
+    assert "engagement: skipped 4 of 4 videos with unchanged inputs" in capsys.readouterr().out
+
+    # Only the video whose view count changed is recomputed
+    changed = video_ids[2]
+    metadata, comments = iter_video_file(channel_dir, changed)
+    comments = list(comments)
+    metadata["view_count"] = str(int(metadata["view_count"]) + 1)
+    write_video_file(channel_dir, changed, metadata, comments)
+    _run(channel_dir, ["engagement"])
+    assert _commits(channel_dir, "engagement", video_ids) == {vid: 2 if vid == changed else 1 for vid in video_ids}
+    assert "engagement: skipped 3 of 4 videos" in capsys.readouterr().out
+
+    _run(channel_dir, ["engagement"], force=True)
+    assert _commits(channel_dir, "engagement", video_ids) == {vid: 3 if vid == changed else 2 for vid in video_ids}
+    assert "skipped" not in capsys.readouterr().out
+
+
+def test_sentiment_and_weighted_skip_scored_comments(channel_dir, capsys):
+    predict = RecordingPredict()
+    batcher = DynamicBatcher(predict, max_wait=0.01)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(batcher, {"model": "test", "revision": "1"}))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    video_ids = list_video_ids(channel_dir)
+    try:
+        _run(channel_dir, ["weighted"], sentiment_service=url, sentiment_cache=None)
+        scored = len(predict.texts)
+        assert scored == 20
+        capsys.readouterr()
+
+        _run(channel_dir, ["weighted"], sentiment_service=url, sentiment_cache=None)
+        assert len(predict.texts) == scored
+        out = capsys.readouterr().out
+        assert f"sentiment: skipped {scored} of {scored} comments with unchanged inputs" in out
+        assert "weighted: skipped 4 of 4 videos with unchanged inputs" in out
+        assert _commits(channel_dir, "weighted", video_ids) == {vid: 1 for vid in video_ids}
+
+        # An edited comment is rescored, and the weighted metrics of its video recomputed
+        edited = video_ids[0]
+        metadata, comments = iter_video_file(channel_dir, edited)
+        comments = list(comments)
+        comments[0]["comment"] += " (edited)"
+        write_video_file(channel_dir, edited, metadata, comments)
+        _run(channel_dir, ["weighted"], sentiment_service=url, sentiment_cache=None)
+        assert predict.texts[scored:] == [comments[0]["comment"]]
+        assert _commits(channel_dir, "weighted", video_ids) == {vid: 2 if vid == edited else 1 for vid in video_ids}
+    finally:
+        server.shutdown()
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+from youtube_analytics.data import quota
+from youtube_analytics.data.quota import PACIFIC, KeyScheduler, QuotaExhausted, estimate_fetch_quota, next_reset
+
+
+def _pacific(*args):
+    return datetime(*args, tzinfo=PACIFIC).timestamp()
+
+
+@pytest.mark.parametrize(
+    "now, reset",
+    [
+        ((2024, 6, 1, 23, 59), (2024, 6, 2)),  # PDT
+        ((2024, 1, 15, 0, 0, 1), (2024, 1, 16)),  # PST
+        ((2024, 3, 9, 12, 0), (2024, 3, 10)),  # the night the clocks go forward
+    ],
+)
+def test_next_reset_is_midnight_pacific(now, reset):
+    assert next_reset(_pacific(*now)) == _pacific(*reset)
+
+
+def test_scheduler_spreads_cost_and_resets_at_midnight(monkeypatch):
+    now = _pacific(2024, 6, 1, 23, 0)
+    monkeypatch.setattr(quota.time, "time", lambda: now)
+    keys = KeyScheduler(["a", "b"], daily_quota=150, requests_per_second=1000, usage_path=None)
+
+    # Each request goes to the key with the most units left
+    assert [keys.acquire(100), keys.acquire(100), keys.acquire(50), keys.acquire(50)] == ["a", "b", "a", "b"]
+    assert keys.remaining() == 0
+    with pytest.raises(QuotaExhausted, match="out of quota until 2024-06-02 00:00"):
+        keys.acquire(1)
+
+    now = _pacific(2024, 6, 2, 0, 0, 1)
+    assert keys.remaining() == 300
+    assert keys.acquire(1) == "a"
+
+
+def test_usage_is_shared_across_runs_until_the_reset(tmp_path, monkeypatch):
+    now = _pacific(2024, 6, 1, 12, 0)
+    monkeypatch.setattr(quota.time, "time", lambda: now)
+    usage_path = str(tmp_path / "usage.json")
+    first = KeyScheduler(["secret-key"], daily_quota=100, usage_path=usage_path)
+    first.acquire(60)
+    first.save_usage()
+    assert "secret-key" not in (tmp_path / "usage.json").read_text()
+
+    assert KeyScheduler(["secret-key"], daily_quota=100, usage_path=usage_path).remaining() == 40
+    now = _pacific(2024, 6, 2, 1, 0)
+    assert KeyScheduler(["secret-key"], daily_quota=100, usage_path=usage_path).remaining() == 100
+
+
+def test_keys_are_rotated_when_the_api_reports_quota_exceeded(tmp_path, serve_channel):
+    # The stand-in allows 3 units per key, the scheduler believes in 100
+    keys = KeyScheduler(["key-a", "key-b"], daily_quota=100, requests_per_second=1000, usage_path=None)
+    channel = serve_channel(2, 5, keys=keys, quota_per_key=3)
+    from youtube_analytics.data.channel_data import get_video_metadata
+
+    for _ in range(6):
+        assert set(get_video_metadata(channel.video_ids)) == set(channel.video_ids)
+    assert keys.remaining() == 200 - 6
+
+    with pytest.raises(QuotaExhausted):
+        get_video_metadata(channel.video_ids)
+    assert keys.remaining() == 0
+
+
+def test_estimate_counts_pages_and_search():
+    estimate = estimate_fetch_quota("https://www.youtube.com/@someone", 120, 250)
+    assert estimate == {
+        "channel_resolution": 100,
+        "channel_info": 1,
+        "playlist_items": 3,
+        "video_metadata": 3,
+        "comment_threads": 360,
+        "total": 467,
+    }
+    assert estimate_fetch_quota("https://www.youtube.com/channel/UC123", 10, 50)["channel_resolution"] == 0
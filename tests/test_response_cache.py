@@ -0,0 +1,106 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+from youtube_analytics.data import channel_data, client, response_cache
+from youtube_analytics.data.response_cache import CacheMiss, ResponseCache
+from youtube_analytics.data.video_io import list_video_ids, read_json
+
+
+def _sent():
+    """Requests that reached the stand-in server so far."""
+    return sum(s["requests"] for s in client.get_client_pool().stats())
+
+
+def _entries(cache):
+    return sorted(cache._entries(), key=lambda e: e[2])
+
+
+def test_entries_expire_after_their_ttl(tmp_path, serve_channel, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "responses"), mode="cache", ttls={"youtube.channels.list": 60})
+    serve_channel(2, 5, cache=cache)
+
+    info = channel_data.get_channel_info("stand_in")
+    sent = _sent()
+    assert channel_data.get_channel_info("stand_in") == info
+    assert _sent() == sent
+
+    now = time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + 61)
+    assert channel_data.get_channel_info("stand_in") == info
+    assert _sent() == sent + 2  # forUsername lookup and channel details
+
+
+def test_oldest_entries_are_evicted_past_max_bytes(tmp_path, serve_channel):
+    cache = ResponseCache(str(tmp_path / "responses"), mode="cache")
+    channel = serve_channel(8, 5, cache=cache)
+    channel_data.get_video_metadata(channel.video_ids[:1])
+    entry_size = _entries(cache)[0][1]
+    cache.max_bytes = int(entry_size * 4.5)
+
+    for vid in channel.video_ids[1:]:
+        time.sleep(0.01)  # distinct mtimes
+        channel_data.get_video_metadata([vid])
+
+    entries = _entries(cache)
+    assert sum(size for _, size, _ in entries) <= cache.max_bytes * 0.9
+    sent = _sent()
+    channel_data.get_video_metadata(channel.video_ids[-1:])
+    assert _sent() == sent
+    channel_data.get_video_metadata(channel.video_ids[:1])
+    assert _sent() == sent + 1
+
+
+def test_replay_serves_a_recorded_run_without_network(tmp_path, serve_channel):
+    responses = str(tmp_path / "responses")
+    channel = serve_channel(3, 20, cache=ResponseCache(responses, mode="record"))
+    channel_data.fetch_channel_data("stand_in", num_videos=3, num_comments=20, data_dir=str(tmp_path / "recorded"))
+
+    # Nothing listens on the discard port, so every answer has to come from disk
+    client.configure_client_pool(api_endpoint="http://127.0.0.1:9/", size=1, cache_dir=str(tmp_path / "discovery"), cache=ResponseCache(responses, mode="replay"))
+    channel_data.fetch_channel_data("stand_in", num_videos=3, num_comments=20, data_dir=str(tmp_path / "replayed"))
+
+    recorded = os.path.join(tmp_path, "recorded", channel.channel_id)
+    replayed = os.path.join(tmp_path, "replayed", channel.channel_id)
+    assert list_video_ids(replayed) == list_video_ids(recorded) == sorted(channel.video_ids)
+    for name in list_video_ids(recorded) + ["channel_metadata"]:
+        assert read_json(replayed, name) == read_json(recorded, name)
+    assert _sent() == 0
+
+
+def test_replay_miss_fails_the_fetch(tmp_path, serve_channel):
+    responses = str(tmp_path / "responses")
+    serve_channel(3, 20, cache=ResponseCache(responses, mode="record"))
+    channel_data.fetch_channel_data("stand_in", num_videos=3, num_comments=20, data_dir=str(tmp_path / "recorded"))
+
+    client.configure_client_pool(api_endpoint="http://127.0.0.1:9/", size=1, cache_dir=str(tmp_path / "discovery"), cache=ResponseCache(responses, mode="replay"))
+    # Different maxResults: the comment requests were never recorded
+    with pytest.raises(CacheMiss):
+        channel_data.fetch_channel_data("stand_in", num_videos=3, num_comments=10, data_dir=str(tmp_path / "replayed"))
+    with pytest.raises(CacheMiss):
+        channel_data.fetch_channel_data("stand_in", num_videos=3, num_comments=10, data_dir=str(tmp_path / "replayed"), stream=True)
+    with pytest.raises(CacheMiss):
+        channel_data.get_video_metadata(["not_recorded"])
+
+
+def test_refresh_revalidates_instead_of_reading_the_cache(tmp_path, serve_channel):
+    cache = ResponseCache(str(tmp_path / "responses"), mode="cache")
+    channel = serve_channel(3, 20, cache=cache)
+    data_dir = str(tmp_path / "data")
+    channel_data.fetch_channel_data("stand_in", num_videos=3, num_comments=20, data_dir=data_dir)
+    channel_data.refresh_channel_data("stand_in", num_videos=3, num_comments=20, data_dir=data_dir)
+
+    # More comments (and so more views) on the server, within every TTL
+    channel.comment_counts[0] += 5
+    stats = {}
+    sent = _sent()
+    channel_data.refresh_channel_data("stand_in", num_videos=3, num_comments=20, data_dir=data_dir, stats=stats)
+
+    video = read_json(os.path.join(data_dir, channel.channel_id), channel.video_ids[0])
+    assert video["comment_count"] == "25"
+    assert video["view_count"] == str(channel.view_count(0))
+    # One statistics request plus the first comment page of every video reached the server
+    assert _sent() - sent >= 1 + 3
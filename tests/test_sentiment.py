@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from youtube_analytics.nlp.sentiment import LABEL_MAPPING, predict_sentiment, token_batches
+
+
+class WordTokenizer:
+    """One token per word plus the two special tokens, like the model's tokenizer."""
+
+    def __call__(self, texts, return_tensors=None, padding=False, truncation=False, max_length=None):
+        encodings = {"input_ids": [[0] + [len(word) for word in text.split()][: max_length - 2] + [2] for text in texts]}
+        encodings["attention_mask"] = [[1] * len(ids) for ids in encodings["input_ids"]]
+        return self.pad([{key: encodings[key][i] for key in encodings} for i in range(len(texts))]) if padding else encodings
+
+    def pad(self, features, return_tensors=None):
+        width = max(len(f["input_ids"]) for f in features)
+        return {key: np.array([f[key] + [0] * (width - len(f[key])) for f in features]) for key in ("input_ids", "attention_mask")}
+
+
+class LengthModel:
+    """An exported-model stand-in whose probabilities depend only on a text's token count."""
+
+    backend = "onnx"
+
+    def __init__(self):
+        self.batch_shapes = []
+
+    def probs(self, inputs):
+        self.batch_shapes.append(inputs["input_ids"].shape)
+        return [_probs(n) for n in inputs["attention_mask"].sum(axis=1)]
+
+
+def _probs(n_tokens):
+    positive = n_tokens / 100
+    return [1 - positive, 0.0, positive]
+
+
+def _expected(text):
+    return {LABEL_MAPPING[k]: round(p, 2) for k, p in enumerate(_probs(len(text.split()) + 2))}
+
+
+def test_token_batches_respect_budget():
+    lengths = [5, 40, 3, 12, 40, 7, 90, 3]
+    batches = list(token_batches(lengths, token_budget=100, max_batch_size=3))
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= 3
+        assert len(batch) * max(lengths[i] for i in batch) <= 100
+    assert [lengths[i] for batch in batches for i in batch] == sorted(lengths)
+
+
+def test_predict_sentiment_returns_input_order_under_token_budget():
+    rng = random.Random(0)
+    texts = [" ".join(["word"] * rng.randint(0, 60)) for _ in range(200)]
+    model = LengthModel()
+
+    results = predict_sentiment(texts, WordTokenizer(), model, device=None, batch_size=16, token_budget=256)
+
+    assert results == [_expected(text) for text in texts]
+    for rows, width in model.batch_shapes:
+        assert rows <= 16
+        assert rows * width <= 256
+    assert sum(rows for rows, _ in model.batch_shapes) == len(texts)
+
+
+def test_predict_sentiment_without_token_budget_matches():
+    texts = ["short", "a much longer comment than the others", "", "two words"] * 5
+    budgeted = predict_sentiment(texts, WordTokenizer(), LengthModel(), device=None, batch_size=4)
+    model = LengthModel()
+    fixed = predict_sentiment(texts, WordTokenizer(), model, device=None, batch_size=4, token_budget=None)
+
+    assert fixed == budgeted == [_expected(text) for text in texts]
+    assert [rows for rows, _ in model.batch_shapes] == [4] * 5
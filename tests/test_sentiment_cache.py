@@ -0,0 +1,84 @@
+import itertools
+
+import pytest
+
+from youtube_analytics.nlp import sentiment_cache
+from youtube_analytics.nlp.sentiment_cache import CachedPredictor, SentimentCache
+
+MODEL_FP = {"model": "test-model", "revision": "1"}
+
+
+def _score(text):
+    positive = len(text) % 10 / 10
+    return {"negative": round(1 - positive, 4), "neutral": 0.0, "positive": positive}
+
+
+class CountingPredict:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [_score(text) for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    # Every call is one second later, so least recently used is well defined
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(sentiment_cache.time, "time", lambda: float(next(ticks)))
+
+
+def test_hits_misses_and_repeats(tmp_path):
+    predict = CountingPredict()
+    cached = CachedPredictor(predict, SentimentCache(MODEL_FP, str(tmp_path)))
+
+    texts = ["first", "great video", "first"]
+    assert cached(texts) == [_score(t) for t in texts]
+    assert predict.calls == [["first", "great video"]]
+    assert (cached.cache.hits, cached.cache.misses) == (1, 2)
+
+    # Same texts up to normalization are hits; only the new one reaches the model
+    texts = ["  first\n", "ﬁrst", "great   video", "new one"]
+    assert cached(texts) == [_score("first"), _score("first"), _score("great video"), _score("new one")]
+    assert predict.calls[1:] == [["new one"]]
+    assert (cached.cache.hits, cached.cache.misses) == (4, 3)
+    cached.close()
+
+
+def test_scores_persist_per_model(tmp_path):
+    predict = CountingPredict()
+    CachedPredictor(predict, SentimentCache(MODEL_FP, str(tmp_path)))(["a comment"])
+    assert len(predict.calls) == 1
+
+    # A new process with an empty memory cache reads the scores from disk
+    reopened = CachedPredictor(predict, SentimentCache(MODEL_FP, str(tmp_path)))
+    assert reopened(["a comment"]) == [_score("a comment")]
+    assert len(predict.calls) == 1
+    assert reopened.cache.seconds_per_text is not None
+
+    # Another model does not see them
+    other = CachedPredictor(predict, SentimentCache({**MODEL_FP, "revision": "2"}, str(tmp_path)))
+    other(["a comment"])
+    assert predict.calls[-1] == ["a comment"]
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = SentimentCache(MODEL_FP, str(tmp_path), max_entries=10, memory_entries=4)
+    keys = [cache.key(f"comment {i}") for i in range(10)]
+    for key in keys:
+        cache.put_many({key: _score(key)})
+    assert cache.get_many(keys[:2]) == {key: _score(key) for key in keys[:2]}  # used again
+
+    cache.put_many({cache.key("comment 10"): _score("x")})
+
+    # 11 entries over a budget of 10: down to 9, dropping the two oldest not used since
+    found = cache.get_many(keys + [cache.key("comment 10")])
+    assert set(found) == set(keys[:2] + keys[4:] + [cache.key("comment 10")])
+    assert cache.db.execute("SELECT COUNT(*) FROM scores").fetchone()[0] == 9
+    assert len(cache.memory) <= 4
+
+
+def test_cached_with_no_cache_dir_returns_predict():
+    predict = CountingPredict()
+    assert sentiment_cache.cached(predict, MODEL_FP, None) is predict
@@ -0,0 +1,84 @@
+import pytest
+
+from youtube_analytics.nlp.sentiment_cascade import CascadePredictor, CheapSentimentModel, cheap_score, evaluate
+
+TRANSFORMER = {"Negative": 0.7, "Neutral": 0.2, "Positive": 0.1}
+
+
+class RecordingPredict:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [dict(TRANSFORMER) for _ in texts]
+
+
+def _positive_model():
+    # No weights: every comment gets softmax(bias), ~0.98 Positive
+    cheap = CheapSentimentModel(buckets=1024)
+    cheap.bias = [0.0, 0.0, 4.5]
+    return cheap
+
+
+def test_threshold_and_length_decide_what_escalates():
+    cheap = _positive_model()
+    texts = ["first", "❤️❤️", "this is a long comment with more than six words in it"]
+
+    predict = RecordingPredict()
+    cascade = CascadePredictor(predict, cheap, threshold=0.9, max_words=6, audit_rate=0)
+    results = cascade(texts)
+    assert predict.calls == [[texts[2]]]
+    assert results[0] == results[1] == {"Negative": 0.01, "Neutral": 0.01, "Positive": 0.98}
+    assert results[2] == TRANSFORMER
+    assert (cascade.handled, cascade.escalated, cascade.audited) == (2, 1, 0)
+
+    predict = RecordingPredict()
+    cascade = CascadePredictor(predict, cheap, threshold=0.99, audit_rate=0)
+    assert cascade(texts) == [TRANSFORMER] * 3
+    assert predict.calls == [texts]
+    assert cheap_score(cheap, "first", 0.99, 6) is None
+
+
+def test_audited_comments_keep_the_linear_result():
+    predict = RecordingPredict()
+    cascade = CascadePredictor(predict, _positive_model(), threshold=0.9, audit_rate=1.0)
+    texts = ["nice", "a very long comment that the linear model must not score itself", "lol"]
+
+    results = cascade(texts)
+
+    # Escalations first, then the audit sample, in one transformer call
+    assert predict.calls == [[texts[1], texts[0], texts[2]]]
+    assert results[1] == TRANSFORMER
+    assert results[0]["Positive"] == results[2]["Positive"] == 0.98
+    # The transformer's top label is Negative, so no audited comment agreed
+    assert (cascade.handled, cascade.escalated, cascade.audited, cascade.agreed) == (2, 1, 2, 0)
+
+
+def test_nothing_escalated_means_no_transformer_call():
+    predict = RecordingPredict()
+    cascade = CascadePredictor(predict, _positive_model(), threshold=0.5, audit_rate=0)
+    assert len(cascade(["a", "b"])) == 2
+    assert cascade([]) == []
+    assert predict.calls == []
+
+
+def test_trained_model_round_trips(tmp_path):
+    texts = ["love it ❤️", "love this so much", "hate it", "worst video ever", "ok"] * 20
+    labels = {"love": "Positive", "hate": "Negative", "worst": "Negative", "ok": "Neutral"}
+    targets = [{label: float(label == labels[text.split()[0]]) for label in ("Negative", "Neutral", "Positive")} for text in texts]
+    cheap = CheapSentimentModel(buckets=4096)
+    cheap.train(texts, targets, epochs=10)
+
+    assert max(cheap.predict("love it")[1].items(), key=lambda kv: kv[1])[0] == "Positive"
+    assert max(cheap.predict("hate it")[1].items(), key=lambda kv: kv[1])[0] == "Negative"
+
+    path = str(tmp_path / "cascade.json")
+    cheap.save(path)
+    loaded = CheapSentimentModel.load(path)
+    for text in ("love it", "hate it", "something new"):
+        assert loaded.predict(text)[1] == pytest.approx(cheap.predict(text)[1], abs=1e-5)
+
+    rows = evaluate(cheap, texts[:5], targets[:5], [0.5, 1.0])
+    assert rows[1] == {"threshold": 1.0, "escalation_rate": 1.0, "agreement": 1.0, "handled_agreement": None}
+    assert rows[0]["escalation_rate"] < 1.0
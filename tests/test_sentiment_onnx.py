@@ -0,0 +1,39 @@
+import random
+from collections import Counter
+
+from youtube_analytics.data.synthetic import SyntheticChannel, write_channel
+from youtube_analytics.nlp.sentiment_onnx import _reservoir_sample, sample_comments
+
+
+def test_reservoir_sample_is_uniform():
+    counts = Counter()
+    for seed in range(2000):
+        sample = _reservoir_sample(iter(range(20)), 5, random.Random(seed))
+        assert len(set(sample)) == 5
+        counts.update(sample)
+    # Each item is expected 2000 * 5 / 20 = 500 times
+    assert all(400 < counts[i] < 600 for i in range(20))
+
+
+def test_reservoir_sample_shorter_stream():
+    assert _reservoir_sample(iter("abc"), 10, random.Random(0)) == ["a", "b", "c"]
+    assert _reservoir_sample(iter("abc"), 0, random.Random(0)) == []
+
+
+def test_sample_comments_is_seeded(tmp_path):
+    channel = SyntheticChannel(num_videos=5, max_comments=40, min_comments=40)
+    write_channel(channel, str(tmp_path))
+    texts = [c["comment"] for i in range(channel.num_videos) for c in channel.iter_comments(i)]
+
+    sample = sample_comments(str(tmp_path), 50, seed=3)
+    assert len(sample) == 50
+    assert Counter(sample) <= Counter(texts)
+    assert sample_comments(str(tmp_path), 50, seed=3) == sample
+    assert sample_comments(str(tmp_path), 50, seed=4) != sample
+    assert sorted(sample_comments(str(tmp_path), 1000)) == sorted(texts)
+
+
+def test_sample_comments_without_data_is_synthetic(tmp_path):
+    sample = sample_comments(str(tmp_path / "missing"), 30, seed=1)
+    assert len(sample) == 30
+    assert sample == sample_comments(str(tmp_path / "missing"), 30, seed=1)
@@ -0,0 +1,100 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from youtube_analytics.nlp.sentiment_service import DynamicBatcher, SentimentClient, make_handler
+
+
+class RecordingPredict:
+    def __init__(self):
+        self.batches = []
+        self.times = []
+
+    def __call__(self, texts):
+        self.times.append(time.monotonic())
+        self.batches.append(list(texts))
+        return [{"text": text} for text in texts]
+
+
+def _submit_concurrently(batcher, requests):
+    results = [None] * len(requests)
+
+    def run(i):
+        results[i] = batcher.submit(requests[i])
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def test_batch_is_scored_once_max_texts_are_pending():
+    predict = RecordingPredict()
+    batcher = DynamicBatcher(predict, max_wait=1.0, max_texts=10)
+    requests = [[f"r{i}-t{j}" for j in range(6)] for i in range(3)]
+
+    start = time.monotonic()
+    results = _submit_concurrently(batcher, requests)
+
+    # Two requests fill a batch without waiting out max_wait; the third is held
+    # for max_wait in case more arrive
+    assert [len(batch) for batch in predict.batches] == [12, 6]
+    assert predict.times[0] - start < 0.5
+    assert predict.times[1] - predict.times[0] >= 1.0
+    assert results == [[{"text": text} for text in texts] for texts in requests]
+    assert batcher.stats == {"requests": 3, "batches": 2, "texts": 18}
+
+
+def test_lone_request_is_scored_after_max_wait():
+    predict = RecordingPredict()
+    batcher = DynamicBatcher(predict, max_wait=0.2, max_texts=100)
+
+    start = time.monotonic()
+    assert batcher.submit(["a", "b"]) == [{"text": "a"}, {"text": "b"}]
+    assert 0.2 <= time.monotonic() - start < 2
+    assert predict.batches == [["a", "b"]]
+
+
+def test_requests_within_max_wait_share_a_batch():
+    predict = RecordingPredict()
+    batcher = DynamicBatcher(predict, max_wait=0.5, max_texts=100)
+    requests = [[f"r{i}"] for i in range(5)]
+
+    results = _submit_concurrently(batcher, requests)
+
+    assert len(predict.batches) == 1
+    assert sorted(predict.batches[0]) == sorted(t for texts in requests for t in texts)
+    assert results == [[{"text": texts[0]}] for texts in requests]
+
+
+def test_errors_reach_every_request_of_the_batch():
+    def fail(texts):
+        raise ValueError("model crashed")
+
+    batcher = DynamicBatcher(fail, max_wait=0.01)
+    with pytest.raises(RuntimeError, match="model crashed"):
+        batcher.submit(["a"])
+    # The batcher keeps serving
+    batcher.predict = RecordingPredict()
+    assert batcher.submit(["b"]) == [{"text": "b"}]
+
+
+def test_client_round_trip(monkeypatch):
+    monkeypatch.setattr("youtube_analytics.nlp.sentiment_service.REQUEST_SIZE", 3)
+    predict = RecordingPredict()
+    batcher = DynamicBatcher(predict, max_wait=0.01)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(batcher, {"model": "test", "revision": "1"}))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = SentimentClient(f"http://127.0.0.1:{server.server_address[1]}/")
+        assert client.model_fingerprint() == {"model": "test", "revision": "1"}
+        texts = [f"comment {i}" for i in range(7)]
+        assert client.score(texts) == [{"text": text} for text in texts]
+        assert [len(batch) for batch in predict.batches] == [3, 3, 1]
+    finally:
+        server.shutdown()
@@ -0,0 +1,29 @@
+import pytest
+
+from youtube_analytics.nlp import sentiment_workers
+
+
+@pytest.fixture
+def failed_worker(monkeypatch):
+    monkeypatch.setattr(sentiment_workers, "_worker", {})
+    # As left by _init_worker when loading the model fails
+    sentiment_workers._worker["error"] = OSError("model files missing")
+
+
+def test_failed_worker_reports_its_error_on_every_task(failed_worker):
+    with pytest.raises(OSError, match="model files missing"):
+        sentiment_workers._worker_fingerprint()
+    with pytest.raises(OSError, match="model files missing"):
+        sentiment_workers._score_shard((0, ["some text"]))
+
+
+def test_init_failure_is_stored(monkeypatch):
+    monkeypatch.setattr(sentiment_workers, "_worker", {})
+
+    def fail(threads=None):
+        raise OSError("model files missing")
+
+    monkeypatch.setattr("youtube_analytics.nlp.sentiment_onnx.load_onnx_model", fail)
+    sentiment_workers._init_worker(1, 8, 256, "onnx")
+    assert isinstance(sentiment_workers._worker["error"], OSError)
+    assert "model" not in sentiment_workers._worker
@@ -0,0 +1,86 @@
+import json
+import os
+
+import pytest
+
+from youtube_analytics.data import video_io
+from youtube_analytics.data.video_io import iter_video_file, read_json, write_json, write_video_file_streaming
+
+METADATA = {"video_id": "v1", "title": "Ünïcode \"quoted\" title", "view_count": 1234, "tags": ["a", "b"], "stats": {"likes": 7}}
+
+
+def _comments(n):
+    return [{"comment_id": f"c{i}", "author": "@someone", "date": f"2024-01-{i % 28 + 1:02d}T00:00:00Z", "likes": i, "num_replies": 0, "comment": "héllo 👋 " * (i % 5)} for i in range(n)]
+
+
+def _pages(comments, size):
+    return [comments[i : i + size] for i in range(0, len(comments), size)]
+
+
+@pytest.fixture(params=[("pretty", ""), ("compact", ""), ("pretty", "gz"), ("compact", "zst")])
+def encoding(request, monkeypatch):
+    data_format, compression = request.param
+    if compression == "zst":
+        pytest.importorskip("zstandard")
+    monkeypatch.setattr(video_io, "DATA_FORMAT", data_format)
+    monkeypatch.setattr(video_io, "DATA_COMPRESSION", compression)
+    # Small reads so values straddle buffer refills
+    monkeypatch.setattr(video_io, "STREAM_CHUNK_SIZE", 7)
+    return request.param
+
+
+@pytest.mark.parametrize("n_comments", [0, 1, 25])
+def test_streaming_write_round_trips(tmp_path, encoding, n_comments):
+    comments = _comments(n_comments)
+    assert write_video_file_streaming(str(tmp_path), "v1", METADATA, _pages(comments, 10)) == n_comments
+
+    metadata, stream = iter_video_file(str(tmp_path), "v1")
+    assert metadata == METADATA
+    assert list(stream) == comments
+    assert read_json(str(tmp_path), "v1") == {**METADATA, "comments": comments}
+    assert os.listdir(tmp_path) == [os.path.basename(video_io._target_path(str(tmp_path), "v1"))]
+
+
+def test_pretty_output_matches_json_dump(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_io, "DATA_FORMAT", "pretty")
+    monkeypatch.setattr(video_io, "DATA_COMPRESSION", "")
+    for n in (0, 3):
+        comments = _comments(n)
+        write_video_file_streaming(str(tmp_path), "v1", METADATA, _pages(comments, 2))
+        with open(tmp_path / "v1.json", encoding="utf-8") as f:
+            assert f.read() == json.dumps({**METADATA, "comments": comments}, indent=4, ensure_ascii=False)
+
+
+def test_fields_after_comments_are_added_to_metadata(tmp_path, encoding):
+    comments = _comments(3)
+    write_json(str(tmp_path), "v1", {"video_id": "v1", "comments": comments, "average_sentiment": 0.5})
+
+    metadata, stream = iter_video_file(str(tmp_path), "v1")
+    assert metadata == {"video_id": "v1"}
+    assert list(stream) == comments
+    assert metadata == {"video_id": "v1", "average_sentiment": 0.5}
+
+
+def test_video_without_comments(tmp_path, encoding):
+    write_json(str(tmp_path), "v1", {"video_id": "v1"})
+    assert iter_video_file(str(tmp_path), "v1") == ({"video_id": "v1"}, None)
+
+    write_json(str(tmp_path), "v2", {"video_id": "v2", "comments": None, "title": "t"})
+    metadata, stream = iter_video_file(str(tmp_path), "v2")
+    assert list(stream) == []
+    assert metadata == {"video_id": "v2", "title": "t"}
+
+
+def test_failed_write_keeps_previous_file(tmp_path, encoding):
+    write_video_file_streaming(str(tmp_path), "v1", METADATA, [_comments(2)])
+
+    def pages():
+        yield _comments(5)
+        raise ConnectionError("interrupted")
+
+    with pytest.raises(ConnectionError):
+        write_video_file_streaming(str(tmp_path), "v1", {"video_id": "v1"}, pages())
+    metadata, stream = iter_video_file(str(tmp_path), "v1")
+    assert metadata == METADATA
+    assert list(stream) == _comments(2)
+    assert len(os.listdir(tmp_path)) == 1
@@ -1,10 +1,24 @@
 import os
-import json
 import argparse
 from tqdm import tqdm
 from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
 
+from youtube_analytics.data.annotations import (
+    commit,
+    input_hash,
+    load_video,
+    video_is_current,
+)
+from youtube_analytics.data.catalog import index_channel, videos_published_since
+from youtube_analytics.data.video_io import (
+    METADATA_NAME,
+    find_data_file,
+    list_video_ids,
+    read_json,
+    write_json,
+)
+
 
 def _to_int(val: Any) -> int:
     if val is None:
@@ -68,121 +82,46 @@ def compute_video_metrics(video_data: Dict) -> Dict:
     return metrics
 
 
-def analyze_channel_engagement(
-    channel_id: str,
-    data_root: str = "data",
-    days: Optional[int] = None,
-    since: Optional[str] = None,
-) -> None:
-    channel_dir = os.path.join(data_root, channel_id)
-    if not os.path.exists(channel_dir):
-        print(f"Channel directory not found: {channel_dir}")
-        return
-
-    # compute date cutoff
-    cutoff: Optional[datetime] = None
-    if since:
-        cutoff = parse_iso_date(since)
-        if cutoff is None:
-            print(f"Could not parse --since date: {since}")
-            return
-    elif days is not None:
-        cutoff = datetime.utcnow() - timedelta(days=days)
-
-    channel_metadata_path = os.path.join(channel_dir, "channel_metadata.json")
-    channel_metadata = {}
-    if os.path.exists(channel_metadata_path):
-        try:
-            with open(channel_metadata_path, "r", encoding="utf-8") as f:
-                channel_metadata = json.load(f)
-        except Exception as e:
-            print(f"Warning: failed to load channel metadata: {e}")
-
-    per_video_summaries: List[Dict] = []
+def video_engagement_metrics(video_data: Dict) -> Dict:
+    """`compute_video_metrics` rounded the way it is stored under `engagement_metrics`."""
+    metrics = compute_video_metrics(video_data)
+    return {
+        key: round(value, 6) if isinstance(value, float) else value
+        for key, value in metrics.items()
+    }
 
-    # Aggregation accumulators **from files**
-    total_views = 0
-    total_comments = 0
-    total_likes = 0
-    videos_processed = 0
 
-    for filename in tqdm(
-        sorted(os.listdir(channel_dir)), desc=f"Processing channel {channel_id}"
-    ):
-        if filename == "channel_metadata.json" or not filename.endswith(".json"):
-            continue
+def engagement_fingerprint(video_data: Dict) -> str:
+    """Fingerprint of the fields `compute_video_metrics` reads."""
+    comments = video_data.get("comments")
+    return input_hash(
+        "engagement",
+        video_data.get("view_count"),
+        video_data.get("comment_count"),
+        video_data.get("like_count"),
+        len(comments) if comments is not None else None,
+    )
 
-        filepath = os.path.join(channel_dir, filename)
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                video_data = json.load(f)
 
-            # decide whether to include this video based on published_at and cutoff
-            pub = parse_iso_date(video_data.get("published_at"))
-            if cutoff is not None and pub is not None:
-                # include only if published_at >= cutoff
-                if pub < cutoff:
-                    # skip older video
-                    continue
-            elif cutoff is not None and pub is None:
-                # if we can't parse the date, skip with a warning
-                print(f"Skipping {filename}: missing or unparsable published_at")
-                continue
+def video_summary(video_id: str, video_data: Dict) -> Dict:
+    """Entry of `per_video_engagement_summary` for a video with `engagement_metrics`."""
+    return {
+        "video_id": video_data.get("video_id") or video_id,
+        "title": video_data.get("title", ""),
+        "published_at": video_data.get("published_at"),
+        "metrics": video_data["engagement_metrics"],
+    }
 
-            metrics = compute_video_metrics(video_data)
-
-            # attach engagement_metrics into video_data and persist
-            video_data["engagement_metrics"] = {
-                "view_count": metrics["view_count"],
-                "comment_count": metrics["comment_count"],
-                "like_count": metrics["like_count"],
-                "comment_rate": (
-                    round(metrics["comment_rate"], 6)
-                    if metrics["comment_rate"] is not None
-                    else None
-                ),
-                "like_rate": (
-                    round(metrics["like_rate"], 6)
-                    if metrics["like_rate"] is not None
-                    else None
-                ),
-                "engagement_rate": (
-                    round(metrics["engagement_rate"], 6)
-                    if metrics["engagement_rate"] is not None
-                    else None
-                ),
-                "engaged_like_ratio": (
-                    round(metrics["engaged_like_ratio"], 6)
-                    if metrics["engaged_like_ratio"] is not None
-                    else None
-                ),
-            }
-
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(video_data, f, indent=2, ensure_ascii=False)
-
-            # update aggregates
-            total_views += metrics["view_count"]
-            total_comments += metrics["comment_count"]
-            total_likes += metrics["like_count"]
-            videos_processed += 1
-
-            per_video_summaries.append(
-                {
-                    "video_id": video_data.get("video_id")
-                    or filename.replace(".json", ""),
-                    "title": video_data.get("title", ""),
-                    "published_at": video_data.get("published_at"),
-                    "metrics": video_data["engagement_metrics"],
-                }
-            )
 
-        except Exception as e:
-            print(f"Error processing {filename}: {e}")
+def summarize_channel_engagement(per_video_summaries: List[Dict]) -> Dict:
+    """Channel-level engagement metrics from the per-video summaries."""
+    total_views = sum(v["metrics"]["view_count"] for v in per_video_summaries)
+    total_comments = sum(v["metrics"]["comment_count"] for v in per_video_summaries)
+    total_likes = sum(v["metrics"]["like_count"] for v in per_video_summaries)
 
     # channel-level metrics computed from the included videos only
     channel_engagement: Dict = {}
-    channel_engagement["videos_included"] = videos_processed
+    channel_engagement["videos_included"] = len(per_video_summaries)
     channel_engagement["total_view_count"] = total_views
     channel_engagement["total_comment_count"] = total_comments
     channel_engagement["total_like_count"] = total_likes
@@ -240,13 +179,28 @@ def analyze_channel_engagement(
         engaged_like_ratios
     )
 
+    return channel_engagement
+
+
+def write_channel_engagement(channel_dir: str, per_video_summaries: List[Dict]) -> None:
+    """Stores the channel-level rollup in `channel_metadata.json`."""
+    channel_metadata = {}
+    if find_data_file(channel_dir, METADATA_NAME):
+        try:
+            channel_metadata = read_json(channel_dir, METADATA_NAME)
+        except Exception as e:
+            print(f"Warning: failed to load channel metadata: {e}")
+
     # attach to channel_metadata and save
-    channel_metadata["engagement_metrics"] = channel_engagement
+    channel_metadata["engagement_metrics"] = summarize_channel_engagement(
+        per_video_summaries
+    )
     channel_metadata["per_video_engagement_summary"] = per_video_summaries
 
     try:
-        with open(channel_metadata_path, "w", encoding="utf-8") as f:
-            json.dump(channel_metadata, f, indent=2, ensure_ascii=False)
+        channel_metadata_path = write_json(
+            channel_dir, METADATA_NAME, channel_metadata, indent=2
+        )
         print(
             f"Wrote channel metadata with engagement metrics to: {channel_metadata_path}"
         )
@@ -254,6 +208,90 @@ def analyze_channel_engagement(
         print(f"Failed to write channel metadata file: {e}")
 
 
+def analyze_channel_engagement(
+    channel_id: str,
+    data_root: str = "data",
+    days: Optional[int] = None,
+    since: Optional[str] = None,
+    force: bool = False,
+) -> None:
+    channel_dir = os.path.join(data_root, channel_id)
+    if not os.path.exists(channel_dir):
+        print(f"Channel directory not found: {channel_dir}")
+        return
+
+    # compute date cutoff
+    cutoff: Optional[datetime] = None
+    if since:
+        cutoff = parse_iso_date(since)
+        if cutoff is None:
+            print(f"Could not parse --since date: {since}")
+            return
+    elif days is not None:
+        cutoff = datetime.utcnow() - timedelta(days=days)
+
+    per_video_summaries: List[Dict] = []
+    skipped = 0
+
+    video_ids = list_video_ids(channel_dir)
+    if cutoff is not None:
+        # let the catalog discard older videos without parsing their JSONs
+        try:
+            index_channel(channel_id, data_root)
+            video_ids = videos_published_since(
+                channel_id, cutoff.strftime("%Y-%m-%d"), data_root, include_undated=True
+            )
+        except Exception as e:
+            print(f"Warning: catalog unavailable, scanning all files: {e}")
+
+    for video_id in tqdm(video_ids, desc=f"Processing channel {channel_id}"):
+        try:
+            video_data = load_video(channel_dir, video_id, ["engagement"])
+
+            # decide whether to include this video based on published_at and cutoff
+            pub = parse_iso_date(video_data.get("published_at"))
+            if cutoff is not None and pub is not None:
+                # include only if published_at >= cutoff
+                if pub < cutoff:
+                    # skip older video
+                    continue
+            elif cutoff is not None and pub is None:
+                # if we can't parse the date, skip with a warning
+                print(f"Skipping {video_id}: missing or unparsable published_at")
+                continue
+
+            # counts unchanged since the last run: keep the stored metrics
+            fingerprint = engagement_fingerprint(video_data)
+            if (
+                not force
+                and "engagement_metrics" in video_data
+                and video_is_current(channel_dir, "engagement", video_id, fingerprint)
+            ):
+                skipped += 1
+            else:
+                # attach engagement_metrics into video_data and persist
+                video_data["engagement_metrics"] = video_engagement_metrics(video_data)
+
+                commit(
+                    channel_dir,
+                    "engagement",
+                    video_id,
+                    video={"engagement_metrics": video_data["engagement_metrics"]},
+                    inputs={"video": fingerprint},
+                )
+
+            per_video_summaries.append(video_summary(video_id, video_data))
+
+        except Exception as e:
+            print(f"Error processing {video_id}: {e}")
+
+    if skipped:
+        print(
+            f"Skipped {skipped} of {len(per_video_summaries)} videos with unchanged counts (use --force to recompute)"
+        )
+    write_channel_engagement(channel_dir, per_video_summaries)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Compute engagement metrics for a channel's video JSONs (aggregated from files)"
@@ -278,6 +316,11 @@ if __name__ == "__main__":
         default=None,
         help="Analyze only videos published on or after this date (YYYY-MM-DD)",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Recompute videos whose counts did not change since the last run",
+    )
 
     args = parser.parse_args()
 
@@ -286,4 +329,5 @@ if __name__ == "__main__":
         data_root=args.data_root,
         days=args.days,
         since=args.since,
+        force=args.force,
     )
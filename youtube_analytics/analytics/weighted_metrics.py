@@ -1,10 +1,33 @@
-import json
 import argparse
+import hashlib
+import json
 import math
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, Iterable, Iterator, List, Any
 from tqdm import tqdm
 
+from youtube_analytics.data.annotations import (
+    commit,
+    input_hash,
+    iter_video,
+    read_inputs,
+)
+from youtube_analytics.data.video_io import list_video_ids
+from youtube_analytics.data.comment_store import (
+    SENTIMENT_LABELS,
+    has_store,
+    read_comments,
+    write_columns,
+)
+
+# Comment weights per sidecar commit
+COMMIT_SIZE = 1024
+
+# Columns of the columnar comment store this stage reads
+STORE_COLUMNS = ["video_id", "likes", "num_replies", "assigned_topics", "weight"] + [
+    f"sentiment_{label.lower()}" for label in SENTIMENT_LABELS
+]
+
 
 def compute_comment_weight(
     likes: int, replies: int, like_weight: float, reply_weight: float
@@ -20,11 +43,179 @@ def compute_comment_weight(
     )
 
 
+def compute_video_weighted_metrics(
+    comments: List[Dict[str, Any]], like_weight: float, reply_weight: float
+) -> Dict[str, Any]:
+    """
+    Sets `weight` on each comment and returns the video's weighted sentiment,
+    topic dominance and topic-specific sentiment.
+    """
+    total_video_weight = 0.0
+
+    # Accumulators for weighted sums
+    sentiment_weighted_sum = {}
+    topic_weighted_sum = {}
+    topic_sentiment_weighted_sum = {}  # To hold sentiment specifically for each topic
+
+    # 1. Compute weights per comment and accumulate sums
+    for comment in comments:
+        likes = int(comment.get("likes", 0))
+        num_replies = int(comment.get("num_replies", 0))
+
+        w_i = compute_comment_weight(likes, num_replies, like_weight, reply_weight)
+        comment["weight"] = round(w_i, 3)
+        total_video_weight += w_i
+
+        # Accumulate Global Video Sentiment
+        if "sentiment" in comment and isinstance(comment["sentiment"], dict):
+            for label, score in comment["sentiment"].items():
+                sentiment_weighted_sum[label] = sentiment_weighted_sum.get(
+                    label, 0.0
+                ) + (score * w_i)
+
+        # Accumulate Topics and Topic-Specific Sentiment
+        if "assigned_topics" in comment and isinstance(
+            comment["assigned_topics"], list
+        ):
+            for topic_entry in comment["assigned_topics"]:
+                label = topic_entry.get("label")
+                topic_score = topic_entry.get("score", 0.0)
+
+                if label:
+                    # Topic Impact = Engagement Weight * Model Confidence
+                    impact = topic_score * w_i
+                    topic_weighted_sum[label] = (
+                        topic_weighted_sum.get(label, 0.0) + impact
+                    )
+
+                    # Initialize topic-specific sentiment dictionary if not exists
+                    if label not in topic_sentiment_weighted_sum:
+                        topic_sentiment_weighted_sum[label] = {
+                            "Negative": 0.0,
+                            "Neutral": 0.0,
+                            "Positive": 0.0,
+                            "_total_impact": 0.0,
+                        }
+
+                    topic_sentiment_weighted_sum[label]["_total_impact"] += impact
+
+                    # Distribute the impact across the comment's sentiment
+                    if "sentiment" in comment and isinstance(
+                        comment["sentiment"], dict
+                    ):
+                        for sent_label, sent_score in comment["sentiment"].items():
+                            topic_sentiment_weighted_sum[label][sent_label] += (
+                                sent_score * impact
+                            )
+
+    # 2. Calculate final weighted scores (Normalized)
+    weighted_sentiment = {}
+    weighted_topics = {}
+    topic_specific_sentiment = {}
+
+    # Normalize Video Sentiment
+    if total_video_weight > 0:
+        for label, total_score in sentiment_weighted_sum.items():
+            weighted_sentiment[label] = round(total_score / total_video_weight, 4)
+
+    # Normalize Topic Share (Relative Dominance)
+    total_topic_impact = sum(topic_weighted_sum.values())
+    if total_topic_impact > 0:
+        for label, total_score in topic_weighted_sum.items():
+            weighted_topics[label] = round(total_score / total_topic_impact, 4)
+
+    # Normalize Topic-Specific Sentiment
+    for label, sent_data in topic_sentiment_weighted_sum.items():
+        t_impact = sent_data.pop("_total_impact")  # Remove the meta-key
+        if t_impact > 0:
+            topic_specific_sentiment[label] = {
+                s_label: round(s_score / t_impact, 4)
+                for s_label, s_score in sent_data.items()
+            }
+
+    return {
+        "sentiment": weighted_sentiment,
+        "topic_dominance": weighted_topics,
+        "topic_specific_sentiment": topic_specific_sentiment,
+    }
+
+
+def _weighted_hasher(like_weight: float, reply_weight: float):
+    return hashlib.blake2b(
+        input_hash("weighted", like_weight, reply_weight).encode(), digest_size=8
+    )
+
+
+def _hash_comments(
+    comments: Iterable[Dict[str, Any]], hasher
+) -> Iterator[Dict[str, Any]]:
+    """Passes `comments` through, feeding what the weighted metrics read to `hasher`."""
+    for c in comments:
+        inputs = [
+            int(c.get("likes", 0)),
+            int(c.get("num_replies", 0)),
+            c.get("sentiment"),
+            c.get("assigned_topics"),
+        ]
+        hasher.update(json.dumps(inputs, sort_keys=True).encode())
+        yield c
+
+
+def weighted_fingerprint(
+    comments: Iterable[Dict[str, Any]], like_weight: float, reply_weight: float
+) -> str:
+    """Fingerprint of everything `compute_video_weighted_metrics` reads."""
+    hasher = _weighted_hasher(like_weight, reply_weight)
+    for _ in _hash_comments(comments, hasher):
+        pass
+    return hasher.hexdigest()
+
+
+def _tally(
+    comments: Iterable[Dict[str, Any]], seen: Dict[str, Any]
+) -> Iterator[Dict[str, Any]]:
+    """Passes `comments` through, counting them and whether all have a weight."""
+    for c in comments:
+        seen["comments"] += 1
+        seen["weighted"] &= c.get("weight") is not None
+        yield c
+
+
+def _commit_weights(
+    channel_dir: str, video_id: str, comments: Iterable[Dict[str, Any]]
+) -> Iterator[Dict[str, Any]]:
+    """Passes `comments` through, appending their weights to the sidecar in chunks."""
+    pending = {}
+    for comment in comments:
+        yield comment
+        # compute_video_weighted_metrics has set the weight before asking for the next one
+        pending[comment["comment_id"]] = {"weight": comment["weight"]}
+        if len(pending) >= COMMIT_SIZE:
+            commit(channel_dir, "weighted", video_id, comments=pending)
+            pending = {}
+    if pending:
+        commit(channel_dir, "weighted", video_id, comments=pending)
+
+
+def _comment_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    comment = {"likes": row["likes"], "num_replies": row["num_replies"]}
+    if row["sentiment_negative"] is not None:
+        comment["sentiment"] = {
+            label: row[f"sentiment_{label.lower()}"] for label in SENTIMENT_LABELS
+        }
+    if row["assigned_topics"] is not None:
+        comment["assigned_topics"] = row["assigned_topics"]
+    if row["weight"] is not None:
+        comment["weight"] = row["weight"]
+    return comment
+
+
 def calculate_weighted_metrics(
     channel_id: str,
     data_root: str = "data",
     like_weight: float = 1.0,
     reply_weight: float = 1.5,  # Slightly higher default for replies as they show active engagement
+    force: bool = False,
 ):
     channel_dir = Path(data_root) / channel_id
     if not channel_dir.exists():
@@ -32,136 +223,99 @@ def calculate_weighted_metrics(
         return
 
     # Get list of video files (excluding metadata)
-    video_files = [
-        p for p in channel_dir.glob("*.json") if p.name != "channel_metadata.json"
-    ]
+    video_ids = list_video_ids(str(channel_dir))
 
-    if not video_files:
+    if not video_ids:
         print("No video files found.")
         return
 
     print(
-        f"Computing weighted metrics for {len(video_files)} videos in channel {channel_id}..."
+        f"Computing weighted metrics for {len(video_ids)} videos in channel {channel_id}..."
     )
 
-    for video_file in tqdm(video_files, desc="Processing videos"):
-        try:
-            with open(video_file, "r", encoding="utf-8") as f:
-                data = json.load(f)
+    # Columnar store: comments come from the store instead of the video JSONs
+    store_rows = None
+    store_comments: Dict[str, List[Dict[str, Any]]] = {}
+    if has_store(str(channel_dir)):
+        table = read_comments(str(channel_dir), STORE_COLUMNS)
+        store_rows = []
+        for row in table.to_pylist():
+            comment = _comment_from_row(row)
+            store_rows.append(comment)
+            store_comments.setdefault(row["video_id"], []).append(comment)
 
-            comments = data.get("comments", [])
-            if not comments:
+    processed = skipped = 0
+    for video_id in tqdm(video_ids, desc="Processing videos"):
+        try:
+            # merged view: includes sentiment and topics from the annotation sidecars.
+            # Comments are streamed from the video file, never held all at once.
+            data, comments = iter_video(str(channel_dir), video_id)
+            if store_rows is not None:
+                comments = store_comments.get(video_id, [])
+            if comments is None:
                 continue
 
-            total_video_weight = 0.0
-
-            # Accumulators for weighted sums
-            sentiment_weighted_sum = {}
-            topic_weighted_sum = {}
-            topic_sentiment_weighted_sum = (
-                {}
-            )  # To hold sentiment specifically for each topic
-
-            # 1. Compute weights per comment and accumulate sums
-            for comment in comments:
-                likes = int(comment.get("likes", 0))
-                num_replies = int(comment.get("num_replies", 0))
-
-                w_i = compute_comment_weight(
-                    likes, num_replies, like_weight, reply_weight
+            # Ran before: compare fingerprints first, then stream again if needed
+            recorded = (
+                None
+                if force
+                else read_inputs(str(channel_dir), "weighted", video_id)[0]
+            )
+            if recorded is not None:
+                seen = {"comments": 0, "weighted": True}
+                fingerprint = weighted_fingerprint(
+                    _tally(comments, seen), like_weight, reply_weight
                 )
-                comment["weight"] = round(w_i, 3)
-                total_video_weight += w_i
-
-                # Accumulate Global Video Sentiment
-                if "sentiment" in comment and isinstance(comment["sentiment"], dict):
-                    for label, score in comment["sentiment"].items():
-                        sentiment_weighted_sum[label] = sentiment_weighted_sum.get(
-                            label, 0.0
-                        ) + (score * w_i)
-
-                # Accumulate Topics and Topic-Specific Sentiment
-                if "assigned_topics" in comment and isinstance(
-                    comment["assigned_topics"], list
-                ):
-                    for topic_entry in comment["assigned_topics"]:
-                        label = topic_entry.get("label")
-                        topic_score = topic_entry.get("score", 0.0)
-
-                        if label:
-                            # Topic Impact = Engagement Weight * Model Confidence
-                            impact = topic_score * w_i
-                            topic_weighted_sum[label] = (
-                                topic_weighted_sum.get(label, 0.0) + impact
-                            )
+                if not seen["comments"]:
+                    continue
+                # Same comments, sentiment, topics and weights as last time: nothing to do
+                if seen["weighted"] and fingerprint == recorded:
+                    processed += 1
+                    skipped += 1
+                    continue
+                if store_rows is None:
+                    _, comments = iter_video(str(channel_dir), video_id)
 
-                            # Initialize topic-specific sentiment dictionary if not exists
-                            if label not in topic_sentiment_weighted_sum:
-                                topic_sentiment_weighted_sum[label] = {
-                                    "Negative": 0.0,
-                                    "Neutral": 0.0,
-                                    "Positive": 0.0,
-                                    "_total_impact": 0.0,
-                                }
-
-                            topic_sentiment_weighted_sum[label][
-                                "_total_impact"
-                            ] += impact
-
-                            # Distribute the impact across the comment's sentiment
-                            if "sentiment" in comment and isinstance(
-                                comment["sentiment"], dict
-                            ):
-                                for sent_label, sent_score in comment[
-                                    "sentiment"
-                                ].items():
-                                    topic_sentiment_weighted_sum[label][sent_label] += (
-                                        sent_score * impact
-                                    )
-
-            # 2. Calculate final weighted scores (Normalized)
-            weighted_sentiment = {}
-            weighted_topics = {}
-            topic_specific_sentiment = {}
-
-            # Normalize Video Sentiment
-            if total_video_weight > 0:
-                for label, total_score in sentiment_weighted_sum.items():
-                    weighted_sentiment[label] = round(
-                        total_score / total_video_weight, 4
-                    )
+            seen = {"comments": 0, "weighted": True}
+            hasher = _weighted_hasher(like_weight, reply_weight)
+            comments = _hash_comments(_tally(comments, seen), hasher)
+            if store_rows is None:
+                # weights go to the sidecar as they are computed
+                comments = _commit_weights(str(channel_dir), video_id, comments)
+            video_metrics = compute_video_weighted_metrics(
+                comments, like_weight, reply_weight
+            )
+            if not seen["comments"]:
+                continue
+            processed += 1
 
-            # Normalize Topic Share (Relative Dominance)
-            total_topic_impact = sum(topic_weighted_sum.values())
-            if total_topic_impact > 0:
-                for label, total_score in topic_weighted_sum.items():
-                    weighted_topics[label] = round(total_score / total_topic_impact, 4)
-
-            # Normalize Topic-Specific Sentiment
-            for label, sent_data in topic_sentiment_weighted_sum.items():
-                t_impact = sent_data.pop("_total_impact")  # Remove the meta-key
-                if t_impact > 0:
-                    topic_specific_sentiment[label] = {
-                        s_label: round(s_score / t_impact, 4)
-                        for s_label, s_score in sent_data.items()
+            # 3. Append to the weighted sidecar (weights go to the store if there is one)
+            commit(
+                str(channel_dir),
+                "weighted",
+                video_id,
+                video={
+                    "weighted_metrics": {
+                        **data.get("weighted_metrics", {}),
+                        **video_metrics,
                     }
-
-            # 3. Write back to video data
-            if "weighted_metrics" not in data:
-                data["weighted_metrics"] = {}
-
-            data["weighted_metrics"]["sentiment"] = weighted_sentiment
-            data["weighted_metrics"]["topic_dominance"] = weighted_topics
-            data["weighted_metrics"][
-                "topic_specific_sentiment"
-            ] = topic_specific_sentiment
-
-            # Save the file
-            with open(video_file, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+                },
+                inputs={"video": hasher.hexdigest()},
+            )
 
         except Exception as e:
-            print(f"Error processing {video_file.name}: {e}")
+            print(f"Error processing {video_id}: {e}")
+
+    if skipped:
+        print(
+            f"Skipped {skipped} of {processed} videos with unchanged inputs (use --force to recompute)"
+        )
+    if store_rows is not None and skipped < processed:
+        write_columns(
+            str(channel_dir),
+            "weight",
+            {"weight": [c.get("weight") for c in store_rows]},
+        )
 
 
 if __name__ == "__main__":
@@ -186,6 +340,11 @@ if __name__ == "__main__":
         default=1.5,
         help="Scaling coefficient for reply count",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Recompute videos whose inputs did not change since the last run",
+    )
 
     args = parser.parse_args()
 
@@ -194,4 +353,5 @@ if __name__ == "__main__":
         data_root=args.data_root,
         like_weight=args.like_weight,
         reply_weight=args.reply_weight,
+        force=args.force,
     )
@@ -0,0 +1,257 @@
+"""
+Append-only annotation sidecars.
+
+Analysis stages no longer rewrite `<video_id>.json`; each stage appends its
+results for a video to
+
+    data/<channel_id>/.annotations/<stage>/<video_id>.jsonl
+
+One line is one commit: `{"video": {...}, "comments": {comment_id: {...}}}`,
+written with a single append so a crash leaves at most a truncated last line.
+Readers ignore it, and the next commit starts a new line after it; lines that do
+not decode are skipped with a warning. Later commits win. Fetched video files stay write-once and
+different stages never touch the same file, so stages can run in parallel.
+
+A commit may also record the fingerprints of the inputs it was computed from,
+`"inputs": {"video": "<hash>", "comments": {comment_id: "<hash>"}}`, so reruns
+can skip the videos and comments whose inputs did not change.
+
+`load_video` is the merged view: the raw video JSON with every stage's
+annotations applied, i.e. what the enriched JSON used to look like.
+
+    python -m youtube_analytics.data.annotations materialize <channel_id> --out merged/
+    python -m youtube_analytics.data.annotations compact <channel_id>
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from youtube_analytics.data.video_io import (
+    dumps,
+    iter_video_file,
+    list_video_ids,
+    loads,
+    read_json,
+    write_json,
+    write_video_file,
+)
+
+ANNOTATIONS_DIRNAME = ".annotations"
+# Merge order when several stages set the same field
+STAGES = ("sentiment", "topics", "engagement", "weighted", "flags")
+
+
+def annotations_dir(channel_dir: str) -> str:
+    return os.path.join(channel_dir, ANNOTATIONS_DIRNAME)
+
+
+def sidecar_path(channel_dir: str, stage: str, video_id: str) -> str:
+    return os.path.join(annotations_dir(channel_dir), stage, f"{video_id}.jsonl")
+
+
+def commit(
+    channel_dir: str,
+    stage: str,
+    video_id: str,
+    video: Optional[Dict] = None,
+    comments: Optional[Dict[str, Dict]] = None,
+    inputs: Optional[Dict] = None,
+) -> None:
+    """
+    Appends one commit of `stage` results for a video: `video` holds top-level
+    fields (e.g. {"engagement_metrics": {...}}), `comments` maps comment_id to
+    per-comment fields (e.g. {"Ugx...": {"sentiment": {...}}}), `inputs` the
+    fingerprints of what they were computed from (see `input_hash`).
+    """
+    path = sidecar_path(channel_dir, stage, video_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    record = {"video": video or {}, "comments": comments or {}}
+    if inputs:
+        record["inputs"] = inputs
+    line = dumps(record, indent=None) + "\n"
+    fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        size = os.fstat(fd).st_size
+        if size and os.pread(fd, 1, size - 1) != b"\n":
+            # An interrupted commit left a partial line: end it, so this commit
+            # starts on a line of its own and only the partial one is lost
+            line = "\n" + line
+        os.write(fd, line.encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def _read_sidecar(path: str) -> Iterable[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.endswith("\n"):
+                break  # interrupted commit
+            if not line.strip():
+                continue
+            try:
+                yield loads(line)
+            except ValueError:
+                # partial line of an interrupted commit, ended by a later one
+                print(f"Skipping unreadable line {number} of {path}")
+
+
+def read_annotations(channel_dir: str, video_id: str, stages: Iterable[str] = STAGES) -> Tuple[Dict, Dict[str, Dict]]:
+    """Merges every commit of `stages` for a video into (video fields, {comment_id: fields})."""
+    video: Dict = {}
+    comments: Dict[str, Dict] = {}
+    for stage in stages:
+        path = sidecar_path(channel_dir, stage, video_id)
+        if not os.path.exists(path):
+            continue
+        for record in _read_sidecar(path):
+            video.update(record["video"])
+            for comment_id, fields in record["comments"].items():
+                if comment_id in comments:
+                    comments[comment_id].update(fields)
+                else:
+                    comments[comment_id] = fields
+    return video, comments
+
+
+def read_inputs(channel_dir: str, stage: str, video_id: str) -> Tuple[Optional[str], Dict[str, str]]:
+    """Latest recorded input fingerprints of `stage` for a video: (video, {comment_id: comment})."""
+    video: Optional[str] = None
+    comments: Dict[str, str] = {}
+    path = sidecar_path(channel_dir, stage, video_id)
+    if os.path.exists(path):
+        for record in _read_sidecar(path):
+            inputs = record.get("inputs") or {}
+            video = inputs.get("video", video)
+            comments.update(inputs.get("comments") or {})
+    return video, comments
+
+
+def input_hash(*parts: Any) -> str:
+    """Short stable hash of JSON-serializable inputs (texts, counts, model name, parameters)."""
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def video_is_current(channel_dir: str, stage: str, video_id: str, fingerprint: str) -> bool:
+    """Whether `stage` last ran on this video with inputs fingerprinted as `fingerprint`."""
+    return read_inputs(channel_dir, stage, video_id)[0] == fingerprint
+
+
+def dirty_comments(channel_dir: str, stage: str, video_id: str, fingerprints: Dict[str, str]) -> Set[str]:
+    """IDs in `fingerprints` ({comment_id: hash}) that `stage` has not processed with these inputs."""
+    recorded = read_inputs(channel_dir, stage, video_id)[1]
+    return {comment_id for comment_id, h in fingerprints.items() if recorded.get(comment_id) != h}
+
+
+def sidecar_mtime(channel_dir: str, video_id: str) -> Optional[int]:
+    """Latest mtime (ns) of the video's sidecars, or None when it has none."""
+    mtimes = [
+        os.stat(path).st_mtime_ns
+        for path in (sidecar_path(channel_dir, stage, video_id) for stage in STAGES)
+        if os.path.exists(path)
+    ]
+    return max(mtimes) if mtimes else None
+
+
+def load_video(channel_dir: str, video_id: str, stages: Iterable[str] = STAGES) -> Dict:
+    """The video JSON with all annotations applied (the merged view)."""
+    video_data = read_json(channel_dir, video_id)
+    video_fields, comment_fields = read_annotations(channel_dir, video_id, stages)
+    video_data.update(video_fields)
+    if comment_fields:
+        for comment in video_data.get("comments") or []:
+            comment.update(comment_fields.get(comment.get("comment_id"), {}))
+    return video_data
+
+
+def iter_video(
+    channel_dir: str, video_id: str, stages: Iterable[str] = STAGES
+) -> Tuple[Dict, Optional[Iterator[Dict]]]:
+    """
+    Streaming `load_video`: (video fields, comments) where `comments` yields the
+    merged comments one at a time (see `video_io.iter_video_file`). Only the
+    annotations are held in memory, not the comment texts.
+    """
+    video_data, comments = iter_video_file(channel_dir, video_id)
+    video_fields, comment_fields = read_annotations(channel_dir, video_id, stages)
+    video_data.update(video_fields)
+    if comments is None:
+        return video_data, None
+
+    def merged():
+        for comment in comments:
+            comment.update(comment_fields.get(comment.get("comment_id"), {}))
+            yield comment
+        # Raw fields stored after the comments must not override the annotations
+        video_data.update(video_fields)
+
+    return video_data, merged()
+
+
+def compact(channel_id: str, data_root: str = "data") -> int:
+    """
+    Rewrites every sidecar of a channel as a single commit. Not safe while a
+    stage is writing to the channel. Returns the number of sidecars compacted.
+    """
+    root = annotations_dir(os.path.join(data_root, channel_id))
+    if not os.path.exists(root):
+        return 0
+    compacted = 0
+    for stage in sorted(os.listdir(root)):
+        for filename in sorted(os.listdir(os.path.join(root, stage))):
+            if not filename.endswith(".jsonl"):
+                continue
+            path = os.path.join(root, stage, filename)
+            channel_dir, video_id = os.path.join(data_root, channel_id), filename[: -len(".jsonl")]
+            video, comments = read_annotations(channel_dir, video_id, [stage])
+            record = {"video": video, "comments": comments}
+            video_input, comment_inputs = read_inputs(channel_dir, stage, video_id)
+            if video_input is not None or comment_inputs:
+                record["inputs"] = {
+                    key: value for key, value in (("video", video_input), ("comments", comment_inputs)) if value
+                }
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(dumps(record, indent=None) + "\n")
+            os.replace(tmp_path, path)
+            compacted += 1
+    return compacted
+
+
+def materialize(channel_id: str, data_root: str = "data", out_dir: Optional[str] = None) -> int:
+    """
+    Writes the merged view of every video of a channel to `out_dir` (default: in
+    place over the raw video JSONs). Returns the number of videos written.
+    """
+    channel_dir = os.path.join(data_root, channel_id)
+    out_dir = out_dir or channel_dir
+    os.makedirs(out_dir, exist_ok=True)
+    written = 0
+    for video_id in list_video_ids(channel_dir):
+        video_data = load_video(channel_dir, video_id)
+        comments = video_data.pop("comments", None)
+        if comments is None:
+            # Columnar-store channels keep no comments in the video JSON
+            write_json(out_dir, video_id, video_data)
+        else:
+            write_video_file(out_dir, video_id, video_data, comments)
+        written += 1
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge or compact the annotation sidecars of a channel")
+    parser.add_argument("command", choices=["materialize", "compact"])
+    parser.add_argument("channel_id", help="The YouTube channel ID (folder name)")
+    parser.add_argument("--data-root", default="data", help="Root directory for data files (default: data)")
+    parser.add_argument("--out", default=None, help="materialize: output folder (default: overwrite the video JSONs)")
+    args = parser.parse_args()
+
+    if args.command == "materialize":
+        n = materialize(args.channel_id, data_root=args.data_root, out_dir=args.out)
+        print(f"Wrote {n} merged video files to {args.out or os.path.join(args.data_root, args.channel_id)}")
+    else:
+        print(f"Compacted {compact(args.channel_id, data_root=args.data_root)} sidecar files")
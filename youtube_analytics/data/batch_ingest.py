@@ -0,0 +1,214 @@
+"""
+Batch ingestion of many channels from a manifest.
+
+The manifest is either a text file with one channel URL/identifier per line
+(blank lines and lines starting with # are ignored) or a JSON list whose
+entries are strings or objects like
+
+    {"channel": "https://www.youtube.com/@somechannel", "num_videos": 20, "num_comments": 200, "mode": "refresh"}
+
+Per-entry keys override the command-line defaults. `mode` is one of "fetch"
+(fetch_channel_data), "backfill" (backfill_channel) or "refresh"
+(refresh_channel_data).
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from youtube_analytics.data.channel_data import backfill_channel, fetch_channel_data, refresh_channel_data
+from youtube_analytics.data.client import get_client_pool
+from youtube_analytics.data.quota import QuotaExhausted
+
+MODES = ("fetch", "backfill", "refresh")
+
+
+def load_manifest(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            entries = json.load(f)
+        else:
+            entries = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    return [_as_entry(e) for e in entries]
+
+
+def _as_entry(entry) -> Dict:
+    return {"channel": entry} if isinstance(entry, str) else dict(entry)
+
+
+def _run_job(job: Dict, data_dir: str, max_workers: int, requests_per_second: Optional[float]) -> Dict:
+    stats: Dict = {}
+    mode = job.get("mode", "fetch")
+    if mode == "backfill":
+        info = backfill_channel(
+            job["channel"],
+            num_comments=job["num_comments"],
+            data_dir=data_dir,
+            max_workers=max_workers,
+            requests_per_second=requests_per_second,
+            stats=stats,
+        )
+    elif mode in ("fetch", "refresh"):
+        fetch = fetch_channel_data if mode == "fetch" else refresh_channel_data
+        info = fetch(
+            job["channel"],
+            num_videos=job["num_videos"],
+            num_comments=job["num_comments"],
+            data_dir=data_dir,
+            max_workers=max_workers,
+            requests_per_second=requests_per_second,
+            stats=stats,
+        )
+    else:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+    if info is None:
+        raise LookupError("Channel not found")
+    stats["channel_id"] = info["channel_id"]
+    return stats
+
+
+def ingest_channel(job: Dict, data_dir: str, max_workers: int, requests_per_second: Optional[float], retries: int, retry_delay: float) -> Dict:
+    """Runs one manifest entry with retries. Never raises except for QuotaExhausted."""
+    result = {"channel": job["channel"], "mode": job.get("mode", "fetch"), "status": "failed", "attempts": 0}
+    start = time.perf_counter()
+    for attempt in range(retries + 1):
+        result["attempts"] = attempt + 1
+        try:
+            result.update(_run_job(job, data_dir, max_workers, requests_per_second))
+            result["status"] = "ok"
+            result.pop("error", None)
+            break
+        except QuotaExhausted:
+            raise
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+            print(f"[{job['channel']}] attempt {attempt + 1} failed: {result['error']}")
+            if attempt < retries:
+                time.sleep(retry_delay * (2**attempt))
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(
+    manifest: List[Dict],
+    data_dir: str = "./data/",
+    num_videos: int = 10,
+    num_comments: int = 50,
+    mode: str = "fetch",
+    channel_workers: int = 4,
+    comment_workers: int = 4,
+    requests_per_second: Optional[float] = None,
+    retries: int = 2,
+    retry_delay: float = 5.0,
+    summary_path: Optional[str] = None,
+) -> Dict:
+    """
+    Ingests every channel in `manifest` on a pool of `channel_workers` threads,
+    each fetching comments with `comment_workers` threads. A failing channel is
+    retried and then recorded without affecting the others; once the API quota is
+    exhausted the remaining channels are marked as skipped. Writes and returns a
+    run summary (throughput, failures, per-channel timings).
+    """
+    jobs = [
+        {"num_videos": num_videos, "num_comments": num_comments, "mode": mode, **_as_entry(entry)}
+        for entry in manifest
+    ]
+    started_at = datetime.now()
+    start = time.perf_counter()
+    results: Dict[int, Dict] = {}
+    quota_error = None
+    quota_hit = threading.Event()
+
+    def ingest(job):
+        # A worker can pick up the next job before the main thread cancels it
+        if quota_hit.is_set():
+            raise CancelledError()
+        try:
+            return ingest_channel(job, data_dir, comment_workers, requests_per_second, retries, retry_delay)
+        except QuotaExhausted:
+            quota_hit.set()
+            raise
+
+    with ThreadPoolExecutor(max_workers=channel_workers) as executor:
+        futures = {executor.submit(ingest, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except (QuotaExhausted, CancelledError) as e:
+                if isinstance(e, QuotaExhausted):
+                    quota_error = str(e)
+                    # Channels that have not started yet would fail the same way
+                    for other in futures:
+                        other.cancel()
+                results[i] = {"channel": jobs[i]["channel"], "mode": jobs[i]["mode"], "status": "skipped"}
+    for result in results.values():
+        if result["status"] == "skipped":
+            result["error"] = quota_error
+
+    wall_seconds = time.perf_counter() - start
+    ok = [r for r in results.values() if r["status"] == "ok"]
+    total_comments = sum(r.get("comments", 0) for r in ok)
+    summary = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "wall_seconds": round(wall_seconds, 3),
+        "channels_total": len(jobs),
+        "channels_ok": len(ok),
+        "channels_failed": sum(r["status"] == "failed" for r in results.values()),
+        "channels_skipped": sum(r["status"] == "skipped" for r in results.values()),
+        "videos_fetched": sum(r.get("videos", 0) for r in ok),
+        "comments_fetched": total_comments,
+        "channels_per_minute": round(len(ok) / wall_seconds * 60, 3) if wall_seconds else None,
+        "comments_per_second": round(total_comments / wall_seconds, 3) if wall_seconds else None,
+        "quota_exhausted": quota_error,
+        "api_requests": sum(s["requests"] for s in get_client_pool().stats()),
+        "channels": [results[i] for i in sorted(results)],
+    }
+
+    if summary_path is None:
+        summary_path = os.path.join(data_dir, ".runs", f"ingest_{started_at:%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(summary_path) or ".", exist_ok=True)
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    print(
+        f"Ingested {summary['channels_ok']}/{summary['channels_total']} channels "
+        f"({summary['channels_failed']} failed, {summary['channels_skipped']} skipped) "
+        f"in {wall_seconds:.1f}s, {summary['comments_per_second']} comments/s. Summary: {summary_path}"
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest many YouTube channels listed in a manifest")
+    parser.add_argument("manifest", help="Text file (one channel per line) or JSON list of channel entries")
+    parser.add_argument("--data-dir", default="./data/", help="Root directory for data files (default: ./data/)")
+    parser.add_argument("--mode", choices=MODES, default="fetch", help="Default ingestion mode (default: fetch)")
+    parser.add_argument("--num-videos", type=int, default=10, help="Latest videos per channel (default: 10)")
+    parser.add_argument("--num-comments", type=int, default=50, help="Comments per video (default: 50)")
+    parser.add_argument("--channel-workers", type=int, default=4, help="Channels ingested in parallel (default: 4)")
+    parser.add_argument("--comment-workers", type=int, default=4, help="Comment fetch threads per channel (default: 4)")
+    parser.add_argument("--rps", type=float, default=None, help="Per-channel request rate limit (requests/second)")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per failed channel (default: 2)")
+    parser.add_argument("--summary", default=None, help="Where to write the run summary JSON")
+
+    args = parser.parse_args()
+
+    run_batch(
+        load_manifest(args.manifest),
+        data_dir=args.data_dir,
+        num_videos=args.num_videos,
+        num_comments=args.num_comments,
+        mode=args.mode,
+        channel_workers=args.channel_workers,
+        comment_workers=args.comment_workers,
+        requests_per_second=args.rps,
+        retries=args.retries,
+        summary_path=args.summary,
+    )
@@ -0,0 +1,351 @@
+"""
+SQLite catalog of everything under `data/`, kept in `data/.catalog.sqlite`.
+
+It indexes channels, videos (published_at, duration, counts, file mtime and
+which analysis stages have run) and comments (id, video, date, likes), so date
+windows, cross-channel lookups and "which videos still need sentiment" are index
+lookups instead of parsing every video JSON.
+
+Indexing is incremental: a video file (or columnar comment store) is only parsed
+again when its mtime changed, streamed so its comments are never all in memory.
+Stage status is refreshed from the (small) annotation sidecars alone when they
+change, so `index_channel` is cheap to call before every query, including after
+a stage run. The catalog is derived data; deleting it just means the next index
+run parses everything once.
+
+    python -m youtube_analytics.data.catalog index
+    python -m youtube_analytics.data.catalog find <comment, video or channel id>
+    python -m youtube_analytics.data.catalog pending sentiment
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional
+
+from youtube_analytics.data import comment_store
+from youtube_analytics.data.annotations import read_annotations, sidecar_mtime
+from youtube_analytics.data.video_io import METADATA_NAME, find_data_file, iter_video_file, list_video_ids, read_json
+
+CATALOG_FILENAME = ".catalog.sqlite"
+STAGES = ("engagement", "sentiment", "weighted")
+# Bumped when the schema changes; older catalogs are rebuilt
+CATALOG_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    channel_id TEXT PRIMARY KEY,
+    username TEXT,
+    subscriber_count INTEGER,
+    view_count INTEGER,
+    video_count INTEGER,
+    metadata_mtime INTEGER,
+    store_mtime INTEGER
+);
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    channel_id TEXT NOT NULL,
+    title TEXT,
+    published_at TEXT,
+    duration_seconds INTEGER,
+    view_count INTEGER,
+    like_count INTEGER,
+    comment_count INTEGER,
+    stored_comments INTEGER,
+    comments_without_sentiment INTEGER,
+    has_engagement INTEGER,
+    has_weighted INTEGER,
+    file_engagement INTEGER,
+    file_weighted INTEGER,
+    file_mtime INTEGER,
+    sidecar_mtime INTEGER
+);
+CREATE INDEX IF NOT EXISTS videos_channel_published ON videos (channel_id, published_at);
+CREATE TABLE IF NOT EXISTS comments (
+    comment_id TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    date TEXT,
+    likes INTEGER,
+    has_sentiment INTEGER
+);
+CREATE INDEX IF NOT EXISTS comments_video ON comments (video_id);
+CREATE INDEX IF NOT EXISTS comments_channel_date ON comments (channel_id, date);
+"""
+
+
+def _to_int(val) -> Optional[int]:
+    try:
+        return int(val)
+    except (TypeError, ValueError):
+        return None
+
+
+def catalog_path(data_root: str = "data") -> str:
+    return os.path.join(data_root, CATALOG_FILENAME)
+
+
+def connect(data_root: str = "data") -> sqlite3.Connection:
+    os.makedirs(data_root, exist_ok=True)
+    conn = sqlite3.connect(catalog_path(data_root))
+    conn.row_factory = sqlite3.Row
+    if conn.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+        with conn:
+            for table in ("channels", "videos", "comments"):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _channel_ids(data_root: str) -> List[str]:
+    return sorted(
+        d for d in os.listdir(data_root) if not d.startswith(".") and os.path.isdir(os.path.join(data_root, d))
+    )
+
+
+def _index_video(conn: sqlite3.Connection, channel_id: str, channel_dir: str, video_id: str, mtime: int, from_store: bool) -> None:
+    # Streams the raw file; annotations are applied by _index_annotations
+    video_data, comments = iter_video_file(channel_dir, video_id)
+    rows = []
+    if comments is not None and not from_store:
+        for c in comments:
+            if c.get("comment_id"):
+                rows.append((c["comment_id"], video_id, channel_id, c.get("date"), _to_int(c.get("likes")), int(isinstance(c.get("sentiment"), dict))))
+    conn.execute(
+        "INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            video_id,
+            channel_id,
+            video_data.get("title"),
+            video_data.get("published_at"),
+            _to_int(video_data.get("duration_seconds")),
+            _to_int(video_data.get("view_count")),
+            _to_int(video_data.get("like_count")),
+            _to_int(video_data.get("comment_count")),
+            None if from_store else len(rows),
+            None if from_store else sum(not row[5] for row in rows),
+            int("engagement_metrics" in video_data),
+            int("weighted_metrics" in video_data),
+            int("engagement_metrics" in video_data),
+            int("weighted_metrics" in video_data),
+            mtime,
+            None,
+        ),
+    )
+    if not from_store:
+        conn.execute("DELETE FROM comments WHERE video_id = ?", (video_id,))
+        conn.executemany("INSERT OR REPLACE INTO comments VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+
+def _index_annotations(conn: sqlite3.Connection, channel_dir: str, video_id: str, mtime: Optional[int], from_store: bool) -> None:
+    """Stage status of an indexed video from its raw file's flags plus its sidecars, without opening the video file."""
+    video_fields, _ = read_annotations(channel_dir, video_id, ["engagement", "weighted"])
+    conn.execute(
+        "UPDATE videos SET has_engagement = file_engagement OR ?, has_weighted = file_weighted OR ?, sidecar_mtime = ? WHERE video_id = ?",
+        (int("engagement_metrics" in video_fields), int("weighted_metrics" in video_fields), mtime, video_id),
+    )
+    if from_store:
+        return  # sentiment lives in the store, see _index_store
+    _, sentiments = read_annotations(channel_dir, video_id, ["sentiment"])
+    scored = {comment_id for comment_id, fields in sentiments.items() if isinstance(fields.get("sentiment"), dict)}
+    unscored = [row["comment_id"] for row in conn.execute("SELECT comment_id FROM comments WHERE video_id = ? AND NOT has_sentiment", (video_id,))]
+    conn.execute(
+        "UPDATE videos SET comments_without_sentiment = ? WHERE video_id = ?",
+        (sum(comment_id not in scored for comment_id in unscored), video_id),
+    )
+
+
+def _index_store(conn: sqlite3.Connection, channel_id: str, channel_dir: str) -> None:
+    table = comment_store.read_comments(channel_dir, ["comment_id", "video_id", "date", "likes", "sentiment_negative"])
+    conn.execute("DELETE FROM comments WHERE channel_id = ?", (channel_id,))
+    counts: Dict[str, List[int]] = {}
+    rows = []
+    for row in table.to_pylist():
+        rows.append((row["comment_id"], row["video_id"], channel_id, row["date"], row["likes"], int(row["sentiment_negative"] is not None)))
+        count = counts.setdefault(row["video_id"], [0, 0])
+        count[0] += 1
+        count[1] += row["sentiment_negative"] is None
+    conn.executemany("INSERT OR REPLACE INTO comments VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.execute(
+        "UPDATE videos SET stored_comments = 0, comments_without_sentiment = 0 WHERE channel_id = ?", (channel_id,)
+    )
+    conn.executemany(
+        "UPDATE videos SET stored_comments = ?, comments_without_sentiment = ? WHERE video_id = ?",
+        [(n, missing, video_id) for video_id, (n, missing) in counts.items()],
+    )
+
+
+def index_channel(channel_id: str, data_root: str = "data", conn: Optional[sqlite3.Connection] = None) -> int:
+    """
+    Brings the catalog up to date for one channel folder. Only files whose mtime
+    changed since the last run are parsed, and only sidecars that changed are
+    read. Returns the number of data files parsed.
+    """
+    own_conn = conn is None
+    conn = conn or connect(data_root)
+    channel_dir = os.path.join(data_root, channel_id)
+    parsed = 0
+    try:
+        with conn:
+            known = {
+                row["video_id"]: (row["file_mtime"], row["sidecar_mtime"])
+                for row in conn.execute("SELECT video_id, file_mtime, sidecar_mtime FROM videos WHERE channel_id = ?", (channel_id,))
+            }
+            channel_row = conn.execute(
+                "SELECT metadata_mtime, store_mtime FROM channels WHERE channel_id = ?", (channel_id,)
+            ).fetchone()
+
+            metadata_path = find_data_file(channel_dir, METADATA_NAME)
+            metadata_mtime = os.stat(metadata_path).st_mtime_ns if metadata_path else None
+            # Changes with every write to the store, including the sentiment columns
+            store_mtime = comment_store.store_mtime(channel_dir)
+            has_store = store_mtime is not None
+
+            if channel_row is None or channel_row["metadata_mtime"] != metadata_mtime:
+                metadata = {}
+                if metadata_mtime is not None:
+                    metadata = read_json(channel_dir, METADATA_NAME)
+                    parsed += 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO channels VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        channel_id,
+                        metadata.get("username"),
+                        _to_int(metadata.get("subscriber_count")),
+                        _to_int(metadata.get("view_count")),
+                        _to_int(metadata.get("video_count")),
+                        metadata_mtime,
+                        channel_row["store_mtime"] if channel_row else None,
+                    ),
+                )
+
+            seen = set()
+            for video_id in list_video_ids(channel_dir):
+                seen.add(video_id)
+                path = find_data_file(channel_dir, video_id)
+                mtime = os.stat(path).st_mtime_ns
+                annotations_mtime = sidecar_mtime(channel_dir, video_id)
+                file_mtime, indexed_annotations_mtime = known.get(video_id, (None, None))
+                try:
+                    if file_mtime != mtime:
+                        _index_video(conn, channel_id, channel_dir, video_id, mtime, has_store)
+                        parsed += 1
+                    elif indexed_annotations_mtime == annotations_mtime:
+                        continue
+                    _index_annotations(conn, channel_dir, video_id, annotations_mtime, has_store)
+                except Exception as e:
+                    print(f"Error indexing {path}: {e}")
+
+            for video_id in set(known) - seen:
+                conn.execute("DELETE FROM videos WHERE video_id = ?", (video_id,))
+                conn.execute("DELETE FROM comments WHERE video_id = ?", (video_id,))
+
+            stored_mtime = channel_row["store_mtime"] if channel_row else None
+            if has_store and (stored_mtime != store_mtime or parsed):
+                _index_store(conn, channel_id, channel_dir)
+                conn.execute("UPDATE channels SET store_mtime = ? WHERE channel_id = ?", (store_mtime, channel_id))
+            elif not has_store and stored_mtime is not None:
+                conn.execute("UPDATE channels SET store_mtime = NULL WHERE channel_id = ?", (channel_id,))
+    finally:
+        if own_conn:
+            conn.close()
+    return parsed
+
+
+def index_all(data_root: str = "data") -> int:
+    """Indexes every channel folder under `data_root` and drops channels that were removed."""
+    conn = connect(data_root)
+    try:
+        channel_ids = _channel_ids(data_root)
+        parsed = sum(index_channel(channel_id, data_root, conn) for channel_id in channel_ids)
+        with conn:
+            for row in conn.execute("SELECT channel_id FROM channels").fetchall():
+                if row["channel_id"] not in channel_ids:
+                    for table in ("channels", "videos", "comments"):
+                        conn.execute(f"DELETE FROM {table} WHERE channel_id = ?", (row["channel_id"],))
+    finally:
+        conn.close()
+    return parsed
+
+
+def videos_published_since(channel_id: str, since: str, data_root: str = "data", include_undated: bool = False) -> List[str]:
+    """
+    Video IDs of the channel published on or after `since` (YYYY-MM-DD), oldest
+    first, as of the last `index_channel` run.
+    """
+    conn = connect(data_root)
+    try:
+        query = "SELECT video_id FROM videos WHERE channel_id = ? AND (published_at >= ?"
+        query += " OR published_at IS NULL)" if include_undated else ")"
+        return [row["video_id"] for row in conn.execute(query + " ORDER BY published_at", (channel_id, since))]
+    finally:
+        conn.close()
+
+
+def videos_needing(stage: str, channel_id: Optional[str] = None, data_root: str = "data") -> List[Dict]:
+    """
+    Videos (with their channel_id) on which `stage` has not run yet, optionally
+    for one channel, as of the last index run.
+    """
+    conditions = {
+        "engagement": "has_engagement = 0",
+        "sentiment": "comments_without_sentiment > 0",
+        "weighted": "has_weighted = 0 AND stored_comments > 0",
+    }
+    if stage not in conditions:
+        raise ValueError(f"Unknown stage {stage!r}, expected one of {STAGES}")
+    query = f"SELECT video_id, channel_id FROM videos WHERE {conditions[stage]}"
+    params: tuple = ()
+    if channel_id is not None:
+        query += " AND channel_id = ?"
+        params = (channel_id,)
+    conn = connect(data_root)
+    try:
+        return [dict(row) for row in conn.execute(query + " ORDER BY channel_id, video_id", params)]
+    finally:
+        conn.close()
+
+
+def find(identifier: str, data_root: str = "data") -> Optional[Dict]:
+    """Looks `identifier` up as a comment, video or channel ID. Returns the row and its kind, or None."""
+    conn = connect(data_root)
+    try:
+        for kind, table, key in (("comment", "comments", "comment_id"), ("video", "videos", "video_id"), ("channel", "channels", "channel_id")):
+            row = conn.execute(f"SELECT * FROM {table} WHERE {key} = ?", (identifier,)).fetchone()
+            if row is not None:
+                return {"kind": kind, **dict(row)}
+        return None
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain and query the SQLite catalog of the data/ folder")
+    parser.add_argument("--data-root", default="data", help="Root directory for data files (default: data)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    index_parser = subparsers.add_parser("index", help="Bring the catalog up to date")
+    index_parser.add_argument("channel_id", nargs="?", help="Only index this channel")
+    find_parser = subparsers.add_parser("find", help="Look up a comment, video or channel ID")
+    find_parser.add_argument("identifier")
+    pending_parser = subparsers.add_parser("pending", help="List videos a stage has not processed yet")
+    pending_parser.add_argument("stage", choices=STAGES)
+    pending_parser.add_argument("--channel-id", default=None)
+    args = parser.parse_args()
+
+    if args.command == "index":
+        if args.channel_id:
+            parsed = index_channel(args.channel_id, args.data_root)
+        else:
+            parsed = index_all(args.data_root)
+        print(f"Catalog up to date ({parsed} files parsed): {catalog_path(args.data_root)}")
+    elif args.command == "find":
+        if os.path.isdir(args.data_root):
+            index_all(args.data_root)
+        print(json.dumps(find(args.identifier, args.data_root), indent=2, ensure_ascii=False))
+    else:
+        if os.path.isdir(args.data_root):
+            index_all(args.data_root)
+        for row in videos_needing(args.stage, args.channel_id, args.data_root):
+            print(f"{row['channel_id']}/{row['video_id']}")
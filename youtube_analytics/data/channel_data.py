@@ -1,10 +1,22 @@
-from googleapiclient.discovery import build
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import json
 import math
 import re
 import os
 from datetime import datetime
-from config import API_KEY
+from youtube_analytics.data import comment_store
+from youtube_analytics.data.client import get_client_pool
+from youtube_analytics.data.quota import QuotaExhausted, estimate_fetch_quota
+from youtube_analytics.data.rate_limit import RateLimiter
+from youtube_analytics.data.response_cache import CacheMiss
+from youtube_analytics.data.video_io import find_data_file, read_json, write_json, write_video_file, write_video_file_streaming
+
+# API limits: playlistItems.list returns at most 50 items, videos.list accepts at most 50 IDs
+PLAYLIST_PAGE_SIZE = 50
+VIDEO_IDS_PER_REQUEST = 50
+CHECKPOINT_FILENAME = ".backfill_checkpoint"
+ETAGS_FILENAME = ".etags"
 
 def format_date(iso_string):
     try:
@@ -23,8 +35,9 @@ def format_duration(iso_duration: str) -> int:
         total_seconds = (days * 86400) + (hours * 3600) + (minutes * 60) + seconds
     return total_seconds
 
-def get_channel_info(channel_identifier):
-    youtube = build("youtube", "v3", developerKey=API_KEY)
+def get_channel_info(channel_identifier, limiter=None):
+    pool = get_client_pool()
+    youtube = pool.service
 
     if "youtube.com" in channel_identifier:
         match = re.search(r"youtube\.com\/(channel|c|@)\/([^\/?]+)", channel_identifier)
@@ -35,7 +48,7 @@ def get_channel_info(channel_identifier):
             if identifier_type == "channel":
                 channel_id = identifier_value
             else:
-                search_response = youtube.search().list(part="snippet", q=identifier_value, type="channel", maxResults=1).execute()
+                search_response = pool.execute(youtube.search().list(part="snippet", q=identifier_value, type="channel", maxResults=1), limiter)
                 if "items" in search_response and search_response["items"]:
                     channel_id = search_response["items"][0]["snippet"]["channelId"]
                 else:
@@ -43,7 +56,7 @@ def get_channel_info(channel_identifier):
         else:
             match_handle = re.search(r"youtube\.com\/@([^\/?]+)", channel_identifier)
             if match_handle:
-                search_response = youtube.search().list(part="snippet", q=match_handle.group(1), type="channel", maxResults=1).execute()
+                search_response = pool.execute(youtube.search().list(part="snippet", q=match_handle.group(1), type="channel", maxResults=1), limiter)
                 if "items" in search_response and search_response["items"]:
                     channel_id = search_response["items"][0]["snippet"]["channelId"]
                 else:
@@ -51,13 +64,13 @@ def get_channel_info(channel_identifier):
             else:
                 return None
     else:
-        response = youtube.channels().list(part="snippet,contentDetails", forUsername=channel_identifier).execute()
+        response = pool.execute(youtube.channels().list(part="snippet,contentDetails", forUsername=channel_identifier), limiter)
         if "items" in response and response["items"]:
             channel_id = response["items"][0]["id"]
         else:
             return None
 
-    channel_response = youtube.channels().list(part="snippet,contentDetails,statistics", id=channel_id).execute()
+    channel_response = pool.execute(youtube.channels().list(part="snippet,contentDetails,statistics", id=channel_id), limiter)
     if not channel_response.get("items"):
         return None
 
@@ -73,30 +86,55 @@ def get_channel_info(channel_identifier):
         "video_count": channel_data["statistics"]["videoCount"],
     }
 
-def get_last_videos(playlist_id, N=10):
-    youtube = build("youtube", "v3", developerKey=API_KEY)
-    request = youtube.playlistItems().list(part="snippet", playlistId=playlist_id, maxResults=N)
-    response = request.execute()
+def iter_playlist_pages(playlist_id, page_token=None, limiter=None, page_size=PLAYLIST_PAGE_SIZE):
+    """Yields (videos, next_page_token) for each page of a playlist, starting at `page_token`."""
+    pool = get_client_pool()
+    youtube = pool.service
+    while True:
+        request = youtube.playlistItems().list(part="snippet", playlistId=playlist_id, maxResults=page_size, pageToken=page_token)
+        response = pool.execute(request, limiter)
+
+        videos = []
+        for item in response.get("items", []):
+            videos.append({
+                "video_id": item["snippet"]["resourceId"]["videoId"],
+                "title": item["snippet"]["title"],
+                "published_at": format_date(item["snippet"]["publishedAt"])
+            })
+        page_token = response.get("nextPageToken")
+        yield videos, page_token
+        if not page_token:
+            break
 
+def get_last_videos(playlist_id, N=10, limiter=None):
+    """Returns the N most recent uploads, paging past the 50-item API limit. N=None returns all."""
     videos = []
-    for item in response.get("items", []):
-        videos.append({
-            "video_id": item["snippet"]["resourceId"]["videoId"],
-            "title": item["snippet"]["title"],
-            "published_at": format_date(item["snippet"]["publishedAt"])
-        })
+    page_size = PLAYLIST_PAGE_SIZE if N is None else min(N, PLAYLIST_PAGE_SIZE)
+    for page, _ in iter_playlist_pages(playlist_id, limiter=limiter, page_size=page_size):
+        videos.extend(page)
+        if N is not None and len(videos) >= N:
+            return videos[:N]
     return videos
 
-def get_video_metadata(video_ids):
+def get_video_metadata(video_ids, limiter=None):
     if isinstance(video_ids, str):
         video_ids = [video_ids]
 
     video_metadata = {}
-    youtube = build("youtube", "v3", developerKey=API_KEY)
-    request = youtube.videos().list(part="snippet,statistics,contentDetails,topicDetails", id=",".join(video_ids))
+    pool = get_client_pool()
+    youtube = pool.service
+
+    for start in range(0, len(video_ids), VIDEO_IDS_PER_REQUEST):
+        chunk = video_ids[start : start + VIDEO_IDS_PER_REQUEST]
+        request = youtube.videos().list(part="snippet,statistics,contentDetails,topicDetails", id=",".join(chunk))
+        try:
+            response = pool.execute(request, limiter)
+        except (QuotaExhausted, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Error fetching video metadata: {e}")
+            continue
 
-    try:
-        response = request.execute()
         for item in response.get("items", []):
             snippet = item["snippet"]
             statistics = item.get("statistics", {})
@@ -114,48 +152,90 @@ def get_video_metadata(video_ids):
                 "caption": content.get("caption", ""),
                 "topics": topics.get("topicCategories", []),
             }
-    except Exception as e:
-        print(f"Error fetching video metadata: {e}")
 
     return video_metadata
 
-def get_comments(video_id, num_comments=100):
-    youtube = build("youtube", "v3", developerKey=API_KEY)
+def _parse_comment_thread(item, video_id):
+    snippet = item["snippet"]["topLevelComment"]["snippet"]
+    return {
+        "comment_id": item["id"],
+        "video_id": video_id,
+        "author": snippet["authorDisplayName"],
+        "date": format_date(snippet["publishedAt"]),
+        "likes": snippet["likeCount"],
+        "comment": snippet["textDisplay"],
+        "num_replies": item["snippet"]["totalReplyCount"],
+    }
+
+def iter_comment_pages(video_id, num_comments=100, limiter=None):
+    """Generator version of `get_comments`: yields each page of parsed comments as it arrives."""
+    pool = get_client_pool()
+    youtube = pool.service
     num_to_request = min(num_comments, 100)
     request = youtube.commentThreads().list(part="snippet", videoId=video_id, textFormat="plainText", maxResults=num_to_request)
 
     n_requests = math.ceil(num_comments / 100)
-    comments = []
 
     for _ in range(n_requests):
         try:
-            response = request.execute()
+            response = pool.execute(request, limiter)
             if "items" not in response:
                 break
+        except (QuotaExhausted, CacheMiss):
+            raise
         except Exception as e:
             print(f"Error fetching comments for video {video_id}: {e}")
             break
 
-        for item in response.get("items", []):
-            snippet = item["snippet"]["topLevelComment"]["snippet"]
-            comments.append({
-                "comment_id": item["id"],
-                "video_id": video_id,
-                "author": snippet["authorDisplayName"],
-                "date": format_date(snippet["publishedAt"]),
-                "likes": snippet["likeCount"],
-                "comment": snippet["textDisplay"],
-                "num_replies": item["snippet"]["totalReplyCount"],
-            })
+        yield [_parse_comment_thread(item, video_id) for item in response.get("items", [])]
 
         request = youtube.commentThreads().list_next(request, response)
         if request is None:
             break
 
-    return comments
+def get_comments(video_id, num_comments=100, limiter=None):
+    return [comment for page in iter_comment_pages(video_id, num_comments, limiter) for comment in page]
+
+def fetch_comments_concurrently(video_ids, num_comments=100, max_workers=8, limiter=None):
+    """Fetches comments for several videos in parallel; pages of one video stay sequential."""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {vid: executor.submit(get_comments, vid, num_comments, limiter) for vid in video_ids}
+        return {vid: future.result() for vid, future in futures.items()}
+
+def plan_quota(channel_url, num_videos, num_comments, video_count=None):
+    """Prints the estimated quota cost of a fetch job and warns if the configured keys can't cover it."""
+    estimate = estimate_fetch_quota(channel_url, num_videos, num_comments, video_count)
+    keys = get_client_pool().keys
+    remaining = keys.remaining() if keys is not None else None
+    print(f"Estimated quota usage: {estimate['total']} units ({remaining if remaining is not None else 'unknown'} left today)")
+    if remaining is not None and estimate["total"] > remaining:
+        print("Warning: this job may run out of quota before it finishes")
+    return estimate
+
+def _stream_videos(channel_folder, video_ids, num_comments, max_workers=1, limiter=None):
+    """Fetches and writes videos one at a time per worker, in chunks of 50 for metadata. Returns the comment count."""
+    def fetch_and_write(vid, metadata):
+        return write_video_file_streaming(channel_folder, vid, metadata, iter_comment_pages(vid, num_comments, limiter))
 
-def fetch_channel_data(channel_url, num_videos=10, num_comments=50, data_dir="./data/"):
-    channel_info = get_channel_info(channel_url)
+    n_comments = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for start in range(0, len(video_ids), VIDEO_IDS_PER_REQUEST):
+            chunk = video_ids[start : start + VIDEO_IDS_PER_REQUEST]
+            metadata = get_video_metadata(chunk, limiter)
+            n_comments += sum(executor.map(lambda vid: fetch_and_write(vid, metadata.get(vid, {})), chunk))
+    return n_comments
+
+def fetch_channel_data(channel_url, num_videos=10, num_comments=50, data_dir="./data/", max_workers=1, requests_per_second=None, stats=None, stream=False):
+    """
+    Fetches the last `num_videos` videos of a channel; `stats`, if given, receives
+    video/comment counts. With `stream=True` each video file is written as soon as
+    its comments are fetched, page by page, instead of after the whole channel.
+    """
+    # One limiter for the whole job so that all worker threads share the same budget
+    limiter = RateLimiter(requests_per_second) if requests_per_second else None
+    plan_quota(channel_url, num_videos, num_comments)
+
+    channel_info = get_channel_info(channel_url, limiter)
     if not channel_info:
         print("Channel not found!")
         return None
@@ -163,30 +243,301 @@ def fetch_channel_data(channel_url, num_videos=10, num_comments=50, data_dir="./
     channel_folder = os.path.join(data_dir, channel_info["channel_id"])
     os.makedirs(channel_folder, exist_ok=True)
 
-    with open(os.path.join(channel_folder, "channel_metadata.json"), "w", encoding="utf-8") as f:
-        json.dump(channel_info, f, indent=4, ensure_ascii=False)
+    write_json(channel_folder, "channel_metadata", channel_info)
 
-    videos = get_last_videos(channel_info["uploads_playlist_id"], num_videos)
+    videos = get_last_videos(channel_info["uploads_playlist_id"], num_videos, limiter)
     video_ids = [video["video_id"] for video in videos]
-    
-    comments_data = {vid: get_comments(vid, num_comments) for vid in video_ids}
-    video_metadata_dict = get_video_metadata(video_ids)
 
+    if stream:
+        n_comments = _stream_videos(channel_folder, video_ids, num_comments, max_workers, limiter)
+        if stats is not None:
+            stats.update(videos=len(videos), comments=n_comments)
+        print(f"Data saved to folder: {channel_folder}")
+        return channel_info
+
+    if max_workers > 1:
+        comments_data = fetch_comments_concurrently(video_ids, num_comments, max_workers, limiter)
+    else:
+        comments_data = {vid: get_comments(vid, num_comments, limiter) for vid in video_ids}
+    video_metadata_dict = get_video_metadata(video_ids, limiter)
+
+    n_comments = 0
     for video in videos:
         vid = video["video_id"]
-        video_data = {
-            **video_metadata_dict.get(vid, {}),
-            "comments": comments_data.get(vid, []),
-        }
-        with open(os.path.join(channel_folder, f"{vid}.json"), "w", encoding="utf-8") as vf:
-            json.dump(video_data, vf, indent=4, ensure_ascii=False)
+        n_comments += write_video_file(channel_folder, vid, video_metadata_dict.get(vid, {}), comments_data.get(vid, []))
 
+    if stats is not None:
+        stats.update(videos=len(videos), comments=n_comments)
     print(f"Data saved to folder: {channel_folder}")
     return channel_info
 
+def _load_state(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: ignoring unreadable state file {path}: {e}")
+        return None
+
+def _save_state(path, checkpoint):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def backfill_channel(channel_url, num_comments=100, data_dir="./data/", max_workers=8, requests_per_second=None, max_pending_pages=2, stats=None):
+    """
+    Fetches every upload of a channel, one playlist page (50 videos) at a time.
+
+    Each page's metadata is fetched in a single videos().list call and its comments
+    are handed to a thread pool, so playlist paging runs ahead of comment fetching
+    by up to `max_pending_pages` pages. Once all videos of a page are written, the
+    page token after it is saved to `<channel_folder>/.backfill_checkpoint`; a rerun
+    resumes from there and skips videos whose JSON already exists. The checkpoint
+    is removed when the backfill completes. If given, `stats` is updated with the
+    number of videos and comments fetched.
+    """
+    limiter = RateLimiter(requests_per_second) if requests_per_second else None
+
+    channel_info = get_channel_info(channel_url, limiter)
+    if not channel_info:
+        print("Channel not found!")
+        return None
+
+    plan_quota(channel_url, None, num_comments, int(channel_info["video_count"]))
+
+    channel_folder = os.path.join(data_dir, channel_info["channel_id"])
+    os.makedirs(channel_folder, exist_ok=True)
+    write_json(channel_folder, "channel_metadata", channel_info)
+
+    checkpoint_path = os.path.join(channel_folder, CHECKPOINT_FILENAME)
+    checkpoint = _load_state(checkpoint_path) or {"page_token": None, "pages_done": 0, "videos_done": 0}
+    if checkpoint["pages_done"]:
+        print(f"Resuming backfill after page {checkpoint['pages_done']} ({checkpoint['videos_done']} videos done)")
+
+    def fetch_and_write(vid, metadata):
+        return write_video_file_streaming(channel_folder, vid, metadata, iter_comment_pages(vid, num_comments, limiter))
+
+    # (page_token after this page, number of videos on it, futures) in playlist order
+    pending = deque()
+    fetched = {"videos": 0, "comments": 0}
+
+    def drain(max_pending):
+        # Checkpoint finished pages in order, blocking while more than max_pending are in flight
+        while pending and (len(pending) > max_pending or all(f.done() for f in pending[0][2])):
+            next_token, n_videos, futures = pending.popleft()
+            for future in futures:
+                fetched["comments"] += future.result()
+            fetched["videos"] += len(futures)
+            checkpoint["page_token"] = next_token
+            checkpoint["pages_done"] += 1
+            checkpoint["videos_done"] += n_videos
+            _save_state(checkpoint_path, checkpoint)
+
+    # A checkpoint without a page token means the last run finished paging already
+    finished = checkpoint["pages_done"] > 0 and not checkpoint["page_token"]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pages = [] if finished else iter_playlist_pages(channel_info["uploads_playlist_id"], checkpoint["page_token"], limiter)
+        for videos, next_token in pages:
+            todo = [v["video_id"] for v in videos if find_data_file(channel_folder, v["video_id"]) is None]
+            metadata = get_video_metadata(todo, limiter) if todo else {}
+            futures = [executor.submit(fetch_and_write, vid, metadata.get(vid, {})) for vid in todo]
+            pending.append((next_token, len(videos), futures))
+            drain(max_pending_pages)
+        drain(0)
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    if stats is not None:
+        stats.update(fetched)
+    print(f"Backfilled {checkpoint['videos_done']} videos into folder: {channel_folder}")
+    return channel_info
+
+def get_new_comments(video_id, known_ids, newest_date=None, num_comments=100, etag=None, limiter=None):
+    """
+    Fetches comments newer than the ones already stored, newest first, and stops
+    paging at the first already-known comment ID (or a comment older than
+    `newest_date`). The first page is requested with If-None-Match: `etag`, so an
+    unchanged thread list costs one 304 round trip.
+
+    Returns (new_comments, etag_of_first_page).
+    """
+    pool = get_client_pool()
+    youtube = pool.service
+    request = youtube.commentThreads().list(part="snippet", videoId=video_id, textFormat="plainText", order="time", maxResults=min(num_comments, 100))
+
+    new_comments = []
+    try:
+        response = pool.execute_conditional(request, etag, limiter)
+    except (QuotaExhausted, CacheMiss):
+        raise
+    except Exception as e:
+        print(f"Error fetching comments for video {video_id}: {e}")
+        return new_comments, etag
+    if response is None:
+        return new_comments, etag
+    first_page_etag = response.get("etag")
+
+    while True:
+        for item in response.get("items", []):
+            comment = _parse_comment_thread(item, video_id)
+            if comment["comment_id"] in known_ids or (newest_date and comment["date"] < newest_date):
+                return new_comments, first_page_etag
+            new_comments.append(comment)
+            if len(new_comments) >= num_comments:
+                return new_comments, first_page_etag
+
+        request = youtube.commentThreads().list_next(request, response)
+        if request is None:
+            break
+        try:
+            response = pool.execute(request, limiter, revalidate=True)
+        except (QuotaExhausted, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Error fetching comments for video {video_id}: {e}")
+            break
+
+    return new_comments, first_page_etag
+
+def get_video_statistics(video_ids, etags=None, limiter=None):
+    """
+    Fetches only the statistics part for `video_ids` in 50-ID chunks. Each chunk is
+    a conditional request keyed by its IDs in `etags`; chunks answered with 304 are
+    left out of the result. `etags` is updated in place.
+    """
+    etags = etags if etags is not None else {}
+    pool = get_client_pool()
+    youtube = pool.service
+    video_ids = sorted(video_ids)
+
+    statistics = {}
+    for start in range(0, len(video_ids), VIDEO_IDS_PER_REQUEST):
+        chunk = video_ids[start : start + VIDEO_IDS_PER_REQUEST]
+        key = "videos:" + ",".join(chunk)
+        request = youtube.videos().list(part="statistics", id=",".join(chunk))
+        try:
+            response = pool.execute_conditional(request, etags.get(key), limiter)
+        except (QuotaExhausted, CacheMiss):
+            raise
+        except Exception as e:
+            print(f"Error fetching video statistics: {e}")
+            continue
+        if response is None:
+            continue
+        etags[key] = response.get("etag")
+        for item in response.get("items", []):
+            stats = item.get("statistics", {})
+            statistics[item["id"]] = {
+                "view_count": stats.get("viewCount", "0"),
+                "like_count": stats.get("likeCount", "0"),
+                "comment_count": stats.get("commentCount", "0"),
+            }
+    return statistics
+
+def _refresh_video_file(channel_folder, video_id, stats, num_comments, etags, limiter, store_comments=None):
+    """
+    Updates the statistics of a stored video and fetches its new comments, which
+    are prepended to the comments of its JSON. For a channel in the columnar
+    store (`store_comments`: the video's stored comments) the JSON's comments are
+    left alone and the new comments are only returned, for `add_comments`.
+    Returns the new comments.
+    """
+    video_data = read_json(channel_folder, video_id)
+    stored = video_data.get("comments", []) if store_comments is None else store_comments
+    known_ids = {c["comment_id"] for c in stored}
+    newest_date = max((c["date"] for c in stored), default=None)
+
+    key = "comments:" + video_id
+    new_comments, etags[key] = get_new_comments(video_id, known_ids, newest_date, num_comments, etags.get(key), limiter)
+    if store_comments is None and new_comments:
+        video_data["comments"] = new_comments + stored
+    elif not stats:
+        return new_comments
+
+    video_data.update(stats)
+    write_json(channel_folder, video_id, video_data)
+    return new_comments
+
+def refresh_channel_data(channel_url, num_videos=10, num_comments=50, data_dir="./data/", max_workers=1, requests_per_second=None, stats=None):
+    """
+    Delta refresh of a channel fetched earlier with `fetch_channel_data`.
+
+    Videos that already have a JSON file only get their view/like/comment counts
+    updated in place and newly posted comments prepended (for a channel migrated
+    to the columnar store, the new comments go into the store); new uploads among the
+    last `num_videos` are fetched in full. ETags of previous responses are kept in
+    `<channel_folder>/.etags`, so unchanged statistics and comment lists come back
+    as cheap 304s. If given, `stats` is updated with the number of videos touched
+    and comments added.
+    """
+    limiter = RateLimiter(requests_per_second) if requests_per_second else None
+
+    channel_info = get_channel_info(channel_url, limiter)
+    if not channel_info:
+        print("Channel not found!")
+        return None
+
+    channel_folder = os.path.join(data_dir, channel_info["channel_id"])
+    os.makedirs(channel_folder, exist_ok=True)
+    channel_metadata = {}
+    if find_data_file(channel_folder, "channel_metadata"):
+        channel_metadata = read_json(channel_folder, "channel_metadata")
+    # Keep analysis results stored alongside the channel info
+    channel_metadata.update(channel_info)
+    write_json(channel_folder, "channel_metadata", channel_metadata)
+
+    etags_path = os.path.join(channel_folder, ETAGS_FILENAME)
+    etags = _load_state(etags_path) or {}
+
+    videos = get_last_videos(channel_info["uploads_playlist_id"], num_videos, limiter)
+    video_ids = [video["video_id"] for video in videos]
+    existing = [vid for vid in video_ids if find_data_file(channel_folder, vid)]
+    new = [vid for vid in video_ids if vid not in existing]
+
+    statistics = get_video_statistics(existing, etags, limiter)
+    new_metadata = get_video_metadata(new, limiter) if new else {}
+
+    store_comments = None
+    if comment_store.has_store(channel_folder):
+        # Comments live in the columnar store; the video JSONs have none
+        store_comments = {vid: [] for vid in existing}
+        for row in comment_store.read_comments(channel_folder, ["comment_id", "video_id", "date"]).to_pylist():
+            if row["video_id"] in store_comments:
+                store_comments[row["video_id"]].append(row)
+
+    def refresh(vid):
+        return _refresh_video_file(
+            channel_folder, vid, statistics.get(vid, {}), num_comments, etags, limiter, store_comments[vid] if store_comments is not None else None
+        )
+
+    def fetch(vid):
+        return write_video_file_streaming(channel_folder, vid, new_metadata.get(vid, {}), iter_comment_pages(vid, num_comments, limiter))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        new_comments = dict(zip(existing, executor.map(refresh, existing)))
+        added_from_new = sum(executor.map(fetch, new))
+    added = sum(len(c) for c in new_comments.values())
+    if store_comments is not None:
+        # One write for the whole refresh, before the ETags that skip these comments are saved
+        comment_store.add_comments(channel_folder, new_comments)
+
+    _save_state(etags_path, etags)
+    if stats is not None:
+        stats.update(videos=len(existing) + len(new), comments=added + added_from_new)
+    print(f"Refreshed {len(existing)} videos ({added} new comments), fetched {len(new)} new videos into folder: {channel_folder}")
+    return channel_info
+
 if __name__ == "__main__":
     channel_url = input("Enter YouTube channel URL or identifier: ")
-    num_videos = int(input("Enter number of latest videos to fetch: "))
+    num_videos = int(input("Enter number of latest videos to fetch (0 = backfill the whole channel): "))
     num_comments = int(input("Enter number of comments to fetch per video: "))
     data_dir = input("Enter directory to save data (default: ./data/): ") or "./data/"
-    fetch_channel_data(channel_url, num_videos=num_videos, num_comments=num_comments, data_dir=data_dir)
\ No newline at end of file
+    max_workers = int(input("Enter number of parallel comment workers (default: 1): ") or 1)
+    if num_videos == 0:
+        backfill_channel(channel_url, num_comments=num_comments, data_dir=data_dir, max_workers=max_workers)
+    else:
+        fetch_channel_data(channel_url, num_videos=num_videos, num_comments=num_comments, data_dir=data_dir, max_workers=max_workers)
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""
+Shared YouTube Data API client.
+
+The discovery document is parsed once per process (and cached on disk so that
+startup works offline), and requests are executed over a fixed pool of
+keep-alive HTTP connections that can be shared between fetch threads.
+"""
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import httplib2
+from googleapiclient.discovery import DISCOVERY_URI, build_from_document
+from googleapiclient.errors import HttpError
+
+import config
+from config import API_KEY
+from youtube_analytics.data.quota import QUOTA_EXCEEDED_REASONS, KeyScheduler, quota_cost
+from youtube_analytics.data.rate_limit import RateLimiter, error_reason, execute_with_backoff
+from youtube_analytics.data.response_cache import ResponseCache, request_key
+
+# Optional list of keys to spread requests over; defaults to the single API_KEY
+API_KEYS = getattr(config, "API_KEYS", None) or [API_KEY]
+# Override to point the client at a stand-in server (see stand_in_api.py)
+API_ENDPOINT = os.environ.get("YOUTUBE_API_ENDPOINT")
+DISCOVERY_CACHE_DIR = os.environ.get(
+    "YOUTUBE_DISCOVERY_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "youtube_analytics"),
+)
+
+
+def load_discovery_document(cache_dir: str = DISCOVERY_CACHE_DIR, api="youtube", version="v3") -> str:
+    """
+    Returns the discovery document for `api`/`version`, in order of preference
+    from the on-disk cache, the copy bundled with googleapiclient, or the network.
+    Whatever is found is written back to the cache.
+    """
+    path = os.path.join(cache_dir, f"{api}.{version}.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    document = None
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+
+        document = get_static_doc(api, version)
+    except ImportError:
+        pass
+    if document is None:
+        url = DISCOVERY_URI.format(api=api, apiVersion=version)
+        resp, content = httplib2.Http(timeout=30).request(url)
+        if resp.status != 200:
+            raise RuntimeError(f"Could not fetch discovery document ({resp.status}) from {url}")
+        document = content.decode("utf-8")
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(document)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: could not cache discovery document: {e}")
+    return document
+
+
+def _with_key(uri: str, key: str) -> str:
+    url = urlparse(uri)
+    params = [(k, v) for k, v in parse_qsl(url.query, keep_blank_values=True) if k != "key"]
+    return url._replace(query=urlencode(params + [("key", key)])).geturl()
+
+
+class _CountingHttp(httplib2.Http):
+    """httplib2.Http keeps its connections alive; this one also counts what went through it."""
+
+    def __init__(self, index: int, timeout: Optional[float] = 60):
+        super().__init__(timeout=timeout)
+        self.index = index
+        self.request_count = 0
+
+    def request(self, *args, **kwargs):
+        self.request_count += 1
+        return super().request(*args, **kwargs)
+
+
+class YouTubeClientPool:
+    """
+    One parsed `youtube` service plus `size` pooled keep-alive connections.
+
+    Building request objects from `service` is safe from any thread; executing
+    them must go through `execute`, which checks a connection out of the pool
+    for the duration of the call (httplib2.Http itself is not thread-safe).
+    With a `cache`, responses are served from / stored to it first. With a
+    `keys` scheduler, every request is sent with the key it hands out, and keys
+    the API reports as out of quota are swapped for the next one.
+    """
+
+    def __init__(
+        self,
+        api_key: str = API_KEY,
+        size: int = 8,
+        api_endpoint: Optional[str] = API_ENDPOINT,
+        cache_dir: str = DISCOVERY_CACHE_DIR,
+        timeout: Optional[float] = 60,
+        cache: Optional[ResponseCache] = None,
+        keys: Optional[KeyScheduler] = None,
+    ):
+        self.cache = cache
+        self.keys = keys
+        self._connections: List[_CountingHttp] = [_CountingHttp(i, timeout) for i in range(size)]
+        self._idle: "queue.Queue[_CountingHttp]" = queue.Queue()
+        for http in self._connections:
+            self._idle.put(http)
+
+        client_options = {"api_endpoint": api_endpoint} if api_endpoint else None
+        self.service = build_from_document(
+            load_discovery_document(cache_dir),
+            developerKey=api_key,
+            http=httplib2.Http(timeout=timeout),
+            client_options=client_options,
+        )
+
+    @contextmanager
+    def connection(self):
+        http = self._idle.get()
+        try:
+            yield http
+        finally:
+            self._idle.put(http)
+
+    def execute(self, request, limiter: Optional[RateLimiter] = None, revalidate: bool = False):
+        """
+        Executes `request`. With `revalidate`, a cache in "cache" mode is not
+        consulted (the response still replaces the cached entry); replay mode
+        always answers from disk.
+        """
+        if self.cache is not None and not (revalidate and self.cache.mode == "cache"):
+            cached = self.cache.get(request)
+            if cached is not None:
+                return cached
+        with self.connection() as http:
+            if self.keys is None:
+                response = execute_with_backoff(request, limiter, http=http)
+            else:
+                response = self._execute_with_keys(request, limiter, http)
+        if self.cache is not None:
+            self.cache.put(request, response)
+        return response
+
+    def _execute_with_keys(self, request, limiter: Optional[RateLimiter], http):
+        cost = quota_cost(request_key(request)[0])
+        while True:
+            key = self.keys.acquire(cost)  # raises QuotaExhausted once every key is spent
+            request.uri = _with_key(request.uri, key)
+            try:
+                return execute_with_backoff(request, limiter, http=http)
+            except HttpError as e:
+                if e.resp.status == 403 and error_reason(e) in QUOTA_EXCEEDED_REASONS:
+                    self.keys.mark_exhausted(key)
+                    continue
+                raise
+
+    def execute_conditional(self, request, etag: Optional[str] = None, limiter: Optional[RateLimiter] = None):
+        """
+        Executes `request` with If-None-Match set to `etag`. Returns None when the
+        API answers 304 Not Modified, otherwise the response (whose "etag" field
+        can be passed in next time). The response cache is bypassed: the caller
+        asks whether something changed, which a cached copy can't answer.
+        """
+        if etag:
+            request.headers["If-None-Match"] = etag
+        try:
+            return self.execute(request, limiter, revalidate=True)
+        except HttpError as e:
+            if e.resp.status == 304:
+                return None
+            raise
+
+    def stats(self) -> List[Dict]:
+        return [{"connection": http.index, "requests": http.request_count} for http in self._connections]
+
+    def report(self) -> None:
+        stats = self.stats()
+        total = sum(s["requests"] for s in stats)
+        print(f"{total} requests over {len(stats)} pooled connections:")
+        for s in stats:
+            print(f"  connection {s['connection']}: {s['requests']} requests")
+        if self.cache is not None:
+            self.cache.report()
+        if self.keys is not None:
+            print(f"Quota: {self.keys.remaining()} units left today")
+            self.keys.report()
+
+    def close(self) -> None:
+        for http in self._connections:
+            http.close()
+
+
+_default_pool: Optional[YouTubeClientPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> YouTubeClientPool:
+    """Returns the process-wide pool, creating it on first use (with the default cache and key scheduler)."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = YouTubeClientPool(cache=ResponseCache(), keys=KeyScheduler(API_KEYS))
+        return _default_pool
+
+
+def configure_client_pool(**kwargs) -> YouTubeClientPool:
+    """Replaces the process-wide pool, e.g. to change its size or endpoint."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is not None:
+            _default_pool.close()
+        _default_pool = YouTubeClientPool(**kwargs)
+        return _default_pool
@@ -0,0 +1,373 @@
+"""
+Columnar comment store, an alternative to keeping comments inside each
+`<video_id>.json`.
+
+Comments of a channel live in `data/<channel_id>/comments/` as Parquet files,
+one per column group, all holding the same rows in the same order:
+
+    base       comment_id, video_id, author, date, likes, num_replies, text
+    sentiment  sentiment_negative, sentiment_neutral, sentiment_positive
+    weight     weight
+    topics     assigned_topics
+    extra      extra (any other comment keys, as JSON)
+
+`manifest.json` names the file holding each group (`<group>.<generation>.parquet`).
+A write puts its groups in new files and then replaces the manifest, so readers
+see either all of a write or none of it, even when it replaces several groups.
+Stores written before the manifest (`<group>.parquet`) are still read.
+
+A stage reads only the columns it needs and rewrites only its own group, e.g.
+sentiment tagging never rewrites comment texts. Video JSONs keep the video
+metadata and per-video results but no `comments` list.
+
+    python -m youtube_analytics.data.comment_store migrate <channel_id>
+    python -m youtube_analytics.data.comment_store export <channel_id>
+
+`migrate` is incremental: video JSONs that (again) contain a `comments` list,
+e.g. after a refresh, replace that video's rows in the store. `export` writes
+the comments back into the JSON layout the rest of the tools read.
+"""
+
+import argparse
+import json
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, only needed for the columnar store
+    pa = None
+
+from youtube_analytics.data.annotations import load_video
+from youtube_analytics.data.video_io import list_video_ids, read_json, write_json, write_video_file
+
+STORE_DIRNAME = "comments"
+MANIFEST_NAME = "manifest.json"
+SENTIMENT_LABELS = ("Negative", "Neutral", "Positive")
+
+# Keys of a comment dict in the JSON layout that map to typed columns
+BASE_FIELDS = ("comment_id", "video_id", "author", "date", "likes", "num_replies")
+
+
+def _schemas() -> Dict[str, "pa.Schema"]:
+    return {
+        "base": pa.schema(
+            [
+                ("comment_id", pa.string()),
+                ("video_id", pa.string()),
+                ("author", pa.string()),
+                ("date", pa.string()),
+                ("likes", pa.int64()),
+                ("num_replies", pa.int64()),
+                ("text", pa.string()),
+            ]
+        ),
+        # float64, so the store returns the same probabilities the JSON layout holds
+        "sentiment": pa.schema([(f"sentiment_{label.lower()}", pa.float64()) for label in SENTIMENT_LABELS]),
+        "weight": pa.schema([("weight", pa.float64())]),
+        "topics": pa.schema(
+            [("assigned_topics", pa.list_(pa.struct([("label", pa.string()), ("score", pa.float64())])))]
+        ),
+        "extra": pa.schema([("extra", pa.string())]),
+    }
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("The columnar comment store needs pyarrow: pip install pyarrow")
+
+
+def store_dir(channel_dir: str) -> str:
+    return os.path.join(channel_dir, STORE_DIRNAME)
+
+
+def _manifest_path(channel_dir: str) -> str:
+    return os.path.join(store_dir(channel_dir), MANIFEST_NAME)
+
+
+def _read_manifest(channel_dir: str) -> Dict:
+    """{"generation": n, "groups": {group: filename}}; stores without a manifest list their `<group>.parquet` files."""
+    path = _manifest_path(channel_dir)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    groups = {}
+    for group in _schemas():
+        if os.path.exists(os.path.join(store_dir(channel_dir), f"{group}.parquet")):
+            groups[group] = f"{group}.parquet"
+    return {"generation": 0, "groups": groups}
+
+
+def has_store(channel_dir: str) -> bool:
+    return os.path.exists(_manifest_path(channel_dir)) or os.path.exists(os.path.join(store_dir(channel_dir), "base.parquet"))
+
+
+def store_mtime(channel_dir: str) -> Optional[int]:
+    """Changes with every write to the store (nanoseconds), None without a store."""
+    if os.path.exists(_manifest_path(channel_dir)):
+        return os.stat(_manifest_path(channel_dir)).st_mtime_ns
+    if not has_store(channel_dir):
+        return None
+    paths = [os.path.join(store_dir(channel_dir), name) for name in _read_manifest(channel_dir)["groups"].values()]
+    return max(os.stat(path).st_mtime_ns for path in paths)
+
+
+def _group_of(column: str) -> str:
+    for group, schema in _schemas().items():
+        if column in schema.names:
+            return group
+    raise KeyError(f"Unknown comment column: {column}")
+
+
+def _group_path(channel_dir: str, group: str, manifest: Optional[Dict] = None) -> Optional[str]:
+    """File of a column group, None when the group was never written."""
+    name = (manifest or _read_manifest(channel_dir))["groups"].get(group)
+    return os.path.join(store_dir(channel_dir), name) if name else None
+
+
+def _write_groups(channel_dir: str, tables: Dict[str, "pa.Table"]) -> None:
+    """Replaces the column groups in `tables` in one step: new files first, then the manifest."""
+    directory = store_dir(channel_dir)
+    os.makedirs(directory, exist_ok=True)
+    manifest = _read_manifest(channel_dir)
+    generation = manifest["generation"] + 1
+    groups = dict(manifest["groups"])
+    for group, table in tables.items():
+        groups[group] = f"{group}.{generation}.parquet"
+        pq.write_table(table, os.path.join(directory, groups[group]), compression="zstd")
+
+    path = _manifest_path(channel_dir)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"generation": generation, "groups": groups}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+    # Replaced groups, and files of writes that died before their manifest
+    for name in os.listdir(directory):
+        if name.endswith(".parquet") and name not in groups.values():
+            os.remove(os.path.join(directory, name))
+
+
+def read_comments(channel_dir: str, columns: Optional[Iterable[str]] = None) -> "pa.Table":
+    """
+    Reads `columns` (default: all) of every comment of the channel. Only the
+    column groups that hold the requested columns are opened; a group that was
+    never written (e.g. sentiment before tagging) reads as nulls.
+    """
+    _require_pyarrow()
+    schemas = _schemas()
+    columns = list(columns) if columns is not None else [c for s in schemas.values() for c in s.names]
+    by_group: Dict[str, List[str]] = {}
+    for column in columns:
+        by_group.setdefault(_group_of(column), []).append(column)
+
+    manifest = _read_manifest(channel_dir)
+    num_rows = pq.read_metadata(_group_path(channel_dir, "base", manifest)).num_rows
+    arrays = {}
+    for group, group_columns in by_group.items():
+        path = _group_path(channel_dir, group, manifest)
+        if path is not None:
+            table = pq.read_table(path, columns=group_columns)
+            for column in group_columns:
+                arrays[column] = table.column(column)
+                if arrays[column].type == pa.float32():
+                    # Sentiment of stores written as float32: drop the float32 noise (0.8999999761581421)
+                    arrays[column] = pc.round(arrays[column].cast(pa.float64()), 4)
+        else:
+            for column in group_columns:
+                arrays[column] = pa.nulls(num_rows, schemas[group].field(column).type)
+    return pa.table([arrays[c] for c in columns], names=columns)
+
+
+def write_columns(channel_dir: str, group: str, columns: Dict[str, list]) -> None:
+    """
+    Replaces one column group, e.g. `write_columns(d, "weight", {"weight": [...]})`.
+    Each list must have one value per comment, in the order `read_comments`
+    returns them.
+    """
+    _require_pyarrow()
+    schema = _schemas()[group]
+    table = pa.table({name: columns[name] for name in schema.names}, schema=schema)
+    num_rows = pq.read_metadata(_group_path(channel_dir, "base")).num_rows
+    if table.num_rows != num_rows:
+        raise ValueError(f"Expected {num_rows} rows for column group {group!r}, got {table.num_rows}")
+    _write_groups(channel_dir, {group: table})
+
+
+def _comments_to_columns(comments: List[Dict]) -> Dict[str, list]:
+    columns: Dict[str, list] = {name: [] for s in _schemas().values() for name in s.names}
+    for c in comments:
+        columns["comment_id"].append(c.get("comment_id"))
+        columns["video_id"].append(c.get("video_id"))
+        columns["author"].append(c.get("author"))
+        columns["date"].append(c.get("date"))
+        columns["likes"].append(int(c.get("likes") or 0))
+        columns["num_replies"].append(int(c.get("num_replies") or 0))
+        columns["text"].append(c.get("comment"))
+        sentiment = c.get("sentiment") if isinstance(c.get("sentiment"), dict) else {}
+        for label in SENTIMENT_LABELS:
+            columns[f"sentiment_{label.lower()}"].append(sentiment.get(label))
+        columns["weight"].append(c.get("weight"))
+        columns["assigned_topics"].append(c.get("assigned_topics"))
+        extra = {k: v for k, v in c.items() if k not in BASE_FIELDS and k not in ("comment", "sentiment", "weight", "assigned_topics")}
+        columns["extra"].append(json.dumps(extra, ensure_ascii=False) if extra else None)
+    return columns
+
+
+def _columns_to_comments(table: "pa.Table") -> List[Dict]:
+    comments = []
+    for row in table.to_pylist():
+        comment = {k: row[k] for k in BASE_FIELDS[:5]}
+        comment["comment"] = row["text"]
+        comment["num_replies"] = row["num_replies"]
+        if row["sentiment_negative"] is not None:
+            comment["sentiment"] = {label: row[f"sentiment_{label.lower()}"] for label in SENTIMENT_LABELS}
+        if row["assigned_topics"] is not None:
+            comment["assigned_topics"] = row["assigned_topics"]
+        if row["weight"] is not None:
+            comment["weight"] = row["weight"]
+        if row["extra"]:
+            comment.update(json.loads(row["extra"]))
+        comments.append(comment)
+    return comments
+
+
+def migrate_channel(channel_id: str, data_root: str = "data", keep_json: bool = False) -> int:
+    """
+    Moves the comments of every `<video_id>.json` that has a `comments` list into
+    the columnar store, replacing rows already stored for those videos. Unless
+    `keep_json`, the comments are then removed from the video JSONs. Returns the
+    number of comments imported.
+    """
+    _require_pyarrow()
+    channel_dir = os.path.join(data_root, channel_id)
+    if not os.path.exists(channel_dir):
+        print(f"Channel directory not found: {channel_dir}")
+        return 0
+
+    imported: Dict[str, List[Dict]] = {}
+    for video_id in list_video_ids(channel_dir):
+        try:
+            # Merged view, so sentiment/topics/weights from annotation sidecars come along
+            video_data = load_video(channel_dir, video_id)
+        except Exception as e:
+            print(f"Error reading {video_id}: {e}")
+            continue
+        if "comments" in video_data:
+            imported[video_id] = [{"video_id": video_id, **c} for c in video_data["comments"]]
+
+    if not imported:
+        print(f"No comments to migrate in {channel_dir}")
+        return 0
+
+    new_columns = _comments_to_columns([c for comments in imported.values() for c in comments])
+    keep = None
+    if has_store(channel_dir):
+        # Keep the rows of videos that were not re-imported, in their original order
+        old_video_ids = read_comments(channel_dir, ["video_id"]).column("video_id")
+        keep = pc.invert(pc.is_in(old_video_ids, value_set=pa.array(list(imported), pa.string())))
+
+    tables = {}
+    for group, schema in _schemas().items():
+        tables[group] = pa.table({name: new_columns[name] for name in schema.names}, schema=schema)
+        if keep is not None:
+            old_table = read_comments(channel_dir, schema.names).cast(schema).filter(keep)
+            tables[group] = pa.concat_tables([old_table, tables[group]])
+
+    # All groups switch over together; the JSON comments are only removed once they have
+    _write_groups(channel_dir, tables)
+
+    if not keep_json:
+        for video_id in imported:
+            video_data = read_json(channel_dir, video_id)
+            video_data.pop("comments", None)
+            write_json(channel_dir, video_id, video_data)
+
+    n_comments = sum(len(c) for c in imported.values())
+    print(f"Migrated {n_comments} comments of {len(imported)} videos to {store_dir(channel_dir)}")
+    return n_comments
+
+
+def add_comments(channel_dir: str, comments: Dict[str, List[Dict]]) -> int:
+    """
+    Adds newly fetched comments ({video_id: comments, newest first} in the JSON
+    layout) to the store in one write, ahead of the rows already stored for
+    their video, as a refresh orders them in a video JSON. Their sentiment,
+    weight and topics start out empty. Returns the number of rows added.
+    """
+    _require_pyarrow()
+    comments = {video_id: c for video_id, c in comments.items() if c}
+    if not comments:
+        return 0
+    old_video_ids = read_comments(channel_dir, ["video_id"]).column("video_id").to_pylist()
+    n_old = len(old_video_ids)
+    # Row positions in concat(old rows, new rows): each video's new rows go before its first old row
+    new_rows: Dict[str, List[int]] = {}
+    next_row = n_old
+    for video_id, video_comments in comments.items():
+        new_rows[video_id] = list(range(next_row, next_row + len(video_comments)))
+        next_row += len(video_comments)
+    order: List[int] = []
+    for i, video_id in enumerate(old_video_ids):
+        order.extend(new_rows.pop(video_id, []))
+        order.append(i)
+    for rows in new_rows.values():  # videos without stored comments
+        order.extend(rows)
+
+    new_columns = _comments_to_columns([{**c, "video_id": video_id} for video_id, video_comments in comments.items() for c in video_comments])
+    tables = {}
+    for group, schema in _schemas().items():
+        old_table = read_comments(channel_dir, schema.names).cast(schema)
+        new_table = pa.table({name: new_columns[name] for name in schema.names}, schema=schema)
+        tables[group] = pa.concat_tables([old_table, new_table]).take(order)
+    _write_groups(channel_dir, tables)
+    return len(order) - n_old
+
+
+def export_channel(channel_id: str, data_root: str = "data", remove_store: bool = False) -> int:
+    """
+    Writes the stored comments (with sentiment, weight, topics) back into the
+    `comments` list of each `<video_id>.json`. Stages keep using the store while
+    it exists, so pass `remove_store` to switch the channel back to plain JSON.
+    Returns the number of videos written.
+    """
+    _require_pyarrow()
+    channel_dir = os.path.join(data_root, channel_id)
+    if not has_store(channel_dir):
+        print(f"No columnar comment store in {channel_dir}")
+        return 0
+
+    table = read_comments(channel_dir)
+    rows: Dict[str, List[int]] = {}
+    for i, video_id in enumerate(table.column("video_id").to_pylist()):
+        rows.setdefault(video_id, []).append(i)
+    written = 0
+    for video_id in list_video_ids(channel_dir):
+        video_data = read_json(channel_dir, video_id)
+        video_data.pop("comments", None)
+        comments = _columns_to_comments(table.take(rows.get(video_id, [])))
+        write_video_file(channel_dir, video_id, video_data, comments)
+        written += 1
+    if remove_store:
+        shutil.rmtree(store_dir(channel_dir))
+    print(f"Exported comments of {written} videos to {channel_dir}")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move comments between per-video JSONs and the columnar store")
+    parser.add_argument("command", choices=["migrate", "export"])
+    parser.add_argument("channel_id", help="The YouTube channel ID (folder name)")
+    parser.add_argument("--data-root", default="data", help="Root directory for data files (default: data)")
+    parser.add_argument("--keep-json", action="store_true", help="migrate: leave the comments in the video JSONs")
+    parser.add_argument("--remove-store", action="store_true", help="export: delete the columnar store afterwards")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate_channel(args.channel_id, data_root=args.data_root, keep_json=args.keep_json)
+    else:
+        export_channel(args.channel_id, data_root=args.data_root, remove_store=args.remove_store)
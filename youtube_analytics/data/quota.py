@@ -0,0 +1,169 @@
+"""
+Quota planning and multi-key scheduling for the YouTube Data API.
+
+Every API key gets 10,000 units per day, reset at midnight Pacific time.
+`search.list` costs 100 units, the list calls used here cost 1.
+"""
+
+import atexit
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from youtube_analytics.data.rate_limit import RateLimiter
+
+DEFAULT_DAILY_QUOTA = 10_000
+QUOTA_COSTS: Dict[str, int] = {"youtube.search.list": 100}
+DEFAULT_COST = 1
+# 403 reasons meaning the key is done for the day, as opposed to rate limited
+QUOTA_EXCEEDED_REASONS = {"quotaExceeded", "dailyLimitExceeded"}
+
+USAGE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "youtube_analytics", "quota_usage.json")
+
+try:
+    from zoneinfo import ZoneInfo
+
+    PACIFIC = ZoneInfo("America/Los_Angeles")
+except Exception:
+    PACIFIC = timezone(timedelta(hours=-8))
+
+
+class QuotaExhausted(RuntimeError):
+    """Raised when no configured API key has quota left for a request."""
+
+
+def quota_cost(endpoint: str) -> int:
+    return QUOTA_COSTS.get(endpoint, DEFAULT_COST)
+
+
+def estimate_fetch_quota(channel_identifier: str, num_videos: Optional[int], num_comments: int, video_count: Optional[int] = None) -> Dict[str, int]:
+    """
+    Upper-bound estimate of the units `fetch_channel_data(channel_identifier,
+    num_videos, num_comments)` will use. For a full backfill pass num_videos=None
+    and the channel's `video_count`.
+    """
+    n_videos = num_videos if num_videos is not None else (video_count or 0)
+    if re.search(r"youtube\.com\/channel\/", channel_identifier):
+        resolution = 0
+    elif "youtube.com" in channel_identifier:
+        resolution = quota_cost("youtube.search.list")
+    else:
+        resolution = DEFAULT_COST  # channels.list(forUsername=...)
+
+    estimate = {
+        "channel_resolution": resolution,
+        "channel_info": DEFAULT_COST,
+        "playlist_items": max(1, math.ceil(n_videos / 50)) * DEFAULT_COST,
+        "video_metadata": math.ceil(n_videos / 50) * DEFAULT_COST,
+        "comment_threads": n_videos * max(1, math.ceil(num_comments / 100)) * DEFAULT_COST,
+    }
+    estimate["total"] = sum(estimate.values())
+    return estimate
+
+
+def next_reset(now: Optional[float] = None) -> float:
+    """Unix time of the next midnight Pacific, when daily quotas reset."""
+    local = datetime.fromtimestamp(now if now is not None else time.time(), PACIFIC)
+    midnight = (local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight.timestamp()
+
+
+def _key_id(key: str) -> str:
+    # Never write the keys themselves to disk
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+
+
+class KeyScheduler:
+    """
+    Hands out API keys for requests. Each key has its own token bucket
+    (`requests_per_second`) and daily budget; `acquire` picks the key with the
+    most units left and charges the request's cost to it. Usage is persisted to
+    `usage_path` so separate runs on the same day share the accounting.
+    """
+
+    def __init__(
+        self,
+        keys: List[str],
+        daily_quota: int = DEFAULT_DAILY_QUOTA,
+        requests_per_second: float = 50.0,
+        usage_path: Optional[str] = USAGE_PATH,
+    ):
+        if not keys:
+            raise ValueError("KeyScheduler needs at least one API key")
+        self.keys = list(keys)
+        self.daily_quota = daily_quota
+        self.usage_path = usage_path
+        self._limiters = {key: RateLimiter(requests_per_second) for key in self.keys}
+        self._used = {key: 0 for key in self.keys}
+        self._reset_at = {key: next_reset() for key in self.keys}
+        self._lock = threading.Lock()
+        self._load_usage()
+        if usage_path:
+            atexit.register(self.save_usage)
+
+    def _load_usage(self) -> None:
+        if not self.usage_path or not os.path.exists(self.usage_path):
+            return
+        try:
+            with open(self.usage_path, "r", encoding="utf-8") as f:
+                usage = json.load(f)
+        except Exception as e:
+            print(f"Warning: ignoring unreadable quota usage file: {e}")
+            return
+        for key in self.keys:
+            entry = usage.get(_key_id(key))
+            if entry and entry["reset_at"] > time.time():
+                self._used[key] = entry["used"]
+                self._reset_at[key] = entry["reset_at"]
+
+    def save_usage(self) -> None:
+        if not self.usage_path:
+            return
+        with self._lock:
+            usage = {_key_id(k): {"used": self._used[k], "reset_at": self._reset_at[k]} for k in self.keys}
+        os.makedirs(os.path.dirname(self.usage_path), exist_ok=True)
+        tmp_path = f"{self.usage_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(usage, f)
+        os.replace(tmp_path, self.usage_path)
+
+    def _roll_over(self, key: str, now: float) -> None:
+        if now >= self._reset_at[key]:
+            self._used[key] = 0
+            self._reset_at[key] = next_reset(now)
+
+    def remaining(self) -> int:
+        now = time.time()
+        with self._lock:
+            for key in self.keys:
+                self._roll_over(key, now)
+            return sum(max(0, self.daily_quota - self._used[key]) for key in self.keys)
+
+    def acquire(self, cost: int = DEFAULT_COST) -> str:
+        now = time.time()
+        with self._lock:
+            for key in self.keys:
+                self._roll_over(key, now)
+            key = max(self.keys, key=lambda k: self.daily_quota - self._used[k])
+            if self.daily_quota - self._used[key] < cost:
+                resume = datetime.fromtimestamp(min(self._reset_at.values()), PACIFIC)
+                raise QuotaExhausted(f"All {len(self.keys)} API keys are out of quota until {resume:%Y-%m-%d %H:%M %Z}")
+            self._used[key] += cost
+        self._limiters[key].acquire()
+        return key
+
+    def mark_exhausted(self, key: str) -> None:
+        """Called when the API itself reports the key's quota as exceeded."""
+        with self._lock:
+            self._used[key] = self.daily_quota
+
+    def report(self) -> None:
+        with self._lock:
+            for i, key in enumerate(self.keys):
+                print(f"  key {i} ({_key_id(key)}): {self._used[key]}/{self.daily_quota} units used")
@@ -0,0 +1,107 @@
+import json
+import random
+import threading
+import time
+from typing import Optional
+
+from googleapiclient.errors import HttpError
+
+# 403 is only worth retrying for the per-second/per-user rate limits; a 403 with
+# "quotaExceeded" means the daily quota is gone and retrying just burns time.
+RETRYABLE_STATUSES = {403, 429, 500, 503}
+RETRYABLE_403_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all fetch threads.
+
+    `rate` is the sustained number of requests per second, `burst` the number of
+    requests that may go out back to back. When any thread hits a 403/429 it calls
+    `pause`, which holds back every thread sharing the limiter, not just the one
+    that got throttled.
+    """
+
+    def __init__(self, rate: float = 10.0, burst: Optional[int] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1, int(rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, cost: float = 1.0) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._resume_at:
+                    wait = self._resume_at - now
+                else:
+                    self._tokens = min(
+                        self.capacity, self._tokens + (now - self._last) * self.rate
+                    )
+                    self._last = now
+                    if self._tokens >= cost:
+                        self._tokens -= cost
+                        return
+                    wait = (cost - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+def error_reason(error: HttpError) -> Optional[str]:
+    """Returns the first `reason` from a Google API error payload, if any."""
+    try:
+        payload = json.loads(error.content.decode("utf-8"))
+        return payload["error"]["errors"][0]["reason"]
+    except Exception:
+        return None
+
+
+def _is_retryable(error: HttpError) -> bool:
+    status = error.resp.status
+    if status not in RETRYABLE_STATUSES:
+        return False
+    if status == 403:
+        return error_reason(error) in RETRYABLE_403_REASONS
+    return True
+
+
+def _retry_after(error: HttpError) -> Optional[float]:
+    try:
+        return float(error.resp.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def execute_with_backoff(
+    request,
+    limiter: Optional[RateLimiter] = None,
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    http=None,
+):
+    """
+    Executes a googleapiclient request, retrying 403 rate limits, 429 and 5xx
+    responses with exponential backoff (honouring Retry-After when present).
+    Any other error, or the last failed attempt, is raised to the caller.
+    `http` overrides the connection the request was built with.
+    """
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return request.execute(http=http)
+        except HttpError as e:
+            if attempt == max_retries or not _is_retryable(e):
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                delay = base_delay * (2**attempt) + random.uniform(0, base_delay)
+            if limiter is not None:
+                limiter.pause(delay)
+            else:
+                time.sleep(delay)
@@ -0,0 +1,163 @@
+"""
+On-disk cache for YouTube Data API responses.
+
+Responses are keyed by endpoint (e.g. "youtube.search.list") and the request
+parameters, minus the API key. Each endpoint has its own time-to-live, and the
+cache is trimmed (oldest first) once it grows past `max_bytes`.
+
+Modes:
+    "cache"  - serve fresh entries, fetch and store the rest (default)
+    "record" - always fetch, store everything, never evict
+    "replay" - serve from disk only, regardless of age; a miss raises CacheMiss
+    "off"    - bypass the cache
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "YOUTUBE_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "youtube_analytics", "responses"),
+)
+DEFAULT_MODE = os.environ.get("YOUTUBE_CACHE_MODE", "cache")
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Channel resolution barely changes and search costs 100 quota units; statistics
+# and comments move quickly.
+DEFAULT_TTLS: Dict[str, float] = {
+    "youtube.search.list": 30 * DAY,
+    "youtube.channels.list": DAY,
+    "youtube.playlistItems.list": HOUR / 4,
+    "youtube.videos.list": HOUR / 4,
+    "youtube.commentThreads.list": HOUR / 4,
+}
+DEFAULT_TTL = HOUR / 4
+
+MODES = ("cache", "record", "replay", "off")
+
+
+class CacheMiss(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def request_key(request) -> Tuple[str, Dict[str, str]]:
+    """Returns (endpoint, params) for a googleapiclient HttpRequest, without the API key."""
+    url = urlparse(request.uri)
+    params = {k: v for k, v in parse_qsl(url.query) if k != "key"}
+    endpoint = getattr(request, "methodId", None) or url.path.rstrip("/").rsplit("/", 1)[-1]
+    return endpoint, params
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        mode: str = DEFAULT_MODE,
+        ttls: Optional[Dict[str, float]] = None,
+        max_bytes: int = 512 * 1024 * 1024,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode {mode!r}, expected one of {MODES}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None
+
+    def _path(self, endpoint: str, params: Dict[str, str]) -> str:
+        digest = hashlib.sha256(json.dumps([endpoint, sorted(params.items())]).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, endpoint, f"{digest}.json")
+
+    def get(self, request) -> Optional[Dict]:
+        if self.mode in ("off", "record"):
+            return None
+        endpoint, params = request_key(request)
+        path = self._path(endpoint, params)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+
+        fresh = entry is not None and (
+            self.mode == "replay" or time.time() - entry["stored_at"] < self.ttls.get(endpoint, DEFAULT_TTL)
+        )
+        with self._lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if fresh:
+            return entry["response"]
+        if self.mode == "replay":
+            raise CacheMiss(f"No recorded response for {endpoint} {params}")
+        return None
+
+    def put(self, request, response: Dict) -> None:
+        if self.mode in ("off", "replay"):
+            return
+        endpoint, params = request_key(request)
+        path = self._path(endpoint, params)
+        entry = {"stored_at": time.time(), "endpoint": endpoint, "params": params, "response": response}
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        if self.mode == "cache":
+            with self._lock:
+                if self._size is None:
+                    self._size = sum(size for _, size, _ in self._entries())
+                else:
+                    self._size += len(data)
+                if self._size > self.max_bytes:
+                    self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _evict(self) -> None:
+        # Drop the oldest entries until the cache is back under 90% of its budget
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                os.remove(path)
+            self._size = 0
+
+    def report(self) -> None:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        print(f"Response cache ({self.mode}): {self.hits} hits, {self.misses} misses ({rate:.0%} hit rate)")
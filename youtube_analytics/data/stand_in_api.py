@@ -0,0 +1,341 @@
+"""
+Local stand-in for the subset of the YouTube Data API v3 used by channel_data.py
+and sample_videos_comments.py: channels, search, playlistItems, videos and
+commentThreads, with pagination, ETags and a fake per-key quota. Data comes
+from the deterministic generator in synthetic.py, so channels with millions of
+comments are served without holding them in memory.
+
+Latency (with jitter) and error injection are configurable, which makes every
+fetch-side feature benchmarkable on a machine with no network access. Point the
+client at the URL returned by `serve(...)`, either with
+`client.configure_client_pool(api_endpoint=url)` or the YOUTUBE_API_ENDPOINT
+environment variable.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from youtube_analytics.data.synthetic import SyntheticChannel, SyntheticDataset
+
+ENDPOINTS = ("channels", "search", "playlistItems", "videos", "commentThreads")
+QUOTA_COSTS = {"search": 100}
+
+# Error payloads in the shape the real API uses; rate limits come with Retry-After
+INJECTED_ERRORS = {
+    429: ("rateLimitExceeded", {"Retry-After": "0.1"}),
+    403: ("rateLimitExceeded", {"Retry-After": "0.1"}),
+    500: ("backendError", {}),
+    503: ("backendError", {}),
+}
+
+
+def _api_date(date: str) -> str:
+    return date + "T00:00:00Z" if len(date) == 10 else date
+
+
+def _error(status: int, reason: str, message: str = "") -> Dict:
+    return {"error": {"code": status, "message": message or reason, "errors": [{"reason": reason}]}}
+
+
+def _page(total: int, params: Dict, default_size: int, max_size: int):
+    start = int(params.get("pageToken", 0) or 0)
+    size = min(int(params.get("maxResults", default_size)), max_size)
+    end = min(start + size, total)
+    next_token = str(end) if end < total else None
+    return range(start, end), next_token
+
+
+class StandInAPI:
+    """Builds API responses from a SyntheticDataset. Each endpoint returns (status, payload, headers)."""
+
+    def __init__(self, dataset: SyntheticDataset):
+        self.dataset = dataset
+
+    def channel_resource(self, channel: SyntheticChannel) -> Dict:
+        info = channel.info()
+        return {
+            "kind": "youtube#channel",
+            "id": channel.channel_id,
+            "snippet": {
+                "title": channel.title,
+                "description": info["description"],
+                "customUrl": "@" + channel.handle,
+                "publishedAt": _api_date(info["creation_date"]),
+            },
+            "contentDetails": {"relatedPlaylists": {"uploads": channel.uploads_playlist_id}},
+            "statistics": {
+                "viewCount": info["view_count"],
+                "subscriberCount": info["subscriber_count"],
+                "videoCount": info["video_count"],
+            },
+        }
+
+    def video_resource(self, channel: SyntheticChannel, i: int) -> Dict:
+        video = channel.video(i)
+        minutes, seconds = divmod(video["duration_seconds"], 60)
+        return {
+            "kind": "youtube#video",
+            "id": channel.video_ids[i],
+            "snippet": {
+                "title": video["title"],
+                "description": video["description"],
+                "publishedAt": _api_date(video["published_at"]),
+                "channelId": channel.channel_id,
+            },
+            "statistics": {
+                "viewCount": video["view_count"],
+                "likeCount": video["like_count"],
+                "commentCount": video["comment_count"],
+            },
+            "contentDetails": {"duration": f"PT{minutes}M{seconds}S", "definition": video["definition"], "caption": video["caption"]},
+            "topicDetails": {"topicCategories": video["topics"]},
+        }
+
+    def comment_thread_resource(self, channel: SyntheticChannel, i: int, j: int) -> Dict:
+        comment = channel.comment(i, j)
+        return {
+            "kind": "youtube#commentThread",
+            "id": comment["comment_id"],
+            "snippet": {
+                "videoId": comment["video_id"],
+                "totalReplyCount": comment["num_replies"],
+                "topLevelComment": {
+                    "id": comment["comment_id"],
+                    "snippet": {
+                        "authorDisplayName": comment["author"],
+                        "publishedAt": _api_date(comment["date"]),
+                        "likeCount": comment["likes"],
+                        "textDisplay": comment["comment"],
+                        "textOriginal": comment["comment"],
+                    },
+                },
+            },
+        }
+
+    def channels(self, params: Dict):
+        if "id" in params:
+            found = [self.dataset.by_id.get(cid) for cid in params["id"].split(",")]
+        elif "forUsername" in params:
+            found = [self.dataset.by_handle.get(params["forUsername"].lower())]
+            # Unknown usernames resolve to the first channel, handy for quick benchmarks
+            if found[0] is None and self.dataset.channels:
+                found = [self.dataset.channels[0]]
+        else:
+            return 400, _error(400, "missingRequiredParameter", "No filter selected"), {}
+        return 200, {"kind": "youtube#channelListResponse", "items": [self.channel_resource(c) for c in found if c]}, {}
+
+    def search(self, params: Dict):
+        q = params.get("q", "").lower().lstrip("@")
+        max_results = min(int(params.get("maxResults", 5)), 50)
+        if params.get("type") == "channel":
+            matches = [c for c in self.dataset.channels if q in c.handle.lower() or q in c.title.lower()]
+            items = [
+                {"id": {"kind": "youtube#channel", "channelId": c.channel_id}, "snippet": {"channelId": c.channel_id, "title": c.title}}
+                for c in matches[:max_results]
+            ]
+        else:
+            # Any query returns a deterministic pseudo-random set of videos
+            rng = random.Random(q)
+            video_ids = list(self.dataset.by_video)
+            picks = rng.sample(video_ids, min(max_results, len(video_ids)))
+            items = [
+                {"id": {"kind": "youtube#video", "videoId": vid}, "snippet": {"channelId": self.dataset.by_video[vid][0].channel_id}}
+                for vid in picks
+            ]
+        return 200, {"kind": "youtube#searchListResponse", "items": items}, {}
+
+    def playlistItems(self, params: Dict):
+        channel = self.dataset.by_playlist.get(params.get("playlistId", ""))
+        if channel is None:
+            return 404, _error(404, "playlistNotFound"), {}
+        indices, next_token = _page(channel.num_videos, params, 5, 50)
+        items = []
+        for i in indices:
+            video = channel.video(i)
+            items.append({
+                "kind": "youtube#playlistItem",
+                "snippet": {
+                    "title": video["title"],
+                    "publishedAt": _api_date(video["published_at"]),
+                    "resourceId": {"kind": "youtube#video", "videoId": channel.video_ids[i]},
+                },
+            })
+        payload = {"kind": "youtube#playlistItemListResponse", "items": items, "pageInfo": {"totalResults": channel.num_videos}}
+        if next_token:
+            payload["nextPageToken"] = next_token
+        return 200, payload, {}
+
+    def videos(self, params: Dict):
+        ids = [v for v in params.get("id", "").split(",") if v]
+        if len(ids) > 50:
+            return 400, _error(400, "invalidParameter", "Too many video IDs"), {}
+        items = [self.video_resource(*self.dataset.by_video[v]) for v in ids if v in self.dataset.by_video]
+        return 200, {"kind": "youtube#videoListResponse", "items": items}, {}
+
+    def commentThreads(self, params: Dict):
+        found = self.dataset.by_video.get(params.get("videoId", ""))
+        if found is None:
+            return 404, _error(404, "videoNotFound"), {}
+        channel, i = found
+        if channel.comments_disabled[i]:
+            return 403, _error(403, "commentsDisabled"), {}
+        indices, next_token = _page(channel.comment_counts[i], params, 20, 100)
+        payload = {
+            "kind": "youtube#commentThreadListResponse",
+            "items": [self.comment_thread_resource(channel, i, j) for j in indices],
+        }
+        if next_token:
+            payload["nextPageToken"] = next_token
+        return 200, payload, {}
+
+
+def make_handler(
+    dataset: SyntheticDataset,
+    latency: float = 0.05,
+    jitter: float = 0.0,
+    error_rates: Optional[Dict[int, float]] = None,
+    quota_per_key: Optional[int] = None,
+    seed: Optional[int] = None,
+):
+    api = StandInAPI(dataset)
+    error_rates = error_rates or {}
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    # Fake daily quota per API key, enforced like the real API (403 quotaExceeded)
+    quota_used: Dict[str, int] = {}
+    quota_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload: Dict, headers: Optional[Dict] = None):
+            if status == 200:
+                # Same content, same ETag, like the real API; honour If-None-Match
+                payload["etag"] = hashlib.md5(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+                if self.headers.get("If-None-Match") == payload["etag"]:
+                    self.send_response(304)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            with rng_lock:
+                delay = latency + (rng.uniform(0, jitter) if jitter else 0.0)
+                roll = rng.random()
+            if delay:
+                time.sleep(delay)
+            url = urlparse(self.path)
+            endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+            if quota_per_key is not None:
+                key = params.get("key", "")
+                cost = QUOTA_COSTS.get(endpoint, 1)
+                with quota_lock:
+                    exceeded = quota_used.get(key, 0) + cost > quota_per_key
+                    if not exceeded:
+                        quota_used[key] = quota_used.get(key, 0) + cost
+                if exceeded:
+                    self._send(403, _error(403, "quotaExceeded"))
+                    return
+
+            for status, rate in error_rates.items():
+                if roll < rate:
+                    reason, headers = INJECTED_ERRORS.get(status, ("backendError", {}))
+                    self._send(status, _error(status, reason), headers)
+                    return
+                roll -= rate
+
+            if endpoint not in ENDPOINTS:
+                self._send(404, _error(404, "notFound", f"Unknown endpoint {endpoint}"))
+                return
+            self._send(*getattr(api, endpoint)(params))
+
+    return Handler
+
+
+def serve(
+    dataset: SyntheticDataset,
+    host="127.0.0.1",
+    port=0,
+    latency=0.05,
+    jitter=0.0,
+    error_rates=None,
+    quota_per_key=None,
+    seed=None,
+):
+    """
+    Starts the stand-in server in a daemon thread. Returns (server, base_url).
+    `error_rates` maps an HTTP status (429, 403, 500, 503) to the fraction of
+    requests answered with it.
+    """
+    handler = make_handler(dataset, latency, jitter, error_rates, quota_per_key, seed)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local YouTube Data API stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--channels", type=int, default=1)
+    parser.add_argument("--videos", type=int, default=20, help="Videos per channel")
+    parser.add_argument("--max-comments", type=int, default=500, help="Comments on the most popular video")
+    parser.add_argument("--min-comments", type=int, default=0)
+    parser.add_argument("--skew", type=float, default=0.0, help="Zipf exponent of comments per video (0 = uniform)")
+    parser.add_argument("--comments-disabled-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of delay per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay of up to this many seconds")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rate-500", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--quota-per-key", type=int, default=None, help="Fake quota units per API key")
+    args = parser.parse_args()
+
+    dataset = SyntheticDataset.generate(
+        args.channels,
+        seed=args.seed,
+        num_videos=args.videos,
+        max_comments=args.max_comments,
+        min_comments=args.min_comments,
+        skew=args.skew,
+        comments_disabled_rate=args.comments_disabled_rate,
+    )
+    server, url = serve(
+        dataset,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rates={429: args.rate_429, 500: args.rate_500},
+        quota_per_key=args.quota_per_key,
+        seed=args.seed,
+    )
+    print(f"Stand-in YouTube API listening on {url} ({dataset.total_comments()} comments)")
+    for channel in dataset.channels:
+        print(f"  {channel.channel_id}  @{channel.handle}  {channel.num_videos} videos")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,217 @@
+"""
+Deterministic synthetic YouTube channels for benchmarks and offline testing.
+
+Nothing is stored up front: every video and comment is derived from the
+channel seed and its index, so a channel with millions of comments costs no
+memory until a page of it is requested. Comments are multilingual and include
+the exact repeats real comment sections are full of ("first", emoji strings,
+copypasta).
+
+`write_channel` materialises a channel in the `data/<channel_id>/` layout
+produced by `fetch_channel_data`; `stand_in_api.py` serves it over HTTP.
+"""
+
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from youtube_analytics.data.video_io import write_json, write_video_file_streaming
+
+TOPICS = ["the ending", "the intro", "the editing", "part 2", "the recipe", "the boss fight", "the new phone", "the history"]
+EMOJIS = ["😂", "🔥", "❤️", "👍", "😍", "🙏", "😭", "💯", "👏", "🤣"]
+COPYPASTA = "I came here from the recommended page and honestly this is the best thing I've seen all week, subscribed!"
+
+TEMPLATES: Dict[str, List[str]] = {
+    "en": [
+        "Great video!",
+        "This is exactly what I needed, thanks",
+        "Can you make a video about {topic}?",
+        "The audio is too quiet at {ts}",
+        "{ts} is the best moment",
+        "Who's watching in {year}?",
+        "I disagree with what you said about {topic}.",
+        "Honestly this was boring, the pacing around {topic} was way too slow.",
+        "Check out my channel for free giveaways www.example.com",
+    ],
+    "es": ["¡Excelente video!", "¿Puedes hacer un video sobre {topic}?", "El audio está muy bajo en {ts}", "Me encantó {topic}"],
+    "ru": ["Отличное видео!", "Сделай видео про {topic}", "Звук очень тихий на {ts}", "Не согласен насчёт {topic}"],
+    "zh": ["太棒了！", "能不能做一期关于{topic}的视频？", "{ts} 这里笑死我了", "剪辑有点乱"],
+    "fr": ["Super vidéo !", "Tu peux faire une vidéo sur {topic} ?", "Le son est trop faible à {ts}", "Pas d'accord sur {topic}"],
+    "de": ["Tolles Video!", "Kannst du ein Video über {topic} machen?", "Der Ton ist bei {ts} zu leise", "Sehr hilfreich, danke"],
+    "pt": ["Vídeo incrível!", "Faz um vídeo sobre {topic}?", "O áudio está baixo em {ts}", "Melhor canal"],
+    "hi": ["बहुत बढ़िया वीडियो!", "{topic} पर वीडियो बनाइए", "{ts} पर आवाज़ कम है", "धन्यवाद भाई"],
+    "ar": ["فيديو رائع!", "هل يمكنك عمل فيديو عن {topic}؟", "الصوت منخفض عند {ts}", "شكرا جزيلا"],
+    "ja": ["最高の動画！", "{topic}についての動画を作ってください", "{ts}の音が小さいです", "面白かった"],
+    "ko": ["영상 최고예요!", "{topic}에 대한 영상 만들어 주세요", "{ts} 소리가 너무 작아요", "감사합니다"],
+}
+LANGUAGE_WEIGHTS = {"en": 40, "es": 10, "ru": 8, "zh": 6, "fr": 6, "de": 6, "pt": 8, "hi": 6, "ar": 4, "ja": 3, "ko": 3}
+
+BASE_DATE = datetime(2025, 1, 1)
+
+
+def _comment_text(rng: random.Random) -> str:
+    roll = rng.random()
+    if roll < 0.05:
+        return "first"
+    if roll < 0.12:
+        return "".join(rng.choice(EMOJIS) for _ in range(rng.randint(1, 5)))
+    if roll < 0.14:
+        return COPYPASTA
+    language = rng.choices(list(LANGUAGE_WEIGHTS), weights=list(LANGUAGE_WEIGHTS.values()))[0]
+    text = rng.choice(TEMPLATES[language]).format(
+        topic=rng.choice(TOPICS),
+        ts=f"{rng.randint(0, 59)}:{rng.randint(0, 59):02d}",
+        year=rng.randint(2019, 2025),
+    )
+    if rng.random() < 0.2:
+        text += " " + rng.choice(EMOJIS)
+    return text
+
+
+def _date(dt: datetime) -> str:
+    # Same format as channel_data.format_date
+    return dt.strftime("%Y-%m-%d")
+
+
+class SyntheticChannel:
+    """
+    One synthetic channel. Video comment counts follow a Zipf-like curve: the most
+    popular video has `max_comments` comments, the k-th most popular roughly
+    `max_comments / k**skew` (never fewer than `min_comments`).
+    """
+
+    def __init__(
+        self,
+        index: int = 0,
+        num_videos: int = 20,
+        max_comments: int = 500,
+        min_comments: int = 0,
+        skew: float = 0.0,
+        comments_disabled_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.index = index
+        self.seed = seed
+        self.channel_id = f"UCsynth{seed:05d}{index:012d}"
+        self.handle = f"synthchannel{index}"
+        self.title = f"Synthetic Channel {index}"
+        self.uploads_playlist_id = "UU" + self.channel_id[2:]
+        self.num_videos = num_videos
+        self.video_ids = [f"v{index:03d}{i:07d}" for i in range(num_videos)]
+
+        rng = random.Random(f"{seed}-{index}-layout")
+        ranks = list(range(1, num_videos + 1))
+        rng.shuffle(ranks)
+        self.comment_counts = [max(min_comments, int(max_comments / rank**skew)) for rank in ranks]
+        self.comments_disabled = [rng.random() < comments_disabled_rate for _ in range(num_videos)]
+        # Newest upload first, one every two days
+        self.published = [BASE_DATE - timedelta(days=2 * i, hours=rng.randint(0, 12)) for i in range(num_videos)]
+
+    def info(self) -> Dict:
+        return {
+            "channel_id": self.channel_id,
+            "username": self.title,
+            "description": f"Synthetic channel #{self.index}",
+            "creation_date": "2015-01-01",
+            "uploads_playlist_id": self.uploads_playlist_id,
+            "view_count": str(sum(self.view_count(i) for i in range(self.num_videos))),
+            "subscriber_count": str(1000 * (self.index + 1)),
+            "video_count": str(self.num_videos),
+        }
+
+    def view_count(self, i: int) -> int:
+        return 50 * self.comment_counts[i] + 1000
+
+    def video(self, i: int) -> Dict:
+        """Video metadata in the same shape `get_video_metadata` returns."""
+        rng = random.Random(f"{self.seed}-{self.index}-{i}-video")
+        views = self.view_count(i)
+        return {
+            "title": f"{rng.choice(['Vlog', 'Review', 'Tutorial', 'Gameplay', 'Podcast'])} #{self.num_videos - i}",
+            "description": f"Synthetic video {self.video_ids[i]}. " + " ".join(rng.choice(TOPICS) for _ in range(20)),
+            "published_at": _date(self.published[i]),
+            "view_count": str(views),
+            "like_count": str(views // 25),
+            "comment_count": "0" if self.comments_disabled[i] else str(self.comment_counts[i]),
+            "duration_seconds": rng.choice([30, 45, 59, 300, 600, 1200, 3600]),
+            "definition": "hd",
+            "caption": "false",
+            "topics": [],
+        }
+
+    def comment(self, i: int, j: int) -> Dict:
+        """The j-th newest comment of video i, in the shape `get_comments` returns."""
+        rng = random.Random((self.seed * 1_000_003 + self.index) * 1_000_000_007 + i * 100_000_007 + j)
+        n = self.comment_counts[i]
+        # Comments spread over 30 days after publication, newest first
+        date = self.published[i] + timedelta(seconds=int((n - j) / max(n, 1) * 30 * 86400))
+        return {
+            "comment_id": f"Ugz{self.index:03d}{i:07d}{j:09d}",
+            "video_id": self.video_ids[i],
+            "author": f"@user{rng.randint(0, 10**6)}",
+            "date": _date(date),
+            "likes": int(rng.paretovariate(1.2)) - 1,
+            "comment": _comment_text(rng),
+            "num_replies": rng.randint(1, 30) if rng.random() < 0.1 else 0,
+        }
+
+    def iter_comments(self, i: int, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict]:
+        stop = self.comment_counts[i] if stop is None else min(stop, self.comment_counts[i])
+        for j in range(start, stop):
+            yield self.comment(i, j)
+
+
+class SyntheticDataset:
+    """A set of channels with lookups by channel ID, handle, uploads playlist and video ID."""
+
+    def __init__(self, channels: List[SyntheticChannel]):
+        self.channels = channels
+        self.by_id = {c.channel_id: c for c in channels}
+        self.by_handle = {c.handle.lower(): c for c in channels}
+        self.by_playlist = {c.uploads_playlist_id: c for c in channels}
+        self.by_video = {vid: (c, i) for c in channels for i, vid in enumerate(c.video_ids)}
+
+    @classmethod
+    def generate(cls, num_channels: int = 1, seed: int = 0, **channel_kwargs) -> "SyntheticDataset":
+        return cls([SyntheticChannel(index=k, seed=seed, **channel_kwargs) for k in range(num_channels)])
+
+    def total_comments(self) -> int:
+        return sum(sum(c.comment_counts) for c in self.channels)
+
+
+def write_channel(channel: SyntheticChannel, data_root: str = "data", page_size: int = 1000) -> str:
+    """Writes `channel` to `data_root/<channel_id>/` in the fetch_channel_data layout. Returns the folder."""
+    channel_folder = os.path.join(data_root, channel.channel_id)
+    os.makedirs(channel_folder, exist_ok=True)
+    write_json(channel_folder, "channel_metadata", channel.info())
+
+    for i, vid in enumerate(channel.video_ids):
+        n = 0 if channel.comments_disabled[i] else channel.comment_counts[i]
+        pages = (list(channel.iter_comments(i, start, start + page_size)) for start in range(0, n, page_size))
+        write_video_file_streaming(channel_folder, vid, channel.video(i), pages)
+    return channel_folder
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic channels in the data/<channel_id>/ layout")
+    parser.add_argument("--data-root", default="data", help="Root directory for data files (default: data)")
+    parser.add_argument("--channels", type=int, default=1)
+    parser.add_argument("--videos", type=int, default=20, help="Videos per channel")
+    parser.add_argument("--max-comments", type=int, default=500, help="Comments on the most popular video")
+    parser.add_argument("--min-comments", type=int, default=0)
+    parser.add_argument("--skew", type=float, default=0.0, help="Zipf exponent of comments per video (0 = uniform)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    dataset = SyntheticDataset.generate(
+        args.channels,
+        seed=args.seed,
+        num_videos=args.videos,
+        max_comments=args.max_comments,
+        min_comments=args.min_comments,
+        skew=args.skew,
+    )
+    for channel in dataset.channels:
+        print(f"Wrote {sum(channel.comment_counts)} comments to {write_channel(channel, args.data_root)}")
@@ -0,0 +1,336 @@
+"""
+Reading and writing the JSON files under `data/<channel_id>/`.
+
+Every reader and writer of channel and video files goes through this module, so
+the on-disk encoding is configurable in one place:
+
+* `YOUTUBE_DATA_FORMAT=pretty` (default) writes indented JSON as before,
+  `compact` writes it without whitespace, using orjson when installed;
+* `YOUTUBE_DATA_COMPRESSION=zst` or `gz` writes `<name>.json.zst` /
+  `<name>.json.gz` instead of `<name>.json` (zst needs the zstandard package).
+
+Readers accept every variant, so existing pretty `.json` files keep loading and
+channels can be converted file by file. `configure(...)` changes the settings
+at runtime.
+
+`iter_video_file` streams the comments of a video file one at a time, so stages
+can process videos with hundreds of thousands of comments in bounded memory;
+`write_video_file_streaming` is its counterpart for writing.
+"""
+
+import gzip
+import io
+import json
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional fast JSON backend
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for .json.zst files
+    zstandard = None
+
+FORMATS = ("pretty", "compact")
+COMPRESSIONS = ("", "gz", "zst")
+DATA_SUFFIXES = (".json", ".json.zst", ".json.gz")
+METADATA_NAME = "channel_metadata"
+# Characters read at a time by the streaming reader
+STREAM_CHUNK_SIZE = 1 << 20
+
+DATA_FORMAT = os.environ.get("YOUTUBE_DATA_FORMAT", "pretty")
+DATA_COMPRESSION = os.environ.get("YOUTUBE_DATA_COMPRESSION", "")
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def configure(format: Optional[str] = None, compression: Optional[str] = None, backend: Optional[str] = None) -> None:
+    """Sets the encoding used by all subsequent writes and the JSON backend ("json" or "orjson")."""
+    global DATA_FORMAT, DATA_COMPRESSION, JSON_BACKEND
+    if backend is not None:
+        if backend not in ("json", "orjson"):
+            raise ValueError(f"Unknown JSON backend {backend!r}")
+        if backend == "orjson" and orjson is None:
+            raise ImportError("The orjson backend needs the orjson package: pip install orjson")
+        JSON_BACKEND = backend
+    if format is not None:
+        if format not in FORMATS:
+            raise ValueError(f"Unknown data format {format!r}, expected one of {FORMATS}")
+        DATA_FORMAT = format
+    if compression is not None:
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression!r}, expected one of {COMPRESSIONS}")
+        if compression == "zst" and zstandard is None:
+            raise ImportError("zstd compression needs the zstandard package: pip install zstandard")
+        DATA_COMPRESSION = compression
+
+
+def dumps(obj: Any, indent: Optional[int] = 4) -> str:
+    """
+    Encodes `obj` in the configured format. `indent` applies in pretty mode only;
+    pass None to always get a single line.
+    """
+    if DATA_FORMAT == "pretty" and indent is not None:
+        return json.dumps(obj, indent=indent, ensure_ascii=False)
+    if JSON_BACKEND == "orjson":
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(data) -> Any:
+    if JSON_BACKEND == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def data_name(filename: str) -> Optional[str]:
+    """`<name>` for a data file name like `<name>.json` / `.json.zst` / `.json.gz`, else None."""
+    for suffix in DATA_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[: -len(suffix)]
+    return None
+
+
+def find_data_file(channel_dir: str, name: str) -> Optional[str]:
+    """Path of the stored variant of `<name>.json*` in `channel_dir`, or None."""
+    for suffix in DATA_SUFFIXES:
+        path = os.path.join(channel_dir, name + suffix)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def list_video_ids(channel_dir: str) -> List[str]:
+    """IDs of the videos stored in `channel_dir`, sorted."""
+    names = (data_name(f) for f in os.listdir(channel_dir))
+    return sorted({n for n in names if n is not None and n != METADATA_NAME})
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError(f"Reading {path} needs the zstandard package: pip install zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read()
+    if path.endswith(".gz"):
+        return gzip.decompress(data)
+    return data
+
+
+def read_json(channel_dir: str, name: str) -> Dict:
+    """Loads `<name>.json` (or its compressed variant) from `channel_dir`."""
+    path = find_data_file(channel_dir, name)
+    if path is None:
+        raise FileNotFoundError(os.path.join(channel_dir, name + ".json"))
+    return loads(_read_bytes(path))
+
+
+def _open_for_read(path: str):
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError(f"Reading {path} needs the zstandard package: pip install zstandard")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True), encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+_WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+
+class _JSONStream:
+    """Reads one JSON document from a text file piece by piece."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, "" at the end of the file."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Malformed video file: expected {char!r}, got {self.peek()!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A value ending exactly at the buffer end may be cut short (e.g. a number)
+            if end < len(self.buf) or not self._fill():
+                self.pos = end
+                return obj
+
+
+def _read_members(stream: _JSONStream, metadata: Dict, stop_at: Optional[str]) -> bool:
+    """Reads object members into `metadata` until the key `stop_at`. True if it was found."""
+    while stream.peek() != "}":
+        if stream.peek() == ",":
+            stream.pos += 1
+        key = stream.value()
+        stream.expect(":")
+        if key == stop_at:
+            return True
+        metadata[key] = stream.value()
+    stream.pos += 1
+    return False
+
+
+def _iter_array(stream: _JSONStream, f, metadata: Dict) -> Iterator[Dict]:
+    try:
+        stream.expect("[")
+        while stream.peek() != "]":
+            if stream.peek() == ",":
+                stream.pos += 1
+            yield stream.value()
+        stream.pos += 1
+        # Members after "comments" (e.g. results appended by older stage versions)
+        _read_members(stream, metadata, None)
+    finally:
+        f.close()
+
+
+def iter_video_file(channel_dir: str, video_id: str) -> Tuple[Dict, Optional[Iterator[Dict]]]:
+    """
+    Streams `<video_id>.json*`: returns (metadata, comments) where `comments`
+    lazily yields the comments one at a time (None when the file has no
+    "comments" key). Fields stored after the comments are added to `metadata`
+    once `comments` is exhausted.
+    """
+    path = find_data_file(channel_dir, video_id)
+    if path is None:
+        raise FileNotFoundError(os.path.join(channel_dir, video_id + ".json"))
+    f = _open_for_read(path)
+    try:
+        stream = _JSONStream(f)
+        stream.expect("{")
+        metadata: Dict = {}
+        if not _read_members(stream, metadata, "comments"):
+            f.close()
+            return metadata, None
+        if stream.peek() == "n":  # "comments": null
+            stream.value()
+            _read_members(stream, metadata, None)
+            f.close()
+            return metadata, iter(())
+    except BaseException:
+        f.close()
+        raise
+    return metadata, _iter_array(stream, f, metadata)
+
+
+def _target_path(channel_dir: str, name: str) -> str:
+    suffix = ".json" + (f".{DATA_COMPRESSION}" if DATA_COMPRESSION else "")
+    return os.path.join(channel_dir, name + suffix)
+
+
+def _open_for_write(path: str):
+    if path.endswith(".zst.tmp"):
+        if zstandard is None:
+            raise ImportError("zstd compression needs the zstandard package: pip install zstandard")
+        raw = zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"))
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    if path.endswith(".gz.tmp"):
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    return open(path, "w", encoding="utf-8")
+
+
+def _commit(channel_dir: str, name: str, path: str, tmp_path: str) -> None:
+    os.replace(tmp_path, path)
+    # Drop the variants written under another encoding
+    for suffix in DATA_SUFFIXES:
+        other = os.path.join(channel_dir, name + suffix)
+        if other != path and os.path.exists(other):
+            os.remove(other)
+
+
+def write_json(channel_dir: str, name: str, obj: Any, indent: int = 4) -> str:
+    """Atomically writes `obj` as `<name>.json*` in the configured encoding. Returns the path."""
+    path = _target_path(channel_dir, name)
+    tmp_path = f"{path}.tmp"
+    try:
+        with _open_for_write(tmp_path) as f:
+            f.write(dumps(obj, indent))
+        _commit(channel_dir, name, path, tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def _indent(text, spaces):
+    return text.replace("\n", "\n" + " " * spaces)
+
+
+def write_video_file(channel_folder, video_id, metadata, comments):
+    """Writes `<video_id>.json` and returns the number of comments written."""
+    return write_video_file_streaming(channel_folder, video_id, metadata, [comments])
+
+
+def write_video_file_streaming(channel_folder, video_id, metadata, comment_pages):
+    """
+    Writes `<video_id>.json` while consuming `comment_pages` (an iterable of comment
+    lists, e.g. `iter_comment_pages(...)`), so only one page is held in memory. In
+    pretty mode the output is identical to `json.dump(video_data, f, indent=4,
+    ensure_ascii=False)`. It goes to a temporary file that is renamed into place
+    once complete, so a crash never leaves a truncated video file. Returns the
+    number of comments.
+    """
+    path = _target_path(channel_folder, video_id)
+    tmp_path = f"{path}.tmp"
+    pretty = DATA_FORMAT == "pretty"
+    n_comments = 0
+    try:
+        with _open_for_write(tmp_path) as vf:
+            vf.write("{")
+            for key, value in metadata.items():
+                if pretty:
+                    vf.write(f"\n    {json.dumps(key, ensure_ascii=False)}: {_indent(dumps(value), 4)},")
+                else:
+                    vf.write(f"{dumps(key, None)}:{dumps(value, None)},")
+            vf.write('\n    "comments": [' if pretty else '"comments":[')
+            for page in comment_pages:
+                for comment in page:
+                    vf.write("," if n_comments else "")
+                    if pretty:
+                        vf.write("\n        " + _indent(dumps(comment), 8))
+                    else:
+                        vf.write(dumps(comment, None))
+                    n_comments += 1
+            if pretty:
+                vf.write("\n    ]\n}" if n_comments else "]\n}")
+            else:
+                vf.write("]}")
+        _commit(channel_folder, video_id, path, tmp_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return n_comments
@@ -0,0 +1,477 @@
+"""
+Comment flags: tags comments with the five creator flags of the classifier
+fine-tuned in fine_tune_bert/fine_tuning.py (is_request, is_question,
+is_highlight, is_feedback, is_spam).
+
+The model sees a comment together with its video's title and description, as
+in training. That context is tokenized once per video and its token IDs are
+joined with each comment's (`encode_flag_inputs`), and identical inputs are
+scored once. Comments are pooled across videos, sorted by token length and
+batched by a padded-token budget. A flag is set when its probability reaches
+that flag's threshold, calibrated on the training eval split (`thresholds.json`
+next to the model, written by fine_tuning.py or by `calibrate`) instead of a
+flat 0.5. On CPU the model runs with PyTorch's SDPA attention, since
+flash_attention_2 needs a GPU.
+
+    python -m youtube_analytics.nlp.comment_flags tag <channel_id> [--model-dir ...]
+    python -m youtube_analytics.nlp.comment_flags calibrate --data classification_data/labeled_dataset.json
+
+Results go to the "flags" annotation sidecar: per comment `flags` (the flags
+that are set) and `flag_scores` ({flag: probability}).
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from tqdm import tqdm
+
+from youtube_analytics.data.annotations import commit, input_hash, read_inputs
+from youtube_analytics.data.comment_store import has_store, read_comments
+from youtube_analytics.data.video_io import (
+    iter_video_file,
+    list_video_ids,
+    read_json,
+)
+from youtube_analytics.nlp.sentiment import POOL_SIZE, token_batches
+
+FLAGS = ["is_request", "is_question", "is_highlight", "is_feedback", "is_spam"]
+MODEL_DIR = os.environ.get(
+    "YOUTUBE_FLAG_MODEL", os.path.join(".", "modernbert-youtube-comments-final")
+)
+THRESHOLDS_FILE = "thresholds.json"
+# As in training
+MAX_LENGTH = 2048
+DESCRIPTION_CHARS = 500
+# Padded tokens per batch; inputs carry the title and description, so they are
+# longer than bare comments
+TOKEN_BUDGET = 16384
+
+
+def flag_context(title: str, description: str) -> str:
+    """The part of the model input shared by all comments of a video."""
+    description = description or ""
+    if len(description) > DESCRIPTION_CHARS:
+        description = description[:DESCRIPTION_CHARS] + "..."
+    return f"Title: {title}\nDescription: {description}\nComment:"
+
+
+def flag_input(title: str, description: str, comment: str) -> str:
+    """The model input for a comment, in the format it was trained on."""
+    return f"{flag_context(title, description)} {comment}"
+
+
+def encode_flag_inputs(
+    tokenizer, pairs: Sequence[Tuple[str, str]], max_length: int = MAX_LENGTH
+) -> Tuple[List[List[int]], Dict[str, int]]:
+    """
+    Token IDs of the (context, comment) pairs: the context's IDs followed by
+    those of `" " + comment`, tokenized as separate segments, cut to
+    `max_length` including the special tokens and wrapped in them. Each distinct
+    context is tokenized once and its IDs are reused for all of its comments.
+
+    This is the encoding the model is trained (fine_tuning.py) and run with. It
+    is not guaranteed to equal tokenizing `f"{context} {comment}"` in one piece:
+    merges never cross the segment boundary, and truncation cuts the joined IDs.
+    Also returns the number of tokens tokenized and the number a per-comment
+    encoding would have tokenized.
+    """
+    contexts = list(dict.fromkeys(context for context, _ in pairs))
+    context_ids = dict(
+        zip(contexts, tokenizer(contexts, add_special_tokens=False)["input_ids"])
+    )
+    # The space after "Comment:" belongs to the first word's token, as it does
+    # when the whole input is tokenized
+    comment_ids = tokenizer(
+        [" " + comment for _, comment in pairs], add_special_tokens=False
+    )["input_ids"]
+    budget = max_length - tokenizer.num_special_tokens_to_add()
+    input_ids = [
+        tokenizer.build_inputs_with_special_tokens(
+            (context_ids[context] + ids)[:budget]
+        )
+        for (context, _), ids in zip(pairs, comment_ids)
+    ]
+    n_context = sum(len(ids) for ids in context_ids.values())
+    n_comments = sum(len(ids) for ids in comment_ids)
+    stats = {
+        "tokenized": n_context + n_comments,
+        "per_comment": n_comments
+        + sum(len(context_ids[context]) for context, _ in pairs),
+    }
+    return input_ids, stats
+
+
+def load_flag_model(model_dir: str = MODEL_DIR):
+    """Returns (tokenizer, model, device) with the model in eval mode."""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    if torch.cuda.is_available():
+        device = torch.device("cuda")
+        try:
+            import flash_attn  # noqa: F401
+
+            attention = "flash_attention_2"
+        except ImportError:
+            attention = "sdpa"
+        dtype = torch.bfloat16
+    else:
+        device, attention, dtype = torch.device("cpu"), "sdpa", torch.float32
+
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        model_dir, attn_implementation=attention, torch_dtype=dtype
+    ).to(device)
+    model.eval()
+    return tokenizer, model, device
+
+
+def model_fingerprint(model_dir: str) -> Dict:
+    """Identifies the fine-tuned weights by the size and mtime of their files."""
+    files = sorted(
+        (name, os.path.getsize(path), int(os.path.getmtime(path)))
+        for name in os.listdir(model_dir)
+        for path in [os.path.join(model_dir, name)]
+        if name.endswith((".safetensors", ".bin"))
+    )
+    return {
+        "model": os.path.basename(os.path.abspath(model_dir)),
+        "weights": input_hash(files),
+    }
+
+
+def predict_flags(
+    pairs: Sequence[Tuple[str, str]],
+    tokenizer,
+    model,
+    device,
+    batch_size=32,
+    token_budget=TOKEN_BUDGET,
+) -> List[List[float]]:
+    """
+    Probability of each flag (in FLAGS order) for each (context, comment) pair
+    (see `flag_context`), in input order. Identical pairs are scored once;
+    inputs are encoded by `encode_flag_inputs`, sorted by token length and
+    batched by `token_budget` padded tokens, as in `sentiment.predict_sentiment`.
+    """
+    import torch
+
+    unique = list(dict.fromkeys(pairs))
+    input_ids, _ = encode_flag_inputs(tokenizer, unique)
+    lengths = [len(ids) for ids in input_ids]
+    probs = [None] * len(unique)
+    for batch in token_batches(lengths, token_budget, batch_size):
+        inputs = tokenizer.pad(
+            [{"input_ids": input_ids[i]} for i in batch], return_tensors="pt"
+        ).to(device)
+        with torch.no_grad():
+            logits = model(**inputs).logits
+        # Multi-label: one sigmoid per flag
+        for i, prob in zip(batch, torch.sigmoid(logits.float()).cpu().tolist()):
+            probs[i] = prob
+    index = {pair: i for i, pair in enumerate(unique)}
+    return [probs[index[pair]] for pair in pairs]
+
+
+def load_thresholds(model_dir: str = MODEL_DIR) -> Dict[str, float]:
+    path = os.path.join(model_dir, THRESHOLDS_FILE)
+    if not os.path.exists(path):
+        print(
+            f"No calibrated thresholds in {path}, using 0.5 for every flag "
+            "(run python -m youtube_analytics.nlp.comment_flags calibrate)"
+        )
+        return {flag: 0.5 for flag in FLAGS}
+    with open(path, encoding="utf-8") as f:
+        thresholds = json.load(f)
+    return {flag: thresholds.get(flag, 0.5) for flag in FLAGS}
+
+
+def save_thresholds(thresholds: Dict[str, float], model_dir: str = MODEL_DIR) -> None:
+    with open(os.path.join(model_dir, THRESHOLDS_FILE), "w", encoding="utf-8") as f:
+        json.dump(thresholds, f, indent=4)
+
+
+def _f1(probs: Sequence[float], labels: Sequence[int], threshold: float) -> float:
+    tp = sum(p >= threshold and y for p, y in zip(probs, labels))
+    fp = sum(p >= threshold and not y for p, y in zip(probs, labels))
+    fn = sum(p < threshold and y for p, y in zip(probs, labels))
+    return 2 * tp / (2 * tp + fp + fn) if tp else 0.0
+
+
+def calibrate_thresholds(
+    probs: Sequence[Sequence[float]], labels: Sequence[Sequence[int]]
+) -> Dict[str, float]:
+    """
+    Per flag, the threshold (0.05 to 0.95 in steps of 0.01) with the best F1 on
+    the given eval predictions; ties go to the threshold closest to 0.5.
+    """
+    grid = [round(0.05 + 0.01 * i, 2) for i in range(91)]
+    thresholds = {}
+    for k, flag in enumerate(FLAGS):
+        column = [p[k] for p in probs]
+        truth = [int(y[k]) for y in labels]
+        thresholds[flag] = max(
+            grid, key=lambda t: (_f1(column, truth, t), -abs(t - 0.5))
+        )
+    return thresholds
+
+
+class FlagClassifier:
+    """
+    The fine-tuned flag model with its calibrated thresholds, loaded once.
+    `score(pairs)` takes (context, comment) pairs (see `flag_context`) and
+    returns {"flags", "flag_scores"} per pair.
+    """
+
+    def __init__(
+        self,
+        model_dir: str = MODEL_DIR,
+        batch_size: int = 32,
+        token_budget: int = TOKEN_BUDGET,
+        thresholds: Optional[Dict[str, float]] = None,
+    ):
+        self.tokenizer, self.model, self.device = load_flag_model(model_dir)
+        self.batch_size = batch_size
+        self.token_budget = token_budget
+        self.thresholds = thresholds or load_thresholds(model_dir)
+        # Thresholds decide the flags, so they are part of what results depend on
+        self.model_fp = {**model_fingerprint(model_dir), "thresholds": self.thresholds}
+        self.seconds = 0.0
+        self.scored = 0
+
+    def score(self, pairs: List[Tuple[str, str]]) -> List[Dict]:
+        start = time.perf_counter()
+        probs = predict_flags(
+            pairs,
+            self.tokenizer,
+            self.model,
+            self.device,
+            self.batch_size,
+            self.token_budget,
+        )
+        self.seconds += time.perf_counter() - start
+        self.scored += len(pairs)
+        return [
+            {
+                "flags": [f for f, p in zip(FLAGS, prob) if p >= self.thresholds[f]],
+                "flag_scores": {f: round(p, 3) for f, p in zip(FLAGS, prob)},
+            }
+            for prob in probs
+        ]
+
+    def fingerprint(self, context: str, comment: str) -> str:
+        return input_hash("flags", self.model_fp, f"{context} {comment}")
+
+    def report(self) -> None:
+        if self.scored:
+            print(
+                f"Flagged {self.scored} comments in {self.seconds:.1f}s of inference "
+                f"({self.scored / self.seconds:.1f} comments/s)"
+            )
+
+
+def _video_comments(channel_dir: str, video_id: str, store_rows: Optional[Dict]):
+    """(context, comments) of a video, from its JSON or the columnar store."""
+    if store_rows is not None:
+        metadata = read_json(channel_dir, video_id)
+        comments = store_rows.get(video_id, [])
+    else:
+        # title and description are written before the comments
+        metadata, comments = iter_video_file(channel_dir, video_id)
+    return (
+        flag_context(metadata.get("title", ""), metadata.get("description", "")),
+        comments,
+    )
+
+
+def tag_channel_flags(
+    channel_id: str,
+    data_root: str = "data",
+    model_dir: str = MODEL_DIR,
+    batch_size: int = 32,
+    token_budget: int = TOKEN_BUDGET,
+    force: bool = False,
+    classifier: Optional[FlagClassifier] = None,
+) -> None:
+    """
+    Tags every comment of a channel whose text, video title/description or
+    model changed since the last run (`force=True`: all of them) and appends
+    the flags to the "flags" annotation sidecar. Prints comments/second.
+    """
+    channel_dir = os.path.join(data_root, channel_id)
+    if not os.path.exists(channel_dir):
+        print(f"Channel directory not found: {channel_dir}")
+        return
+
+    classifier = classifier or FlagClassifier(model_dir, batch_size, token_budget)
+    store_rows = None
+    if has_store(channel_dir):
+        # Columnar store: the texts come from the store, flags go to the sidecar
+        store_rows = {}
+        table = read_comments(channel_dir, ["comment_id", "video_id", "text"])
+        for row in table.to_pylist():
+            store_rows.setdefault(row["video_id"], []).append(
+                {"comment_id": row["comment_id"], "comment": row["text"]}
+            )
+
+    pool = []  # (video_id, comment_id, (context, comment), fingerprint)
+    total = skipped = 0
+    start = time.perf_counter()
+    for video_id in tqdm(list_video_ids(channel_dir)):
+        try:
+            context, comments = _video_comments(channel_dir, video_id, store_rows)
+            if comments is None:
+                continue
+            recorded = {} if force else read_inputs(channel_dir, "flags", video_id)[1]
+            for c in comments:
+                total += 1
+                fingerprint = classifier.fingerprint(context, c["comment"])
+                if recorded.get(c["comment_id"]) == fingerprint:
+                    skipped += 1
+                    continue
+                pool.append(
+                    (video_id, c["comment_id"], (context, c["comment"]), fingerprint)
+                )
+                if len(pool) >= POOL_SIZE:
+                    _flush(channel_dir, classifier, pool)
+                    pool = []
+        except Exception as e:
+            print(f"Error processing {video_id}: {str(e)}")
+    _flush(channel_dir, classifier, pool)
+
+    seconds = time.perf_counter() - start
+    if skipped:
+        print(
+            f"Skipped {skipped} of {total} comments already flagged with the same input and model (use --force to redo)"
+        )
+    classifier.report()
+    if total - skipped:
+        print(
+            f"{total - skipped} comments in {seconds:.1f}s overall ({(total - skipped) / seconds:.1f} comments/s)"
+        )
+
+
+def _flush(channel_dir: str, classifier: FlagClassifier, pool: List) -> None:
+    if not pool:
+        return
+    try:
+        results = classifier.score([pair for _, _, pair, _ in pool])
+    except Exception as e:
+        # not committed, so these comments are tagged again on the next run
+        print(f"Error flagging {len(pool)} comments: {str(e)}")
+        return
+    by_video = {}
+    for (video_id, comment_id, _, fingerprint), result in zip(pool, results):
+        comments, inputs = by_video.setdefault(video_id, ({}, {}))
+        comments[comment_id] = result
+        inputs[comment_id] = fingerprint
+    for video_id, (comments, inputs) in by_video.items():
+        commit(
+            channel_dir,
+            "flags",
+            video_id,
+            comments=comments,
+            inputs={"comments": inputs},
+        )
+
+
+def calibrate(
+    data_path: str = os.path.join("classification_data", "labeled_dataset.json"),
+    model_dir: str = MODEL_DIR,
+    test_size: float = 0.1,
+    seed: int = 97,
+) -> Dict[str, float]:
+    """
+    Recreates the eval split of fine_tuning.py (same test_size and seed), scores
+    it, and saves the per-flag thresholds with the best F1 next to the model.
+    """
+    from datasets import Dataset
+
+    with open(data_path, "r", encoding="utf-8") as f:
+        raw_data = json.load(f)
+    eval_split = Dataset.from_list(raw_data).train_test_split(
+        test_size=test_size, seed=seed
+    )["test"]
+    pairs = [
+        (flag_context(row["video_title"], row["video_description"]), row["comment"])
+        for row in eval_split
+    ]
+    labels = [[row[flag] for flag in FLAGS] for row in eval_split]
+    tokenizer, model, device = load_flag_model(model_dir)
+    probs = predict_flags(pairs, tokenizer, model, device)
+    thresholds = calibrate_thresholds(probs, labels)
+    save_thresholds(thresholds, model_dir)
+    return thresholds
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Tag comments with the fine-tuned comment-flag classifier"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    tag_parser = subparsers.add_parser("tag", help="Flag the comments of a channel")
+    tag_parser.add_argument("channel_id", help="The YouTube channel ID to tag")
+    tag_parser.add_argument(
+        "--data-root",
+        default="data",
+        help="Root directory for data files (default: data)",
+    )
+    tag_parser.add_argument(
+        "--model-dir",
+        default=MODEL_DIR,
+        help=f"Fine-tuned model (default: {MODEL_DIR})",
+    )
+    tag_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=32,
+        help="Maximum comments per batch (default: 32)",
+    )
+    tag_parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=TOKEN_BUDGET,
+        help=f"Padded tokens per batch (default: {TOKEN_BUDGET})",
+    )
+    tag_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-tag comments already tagged with the same input and model",
+    )
+
+    calibrate_parser = subparsers.add_parser(
+        "calibrate", help="Pick per-flag thresholds on the training eval split"
+    )
+    calibrate_parser.add_argument(
+        "--data",
+        default=os.path.join("classification_data", "labeled_dataset.json"),
+        help="Labeled dataset used for fine-tuning",
+    )
+    calibrate_parser.add_argument(
+        "--model-dir",
+        default=MODEL_DIR,
+        help=f"Fine-tuned model (default: {MODEL_DIR})",
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "tag":
+        tag_channel_flags(
+            args.channel_id,
+            data_root=args.data_root,
+            model_dir=args.model_dir,
+            batch_size=args.batch_size,
+            token_budget=args.token_budget,
+            force=args.force,
+        )
+    else:
+        thresholds = calibrate(args.data, args.model_dir)
+        print(
+            "Calibrated thresholds: "
+            + ", ".join(f"{f} {t:.2f}" for f, t in thresholds.items())
+        )
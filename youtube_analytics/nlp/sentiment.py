@@ -1,85 +1,523 @@
 import os
-import json
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
 from tqdm import tqdm
 
+try:
+    import torch
+except ImportError:  # not needed with the ONNX backend or the sentiment service
+    torch = None
+try:
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+except ImportError:
+    AutoTokenizer = None
+
+from youtube_analytics.data.annotations import (
+    commit,
+    dirty_comments,
+    input_hash,
+    read_inputs,
+)
+from youtube_analytics.data.video_io import iter_video_file, list_video_ids
+from youtube_analytics.data.comment_store import has_store, read_comments, write_columns
+from youtube_analytics.nlp.sentiment_cache import DEFAULT_CACHE_DIR, cached
+
+MODEL_NAME = "AmaanP314/youtube-xlm-roberta-base-sentiment-multilingual"
+# Define label mapping
+LABEL_MAPPING = {0: "Negative", 1: "Neutral", 2: "Positive"}
+MAX_LENGTH = 512
+# Padded tokens per batch (batch size x longest comment in it)
+TOKEN_BUDGET = 8192
+# Comments pooled across videos before they are sorted by length and scored
+POOL_SIZE = 4096
+# "onnx" runs the exported INT8 model with ONNX Runtime (see sentiment_onnx.py)
+BACKENDS = ("torch", "onnx")
 
-def analyze_channel_sentiment(channel_id, data_root="data", batch_size=64):
-    # Define device and model paths
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model_name = "AmaanP314/youtube-xlm-roberta-base-sentiment-multilingual"
 
-    # Load model and tokenizer
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name).to(device)
+def load_sentiment_model(backend="torch"):
+    """Returns (tokenizer, model, device) with the model in eval mode."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    if backend == "onnx":
+        from youtube_analytics.nlp.sentiment_onnx import load_onnx_model
+
+        return load_onnx_model()
+    if torch is None or AutoTokenizer is None:
+        raise ImportError(
+            "The sentiment model needs torch and transformers (or pass service_url)"
+        )
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME).to(device)
     model.eval()
+    return tokenizer, model, device
 
-    # Define label mapping
-    label_mapping = {0: "Negative", 1: "Neutral", 2: "Positive"}
 
-    # Prepare channel directory path
-    channel_dir = os.path.join(data_root, channel_id)
-    if not os.path.exists(channel_dir):
-        print(f"Channel directory not found: {channel_dir}")
-        return
+def model_fingerprint(model):
+    """Identifies the model weights: name plus the hub revision they were loaded from."""
+    if hasattr(model, "fingerprint"):  # exported ONNX model
+        return model.fingerprint
+    return {
+        "model": MODEL_NAME,
+        "revision": getattr(model.config, "_commit_hash", None),
+    }
+
+
+def comment_fingerprint(text, model_fp):
+    return input_hash("sentiment", model_fp, text)
+
+
+def token_batches(lengths, token_budget, max_batch_size):
+    """
+    Groups indices of `lengths` (token counts) into batches sorted by length, each
+    holding at most `max_batch_size` items and `token_budget` padded tokens.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batch = []
+    for i in order:
+        # sorted ascending, so the batch pads to the length of its newest item
+        if batch and (
+            len(batch) >= max_batch_size or (len(batch) + 1) * lengths[i] > token_budget
+        ):
+            yield batch
+            batch = []
+        batch.append(i)
+    if batch:
+        yield batch
+
+
+def predict_sentiment(
+    texts, tokenizer, model, device, batch_size=64, token_budget=TOKEN_BUDGET
+):
+    """
+    Sentiment probabilities ({label: p}, rounded to 2 places) for each text, in
+    input order. Texts are tokenized once, sorted by token length and batched by
+    `token_budget` padded tokens (at most `batch_size` texts per batch), so short
+    comments are not padded to the length of a long one. `token_budget=None`
+    batches `batch_size` texts at a time in input order instead. `model` is the
+    PyTorch model or an `OnnxSentimentModel`.
+    """
+    onnx = getattr(model, "backend", None) == "onnx"
+    tensors = "np" if onnx else "pt"
+    if token_budget is None:
+        batches = [
+            list(range(i, min(i + batch_size, len(texts))))
+            for i in range(0, len(texts), batch_size)
+        ]
+        encodings = None
+    else:
+        encodings = tokenizer(list(texts), truncation=True, max_length=MAX_LENGTH)
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+        batches = token_batches(lengths, token_budget, batch_size)
+
+    results = [None] * len(texts)
+    for batch in batches:
+        # Tokenize (or pad the pre-tokenized texts) and move to device
+        if encodings is None:
+            inputs = tokenizer(
+                [texts[i] for i in batch],
+                return_tensors=tensors,
+                padding=True,
+                truncation=True,
+                max_length=MAX_LENGTH,
+            )
+        else:
+            features = [{key: encodings[key][i] for key in encodings} for i in batch]
+            inputs = tokenizer.pad(features, return_tensors=tensors)
+
+        # Predict sentiment probabilities
+        if onnx:
+            probs = model.probs(inputs)
+        else:
+            inputs = inputs.to(device)
+            with torch.no_grad():
+                outputs = model(**inputs)
+            probs = torch.nn.functional.softmax(outputs.logits, dim=-1).cpu().numpy()
+
+        # Scatter back to the input positions
+        for i, prob in zip(batch, probs):
+            results[i] = {
+                LABEL_MAPPING[k]: round(float(v), 2) for k, v in enumerate(prob)
+            }
+    return results
+
+
+def load_predictor(
+    batch_size=64,
+    token_budget=TOKEN_BUDGET,
+    service_url=None,
+    backend="torch",
+    workers=1,
+    threads=None,
+    cache_dir=None,
+    cascade=False,
+    cascade_threshold=None,
+):
+    """
+    (predict, model fingerprint) where predict maps texts to sentiments, either
+    with the model (of `backend`) loaded in this process, on `workers` processes
+    with `threads` threads each (see sentiment_workers.py), or through the
+    sentiment service at `service_url` (see sentiment_service.py), which keeps
+    the model loaded. With `cache_dir`, texts scored before by the same model
+    are served from the cache there (see sentiment_cache.py). With `cascade`,
+    short comments the linear model of sentiment_cascade.py is at least
+    `cascade_threshold` sure about never reach the transformer; the fingerprint
+    then covers the cascade too. Call `close()` on predict when it has one.
+    """
+    predict, model_fp = _load_predictor(
+        batch_size, token_budget, service_url, backend, workers, threads
+    )
+    predict = cached(predict, model_fp, cache_dir)
+    if not cascade:
+        return predict, model_fp
+
+    from youtube_analytics.nlp.sentiment_cascade import (
+        DEFAULT_THRESHOLD,
+        CascadePredictor,
+        CheapSentimentModel,
+        cascade_fingerprint,
+    )
+
+    cheap = CheapSentimentModel.load()
+    predict = CascadePredictor(predict, cheap, cascade_threshold or DEFAULT_THRESHOLD)
+    model_fp = {
+        **model_fp,
+        "cascade": cascade_fingerprint(cheap, predict.threshold, predict.max_words),
+    }
+    return predict, model_fp
 
-    # Process each video file in the channel directory
-    for filename in tqdm(os.listdir(channel_dir)):
-        if filename == "channel_metadata.json" or not filename.endswith(".json"):
-            continue
 
-        filepath = os.path.join(channel_dir, filename)
+def _load_predictor(batch_size, token_budget, service_url, backend, workers, threads):
+    if service_url:
+        from youtube_analytics.nlp.sentiment_service import SentimentClient
 
+        client = SentimentClient(service_url)
+        return client.score, client.model_fingerprint()
+    if workers > 1:
+        from youtube_analytics.nlp.sentiment_workers import ShardedPredictor
+
+        predictor = ShardedPredictor(
+            workers, threads, batch_size, token_budget, backend
+        )
+        return predictor, predictor.fingerprint
+    if threads and backend == "torch":
+        torch.set_num_threads(threads)
+
+    tokenizer, model, device = load_sentiment_model(backend)
+    return (
+        lambda texts: predict_sentiment(
+            texts, tokenizer, model, device, batch_size, token_budget
+        ),
+        model_fingerprint(model),
+    )
+
+
+class SentimentScorer:
+    """
+    Loads the sentiment model once and scores comment texts in-process,
+    independent of the data directory. The arguments are those of
+    `load_predictor`.
+
+        with SentimentScorer(backend="onnx") as scorer:
+            scorer.score(["Great video!", "Melhor canal"])
+            for comment, sentiment in scorer.iter_scores(comment_stream):
+                ...
+
+    Texts are pooled `pool_size` at a time, so comments of many sources share
+    length-bucketed batches while memory stays bounded.
+    """
+
+    def __init__(
+        self,
+        batch_size=64,
+        token_budget=TOKEN_BUDGET,
+        service_url=None,
+        backend="torch",
+        workers=1,
+        threads=None,
+        cache_dir=None,
+        cascade=False,
+        cascade_threshold=None,
+        pool_size=POOL_SIZE,
+    ):
+        self.predict, self.model_fp = load_predictor(
+            batch_size,
+            token_budget,
+            service_url,
+            backend,
+            workers,
+            threads,
+            cache_dir,
+            cascade,
+            cascade_threshold,
+        )
+        self.pool_size = pool_size
+
+    def score(self, texts):
+        """Sentiment ({label: p}) of each text, in input order."""
+        results = []
+        for start in range(0, len(texts), self.pool_size):
+            results.extend(self.predict(list(texts[start : start + self.pool_size])))
+        return results
+
+    def iter_scores(self, comments, skip_errors=False):
+        """
+        Yields (comment, sentiment) for each comment of an iterable, in order.
+        Comments are texts or dicts with the text under "comment". At most
+        `pool_size` comments are held at a time. With `skip_errors`, a pool the
+        model fails on is reported and yielded with None sentiments instead of
+        raising.
+        """
+        pool = []
+        for comment in comments:
+            pool.append(comment)
+            if len(pool) >= self.pool_size:
+                yield from self._score_pool(pool, skip_errors)
+                pool = []
+        if pool:
+            yield from self._score_pool(pool, skip_errors)
+
+    def _score_pool(self, pool, skip_errors):
+        texts = [c if isinstance(c, str) else c["comment"] for c in pool]
         try:
-            # Load video data
-            with open(filepath, "r", encoding="utf-8") as f:
-                video_data = json.load(f)
-
-            comments = video_data.get("comments", [])
-            if not comments:
-                continue
-
-            # Extract comment texts
-            comment_texts = [c["comment"] for c in comments]
-            total_comments = len(comment_texts)
-
-            # Process in batches
-            for i in range(0, total_comments, batch_size):
-                batch_texts = comment_texts[i : i + batch_size]
-
-                # Tokenize and move to device
-                inputs = tokenizer(
-                    batch_texts,
-                    return_tensors="pt",
-                    padding=True,
-                    truncation=True,
-                    max_length=512,
-                ).to(device)
-
-                # Predict sentiment probabilities
-                with torch.no_grad():
-                    outputs = model(**inputs)
-
-                # Calculate probabilities
-                probs = (
-                    torch.nn.functional.softmax(outputs.logits, dim=-1).cpu().numpy()
-                )
+            sentiments = self.predict(texts)
+        except Exception as e:
+            if not skip_errors:
+                raise
+            print(f"Error scoring {len(pool)} comments: {str(e)}")
+            sentiments = [None] * len(pool)
+        return zip(pool, sentiments)
+
+    def fingerprint(self, text):
+        """What a score of `text` by this scorer is recorded against in the sidecars."""
+        return comment_fingerprint(text, self.model_fp)
+
+    def close(self):
+        if hasattr(self.predict, "close"):
+            self.predict.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def analyze_channel_sentiment(
+    channel_id,
+    data_root="data",
+    batch_size=64,
+    force=False,
+    token_budget=TOKEN_BUDGET,
+    service_url=None,
+    backend="torch",
+    workers=1,
+    threads=None,
+    cache_dir=DEFAULT_CACHE_DIR,
+    cascade=False,
+    cascade_threshold=None,
+):
+    """
+    Scores every comment whose text (or the model) changed since the last run;
+    `force=True` rescores all of them. With `service_url` the comments are sent
+    to a running sentiment service instead of loading the model here.
+    `backend="onnx"` scores with the exported INT8 model on ONNX Runtime, and
+    `workers > 1` shards the comments across that many model processes
+    (`threads` intra-op threads each, by default the cores split evenly).
+    Comment texts scored before by the same model are taken from the cache in
+    `cache_dir` (None turns it off). `cascade=True` lets a linear model score
+    the short comments it is sure about (see sentiment_cascade.py).
+    """
+    analyze_channels_sentiment(
+        [channel_id],
+        data_root,
+        batch_size,
+        force,
+        token_budget,
+        service_url,
+        backend,
+        workers,
+        threads,
+        cache_dir,
+        cascade,
+        cascade_threshold,
+    )
+
+
+def analyze_channels_sentiment(
+    channel_ids,
+    data_root="data",
+    batch_size=64,
+    force=False,
+    token_budget=TOKEN_BUDGET,
+    service_url=None,
+    backend="torch",
+    workers=1,
+    threads=None,
+    cache_dir=DEFAULT_CACHE_DIR,
+    cascade=False,
+    cascade_threshold=None,
+):
+    """
+    `analyze_channel_sentiment` for several channels with one model load; comments
+    of all their videos are pooled into the same length-bucketed batches.
+    """
+    channel_dirs = []
+    for channel_id in channel_ids:
+        # Prepare channel directory path
+        channel_dir = os.path.join(data_root, channel_id)
+        if not os.path.exists(channel_dir):
+            print(f"Channel directory not found: {channel_dir}")
+            continue
+        channel_dirs.append(channel_dir)
+    if not channel_dirs:
+        return
+
+    with SentimentScorer(
+        batch_size,
+        token_budget,
+        service_url,
+        backend,
+        workers,
+        threads,
+        cache_dir,
+        cascade,
+        cascade_threshold,
+    ) as scorer:
+        counts = {"total": 0, "skipped": 0}
+        _commit_scores(
+            scorer.iter_scores(
+                _comments_to_score(channel_dirs, scorer, force, counts),
+                skip_errors=True,
+            ),
+            scorer.pool_size,
+        )
+    _report_skipped(counts["skipped"], counts["total"])
+
+
+def _comments_to_score(channel_dirs, scorer, force, counts):
+    """
+    Yields the comments whose text or model changed since the last run, with
+    where they belong. Columnar-store channels are scored on the side.
+    """
+    for channel_dir in channel_dirs:
+        # Columnar store: read only the texts, write only the sentiment columns
+        if has_store(channel_dir):
+            n_total, n_skipped = _analyze_store(channel_dir, scorer, force)
+            counts["total"] += n_total
+            counts["skipped"] += n_skipped
+            continue
 
-                # Update comments with sentiment probabilities
-                for j, prob in enumerate(probs):
-                    idx = i + j
-                    sentiment_dict = {
-                        label_mapping[k]: round(float(v), 2) for k, v in enumerate(prob)
+        # Stream each video file, so memory does not grow with the number of
+        # comments of a video
+        for video_id in tqdm(list_video_ids(channel_dir)):
+            try:
+                _, comments = iter_video_file(channel_dir, video_id)
+                if comments is None:
+                    continue
+                recorded = (
+                    {} if force else read_inputs(channel_dir, "sentiment", video_id)[1]
+                )
+                for c in comments:
+                    counts["total"] += 1
+                    fingerprint = scorer.fingerprint(c["comment"])
+                    if recorded.get(c["comment_id"]) == fingerprint:
+                        counts["skipped"] += 1
+                        continue
+                    yield {
+                        "channel_dir": channel_dir,
+                        "video_id": video_id,
+                        "comment_id": c["comment_id"],
+                        "comment": c["comment"],
+                        "fingerprint": fingerprint,
                     }
-                    comments[idx]["sentiment"] = sentiment_dict
 
-            # Save updated data
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(video_data, f, indent=2, ensure_ascii=False)
+            except Exception as e:
+                print(f"Error processing {video_id}: {str(e)}")
 
-        except Exception as e:
-            print(f"Error processing {filename}: {str(e)}")
+
+def _commit_scores(scored, chunk_size):
+    """
+    Appends (comment, sentiment) pairs to their videos' sentiment sidecars, one
+    commit per video every `chunk_size` comments. Comments without a sentiment
+    are left out, so they are scored again on the next run.
+    """
+    by_video = {}
+    n = 0
+    for comment, sentiment in scored:
+        if sentiment is not None:
+            comments, inputs = by_video.setdefault(
+                (comment["channel_dir"], comment["video_id"]), ({}, {})
+            )
+            comments[comment["comment_id"]] = {"sentiment": sentiment}
+            inputs[comment["comment_id"]] = comment["fingerprint"]
+        n += 1
+        if n >= chunk_size:
+            _commit_videos(by_video)
+            by_video, n = {}, 0
+    _commit_videos(by_video)
+
+
+def _commit_videos(by_video):
+    # Append to the sentiment sidecars; the fetched video files stay untouched
+    for (channel_dir, video_id), (comments, inputs) in by_video.items():
+        commit(
+            channel_dir,
+            "sentiment",
+            video_id,
+            comments=comments,
+            inputs={"comments": inputs},
+        )
+
+
+def _analyze_store(channel_dir, scorer, force):
+    """Scores the dirty rows of a columnar-store channel. Returns (total, skipped)."""
+    columns = {f"sentiment_{label.lower()}": None for label in LABEL_MAPPING.values()}
+    table = read_comments(channel_dir, ["comment_id", "video_id", "text", *columns])
+    columns = {name: table.column(name).to_pylist() for name in columns}
+    comment_ids = table.column("comment_id").to_pylist()
+    texts = table.column("text").to_pylist()
+
+    rows_by_video = {}
+    for i, video_id in enumerate(table.column("video_id").to_pylist()):
+        rows_by_video.setdefault(video_id, []).append(i)
+
+    # Rows to score, and the fingerprints to record per video
+    todo, video_inputs = [], {}
+    for video_id, rows in rows_by_video.items():
+        fingerprints = {comment_ids[i]: scorer.fingerprint(texts[i]) for i in rows}
+        dirty = (
+            set(fingerprints)
+            if force
+            else dirty_comments(channel_dir, "sentiment", video_id, fingerprints)
+        )
+        # Rows re-imported by `migrate` come back without scores
+        dirty |= {
+            comment_ids[i] for i in rows if columns["sentiment_negative"][i] is None
+        }
+        todo.extend(i for i in rows if comment_ids[i] in dirty)
+        if dirty:
+            video_inputs[video_id] = {cid: fingerprints[cid] for cid in dirty}
+
+    for start in tqdm(range(0, len(todo), POOL_SIZE)):
+        rows = todo[start : start + POOL_SIZE]
+        batch = scorer.score([texts[i] for i in rows])
+        for i, sentiment in zip(rows, batch):
+            for label, score in sentiment.items():
+                columns[f"sentiment_{label.lower()}"][i] = score
+    if todo:
+        write_columns(channel_dir, "sentiment", columns)
+        # Scores live in the store, the sidecar only records what they were computed from
+        for video_id, fingerprints in video_inputs.items():
+            commit(
+                channel_dir, "sentiment", video_id, inputs={"comments": fingerprints}
+            )
+    return len(texts), len(texts) - len(todo)
+
+
+def _report_skipped(skipped, total):
+    if skipped:
+        print(
+            f"Skipped {skipped} of {total} comments already scored with the same text and model (use --force to rescore)"
+        )
 
 
 if __name__ == "__main__":
@@ -89,7 +527,9 @@ if __name__ == "__main__":
         description="Analyze sentiment of YouTube comments"
     )
 
-    parser.add_argument("channel_id", help="The YouTube channel ID to analyze")
+    parser.add_argument(
+        "channel_ids", nargs="+", help="The YouTube channel ID(s) to analyze"
+    )
     parser.add_argument(
         "--data-root",
         default="data",
@@ -99,11 +539,78 @@ if __name__ == "__main__":
         "--batch-size",
         type=int,
         default=64,
-        help="Batch size for processing comments (default: 64)",
+        help="Maximum comments per batch (default: 64)",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=TOKEN_BUDGET,
+        help=f"Padded tokens per batch (default: {TOKEN_BUDGET}); 0 batches in file order",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rescore comments already scored with the same text and model",
+    )
+    parser.add_argument(
+        "--service",
+        default=None,
+        help="URL of a running sentiment service to score with, e.g. http://127.0.0.1:8765/",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="torch",
+        help="Inference backend (default: torch); onnx needs an exported model, see sentiment_onnx.py",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Model processes to shard comments across (default: 1)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Intra-op threads per model process (default: cores / workers)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Cache of scores by comment text (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Score every comment with the model, without the cache",
+    )
+    parser.add_argument(
+        "--cascade",
+        action="store_true",
+        help="Let the linear model of sentiment_cascade.py score short comments it is sure about",
+    )
+    parser.add_argument(
+        "--cascade-threshold",
+        type=float,
+        default=None,
+        help="Confidence the linear model needs to skip the transformer (default: 0.9)",
     )
 
     args = parser.parse_args()
 
-    analyze_channel_sentiment(
-        channel_id=args.channel_id, data_root=args.data_root, batch_size=args.batch_size
+    analyze_channels_sentiment(
+        channel_ids=args.channel_ids,
+        data_root=args.data_root,
+        batch_size=args.batch_size,
+        force=args.force,
+        token_budget=args.token_budget or None,
+        service_url=args.service,
+        backend=args.backend,
+        workers=args.workers,
+        threads=args.threads,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cascade=args.cascade,
+        cascade_threshold=args.cascade_threshold,
     )
@@ -0,0 +1,213 @@
+"""
+Persistent cache of sentiment scores, keyed by normalized comment text and model.
+
+Comment sections repeat themselves ("first", emoji strings, copypasta, spam),
+so scores are looked up by text before anything reaches the model. Texts are
+normalized the way the tokenizer normalizes them anyway (Unicode NFKC,
+whitespace collapsed and stripped), so a cached score is the score the model
+would give.
+
+Entries live in a SQLite file under `cache_dir`, with an in-memory LRU in
+front. Once the file holds more than `max_entries` scores, the least recently
+used are dropped (down to 90%).
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "YOUTUBE_SENTIMENT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "youtube_analytics", "sentiment"),
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class SentimentCache:
+    def __init__(
+        self,
+        model_fp: Dict,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_entries: int = 5_000_000,
+        memory_entries: int = 100_000,
+    ):
+        self.model_key = json.dumps(model_fp, sort_keys=True)
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db = sqlite3.connect(
+            os.path.join(cache_dir, "scores.sqlite"), check_same_thread=False
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, sentiment TEXT, used_at REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS scores_used ON scores (used_at)")
+        # Seconds of model time per text, kept across runs to estimate what hits saved
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS cost (model TEXT PRIMARY KEY, seconds_per_text REAL)"
+        )
+        self.db.commit()
+        self._size = self.db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        row = self.db.execute(
+            "SELECT seconds_per_text FROM cost WHERE model = ?", (self.model_key,)
+        ).fetchone()
+        self.seconds_per_text = row[0] if row else None
+
+    def key(self, text: str) -> str:
+        return hashlib.blake2b(
+            f"{self.model_key}\0{normalize_text(text)}".encode("utf-8"), digest_size=16
+        ).hexdigest()
+
+    def _remember(self, key: str, sentiment: Dict) -> None:
+        self.memory[key] = sentiment
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict]:
+        """Cached sentiments of the `keys` found, in memory first, then on disk."""
+        found: Dict[str, Dict] = {}
+        with self._lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+            missing = [key for key in keys if key not in found]
+            # SQLite allows at most 999 parameters per statement in older builds
+            for start in range(0, len(missing), 900):
+                chunk = missing[start : start + 900]
+                rows = self.db.execute(
+                    f"SELECT key, sentiment FROM scores WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, sentiment in rows:
+                    found[key] = json.loads(sentiment)
+                    self._remember(key, found[key])
+            if found:
+                now = time.time()
+                self.db.executemany(
+                    "UPDATE scores SET used_at = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self.db.commit()
+        return found
+
+    def put_many(self, entries: Dict[str, Dict]) -> None:
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            for key, sentiment in entries.items():
+                self._remember(key, sentiment)
+            cursor = self.db.executemany(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?)",
+                [(key, json.dumps(s), now) for key, s in entries.items()],
+            )
+            self._size += max(cursor.rowcount, 0)
+            if self._size > self.max_entries:
+                self._evict()
+            self.db.commit()
+
+    def _evict(self) -> None:
+        # Drop the least recently used entries until the cache is at 90% of its budget
+        self._size = self.db.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        excess = self._size - int(self.max_entries * 0.9)
+        if excess > 0:
+            self.db.execute(
+                "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY used_at LIMIT ?)",
+                (excess,),
+            )
+            self._size -= excess
+            self.memory.clear()
+
+    def record_cost(self, seconds: float, n_texts: int) -> None:
+        if not n_texts:
+            return
+        self.seconds_per_text = seconds / n_texts
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO cost VALUES (?, ?)",
+                (self.model_key, self.seconds_per_text),
+            )
+            self.db.commit()
+
+    def report(self) -> None:
+        total = self.hits + self.misses
+        if not total:
+            return
+        line = f"Sentiment cache: {self.hits} hits, {self.misses} misses ({self.hits / total:.0%} hit rate)"
+        if self.seconds_per_text is not None:
+            line += f", saved ~{self.hits * self.seconds_per_text:.1f}s of inference"
+        print(line)
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class CachedPredictor:
+    """
+    Wraps `predict` (texts -> sentiments): texts scored before (by normalized
+    text and model) come from `cache`, repeats within a call are scored once,
+    and only the rest reach `predict`.
+    """
+
+    def __init__(
+        self, predict: Callable[[List[str]], List[Dict]], cache: SentimentCache
+    ):
+        self.predict = predict
+        self.cache = cache
+
+    def __call__(self, texts: List[str]) -> List[Dict]:
+        keys = [self.cache.key(text) for text in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+
+        # One model input per distinct missing key
+        todo: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in todo:
+                todo[key] = text
+        if todo:
+            start = time.perf_counter()
+            sentiments = self.predict(list(todo.values()))
+            self.cache.record_cost(time.perf_counter() - start, len(todo))
+            scored = dict(zip(todo, sentiments))
+            self.cache.put_many(scored)
+            found.update(scored)
+
+        self.cache.misses += len(todo)
+        self.cache.hits += len(texts) - len(todo)
+        return [found[key] for key in keys]
+
+    def close(self) -> None:
+        self.cache.report()
+        self.cache.close()
+        if hasattr(self.predict, "close"):
+            self.predict.close()
+
+
+def cached(
+    predict: Callable[[List[str]], List[Dict]],
+    model_fp: Dict,
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+):
+    """`predict` behind a `SentimentCache` in `cache_dir`; None turns the cache off."""
+    if cache_dir is None:
+        return predict
+    return CachedPredictor(predict, SentimentCache(model_fp, cache_dir))
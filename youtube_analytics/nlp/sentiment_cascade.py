@@ -0,0 +1,360 @@
+"""
+Cheap-first cascade for sentiment scoring.
+
+A large share of comments are emoji-only, one word, a bare URL or otherwise very
+short, and running XLM-RoBERTa on them is most of the CPU bill. The cascade puts
+a small linear model in front of the transformer. It works on hashed words,
+word pairs, emoji/punctuation characters, URLs and length, and is trained on
+the transformer's own scores. A comment of at most `max_words` words is scored
+by the linear model when its top probability reaches `threshold`. Everything
+else goes on to the transformer.
+
+Train it on a sample of your comments (the transformer scores the sample, so
+this needs the model, or a cache of its scores); the held-out part of the sample
+is used to report escalation rate and agreement per threshold:
+
+    python -m youtube_analytics.nlp.sentiment_cascade train --data-root data --sample 20000
+
+then score with `cascade=True` (`--cascade --cascade-threshold 0.9`).
+"""
+
+import json
+import math
+import os
+import random
+import re
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence
+
+from youtube_analytics.nlp.sentiment import LABEL_MAPPING
+from youtube_analytics.nlp.sentiment_cache import normalize_text
+
+CASCADE_PATH = os.environ.get(
+    "YOUTUBE_SENTIMENT_CASCADE", os.path.join("models", "sentiment_cascade.json")
+)
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_MAX_WORDS = 6
+# Comments handled by the linear model that are also sent to the transformer,
+# to report agreement at run time
+DEFAULT_AUDIT_RATE = 0.02
+
+LABELS = [LABEL_MAPPING[i] for i in sorted(LABEL_MAPPING)]
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_WORD = re.compile(r"\w+")
+
+
+def _tokens(text: str):
+    """(words, features) of a comment."""
+    text = normalize_text(text).lower()
+    n_urls = len(_URL.findall(text))
+    text = _URL.sub(" ", text)
+    words = _WORD.findall(text)
+    features = [f"w:{w}" for w in words]
+    features += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    # Emoji and punctuation carry most of the signal of very short comments
+    features += [f"c:{ch}" for ch in text if not ch.isalnum() and not ch.isspace()]
+    features += ["url"] * n_urls
+    features.append(f"len:{min(len(words), 10)}")
+    return words, features
+
+
+def _softmax(logits: List[float]) -> List[float]:
+    top = max(logits)
+    exp = [math.exp(v - top) for v in logits]
+    total = sum(exp)
+    return [v / total for v in exp]
+
+
+class CheapSentimentModel:
+    """Softmax regression over hashed comment features, distilled from the transformer."""
+
+    def __init__(self, buckets: int = 1 << 18, teacher: Optional[Dict] = None):
+        self.buckets = buckets
+        self.teacher = teacher
+        self.weights: Dict[int, List[float]] = {}
+        self.bias = [0.0] * len(LABELS)
+
+    def _indices(self, features: List[str]) -> List[int]:
+        return [zlib.crc32(f.encode("utf-8")) % self.buckets for f in features]
+
+    def _probs(self, indices: List[int]) -> List[float]:
+        logits = list(self.bias)
+        for i in indices:
+            w = self.weights.get(i)
+            if w is not None:
+                for k in range(len(logits)):
+                    logits[k] += w[k]
+        return _softmax(logits)
+
+    def predict(self, text: str):
+        """(number of words, {label: probability})"""
+        words, features = _tokens(text)
+        probs = self._probs(self._indices(features))
+        return len(words), {label: p for label, p in zip(LABELS, probs)}
+
+    def train(
+        self,
+        texts: Sequence[str],
+        targets: Sequence[Dict],
+        epochs: int = 5,
+        lr: float = 0.1,
+        l2: float = 1e-6,
+        seed: int = 0,
+    ) -> None:
+        """SGD on the cross-entropy with the transformer's probabilities as soft targets."""
+        examples = [
+            (self._indices(_tokens(text)[1]), [target[label] for label in LABELS])
+            for text, target in zip(texts, targets)
+        ]
+        rng = random.Random(seed)
+        for _ in range(epochs):
+            rng.shuffle(examples)
+            for indices, target in examples:
+                probs = self._probs(indices)
+                grad = [p - t for p, t in zip(probs, target)]
+                for k in range(len(grad)):
+                    self.bias[k] -= lr * grad[k]
+                for i in indices:
+                    w = self.weights.setdefault(i, [0.0] * len(LABELS))
+                    for k in range(len(grad)):
+                        w[k] -= lr * (grad[k] + l2 * w[k])
+
+    def fingerprint(self) -> str:
+        return "%08x" % zlib.crc32(
+            json.dumps([self.bias, sorted(self.weights.items())]).encode("utf-8")
+        )
+
+    def save(self, path: str = CASCADE_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "buckets": self.buckets,
+                    "teacher": self.teacher,
+                    "bias": self.bias,
+                    "weights": {
+                        str(i): [round(v, 6) for v in w]
+                        for i, w in self.weights.items()
+                    },
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, path: str = CASCADE_PATH) -> "CheapSentimentModel":
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"No cascade model at {path}; run python -m youtube_analytics.nlp.sentiment_cascade train"
+            )
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        model = cls(data["buckets"], data.get("teacher"))
+        model.bias = data["bias"]
+        model.weights = {int(i): w for i, w in data["weights"].items()}
+        return model
+
+
+def cheap_score(
+    cheap: CheapSentimentModel, text: str, threshold: float, max_words: int
+):
+    """The linear model's sentiment for `text` when it may handle it, else None."""
+    n_words, probs = cheap.predict(text)
+    if n_words > max_words or max(probs.values()) < threshold:
+        return None
+    return {label: round(p, 2) for label, p in probs.items()}
+
+
+def _same_label(a: Dict, b: Dict) -> bool:
+    return max(a, key=a.get) == max(b, key=b.get)
+
+
+class CascadePredictor:
+    """
+    Wraps `predict` (texts -> transformer sentiments) behind the linear model:
+    only comments it is not confident about reach `predict`. A random
+    `audit_rate` of the comments it handles are also scored by `predict` to
+    measure agreement; their results are still the linear model's.
+    """
+
+    def __init__(
+        self,
+        predict: Callable[[List[str]], List[Dict]],
+        cheap: CheapSentimentModel,
+        threshold: float = DEFAULT_THRESHOLD,
+        max_words: int = DEFAULT_MAX_WORDS,
+        audit_rate: float = DEFAULT_AUDIT_RATE,
+        seed: int = 0,
+    ):
+        self.predict = predict
+        self.cheap = cheap
+        self.threshold = threshold
+        self.max_words = max_words
+        self.audit_rate = audit_rate
+        self.rng = random.Random(seed)
+        self.handled = self.escalated = self.audited = self.agreed = 0
+
+    def __call__(self, texts: List[str]) -> List[Dict]:
+        results = [
+            cheap_score(self.cheap, t, self.threshold, self.max_words) for t in texts
+        ]
+        escalate = [i for i, r in enumerate(results) if r is None]
+        audit = [
+            i
+            for i, r in enumerate(results)
+            if r is not None and self.rng.random() < self.audit_rate
+        ]
+
+        scored = (
+            self.predict([texts[i] for i in escalate + audit])
+            if escalate or audit
+            else []
+        )
+        for i, sentiment in zip(escalate, scored):
+            results[i] = sentiment
+        for i, sentiment in zip(audit, scored[len(escalate) :]):
+            self.agreed += _same_label(results[i], sentiment)
+        self.audited += len(audit)
+        self.escalated += len(escalate)
+        self.handled += len(texts) - len(escalate)
+        return results
+
+    def report(self) -> None:
+        total = self.handled + self.escalated
+        if not total:
+            return
+        line = f"Sentiment cascade: {self.escalated} of {total} comments escalated to the transformer ({self.escalated / total:.0%})"
+        if self.audited:
+            line += f", linear model agreed with it on {self.agreed / self.audited:.0%} of {self.audited} audited"
+        print(line)
+
+    def close(self) -> None:
+        self.report()
+        if hasattr(self.predict, "close"):
+            self.predict.close()
+
+
+def cascade_fingerprint(
+    cheap: CheapSentimentModel, threshold: float, max_words: int
+) -> Dict:
+    return {
+        "weights": cheap.fingerprint(),
+        "threshold": threshold,
+        "max_words": max_words,
+    }
+
+
+def evaluate(
+    cheap: CheapSentimentModel,
+    texts: Sequence[str],
+    teacher: Sequence[Dict],
+    thresholds: Sequence[float],
+    max_words: int = DEFAULT_MAX_WORDS,
+) -> List[Dict]:
+    """
+    Per threshold: the share of comments escalated, and how often the cascade's
+    top label agrees with the transformer-only one, overall and on the comments
+    the linear model handled.
+    """
+    rows = []
+    for threshold in thresholds:
+        handled = agreed = 0
+        for text, reference in zip(texts, teacher):
+            result = cheap_score(cheap, text, threshold, max_words)
+            if result is not None:
+                handled += 1
+                agreed += _same_label(result, reference)
+        n = max(len(texts), 1)
+        rows.append(
+            {
+                "threshold": threshold,
+                "escalation_rate": 1 - handled / n,
+                # escalated comments get the transformer's own label
+                "agreement": (agreed + len(texts) - handled) / n,
+                "handled_agreement": agreed / handled if handled else None,
+            }
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from youtube_analytics.nlp.sentiment import BACKENDS, SentimentScorer
+    from youtube_analytics.nlp.sentiment_cache import DEFAULT_CACHE_DIR
+    from youtube_analytics.nlp.sentiment_onnx import sample_comments
+
+    parser = argparse.ArgumentParser(
+        description="Train and evaluate the cheap-first sentiment cascade"
+    )
+    parser.add_argument("command", choices=["train", "evaluate"])
+    parser.add_argument(
+        "--path",
+        default=CASCADE_PATH,
+        help=f"Cascade model file (default: {CASCADE_PATH})",
+    )
+    parser.add_argument(
+        "--data-root",
+        default="data",
+        help="Where to sample comments from (default: data)",
+    )
+    parser.add_argument(
+        "--sample", type=int, default=20000, help="Comments to sample (default: 20000)"
+    )
+    parser.add_argument(
+        "--holdout",
+        type=float,
+        default=0.2,
+        help="Share held out for evaluation (default: 0.2)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--max-words", type=int, default=DEFAULT_MAX_WORDS)
+    parser.add_argument(
+        "--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.9, 0.95, 0.99]
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="torch",
+        help="Transformer backend for the targets",
+    )
+    parser.add_argument(
+        "--service",
+        default=None,
+        help="URL of a running sentiment service to score with",
+    )
+    args = parser.parse_args()
+
+    texts = sample_comments(args.data_root, args.sample, args.seed)
+    with SentimentScorer(
+        service_url=args.service, backend=args.backend, cache_dir=DEFAULT_CACHE_DIR
+    ) as scorer:
+        teacher = scorer.score(texts)
+        model_fp = scorer.model_fp
+    split = int(len(texts) * (1 - args.holdout))
+
+    if args.command == "train":
+        cheap = CheapSentimentModel(teacher=model_fp)
+        cheap.train(texts[:split], teacher[:split], epochs=args.epochs, seed=args.seed)
+        cheap.save(args.path)
+        print(f"Trained on {split} comments, saved to {args.path}")
+    else:
+        cheap = CheapSentimentModel.load(args.path)
+        if cheap.teacher != model_fp:
+            print(
+                f"Warning: cascade was trained on {cheap.teacher}, evaluating against {model_fp}"
+            )
+
+    print(f"Held-out comments: {len(texts) - split}")
+    print(f"{'threshold':>9} {'escalated':>10} {'agreement':>10} {'on handled':>11}")
+    for row in evaluate(
+        cheap, texts[split:], teacher[split:], args.thresholds, args.max_words
+    ):
+        handled = (
+            "-"
+            if row["handled_agreement"] is None
+            else f"{row['handled_agreement']:.1%}"
+        )
+        print(
+            f"{row['threshold']:>9.2f} {row['escalation_rate']:>10.1%} {row['agreement']:>10.1%} {handled:>11}"
+        )
@@ -0,0 +1,287 @@
+"""
+ONNX Runtime backend for the sentiment model, for CPU-only workers.
+
+Export the model once (needs torch; dynamic INT8 quantization of the linear
+layers by default):
+
+    python -m youtube_analytics.nlp.sentiment_onnx export --output-dir models/sentiment_onnx
+
+then score with `backend="onnx"` (`--backend onnx` on the command line). Scoring
+only needs onnxruntime, numpy and the tokenizer. Check that the quantized model
+agrees with the PyTorch one on a sample of comments before relying on it:
+
+    python -m youtube_analytics.nlp.sentiment_onnx parity --data-root data --sample 2000
+"""
+
+import json
+import os
+import random
+from typing import Dict, Iterable, Iterator, List, Optional
+
+try:
+    import numpy as np
+    import onnxruntime
+except ImportError:  # optional, only needed for the ONNX backend
+    onnxruntime = None
+
+from youtube_analytics.nlp.sentiment import (
+    LABEL_MAPPING,
+    MODEL_NAME,
+    load_sentiment_model,
+    model_fingerprint,
+    predict_sentiment,
+)
+
+ONNX_DIR = os.environ.get(
+    "YOUTUBE_SENTIMENT_ONNX_DIR", os.path.join("models", "sentiment_onnx")
+)
+FLOAT_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+FINGERPRINT_FILE = "fingerprint.json"
+
+
+def export_onnx(
+    output_dir: str = ONNX_DIR, quantize: bool = True, opset: int = 17
+) -> str:
+    """
+    Exports the sentiment model to `output_dir` (float model, tokenizer and the
+    fingerprint of the weights it came from) and, with `quantize`, a dynamically
+    INT8-quantized copy. Returns the path of the model to score with.
+    """
+    if onnxruntime is None:
+        raise ImportError("The ONNX backend needs onnxruntime: pip install onnxruntime")
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer, model, _ = load_sentiment_model()
+    model = model.to("cpu")
+    sample = tokenizer(
+        ["An example comment", "Another one"], return_tensors="pt", padding=True
+    )
+
+    float_path = os.path.join(output_dir, FLOAT_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            float_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=opset,
+        )
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, FINGERPRINT_FILE), "w", encoding="utf-8") as f:
+        json.dump(model_fingerprint(model), f, indent=4)
+
+    if not quantize:
+        return float_path
+    int8_path = os.path.join(output_dir, INT8_FILE)
+    # Weights of the linear layers to INT8, activations quantized on the fly
+    quantize_dynamic(float_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+class OnnxSentimentModel:
+    """
+    An exported sentiment model run by ONNX Runtime on the CPU. `predict_sentiment`
+    accepts it in place of the PyTorch model.
+    """
+
+    backend = "onnx"
+
+    def __init__(
+        self,
+        model_dir: str = ONNX_DIR,
+        quantized: bool = True,
+        threads: Optional[int] = None,
+    ):
+        if onnxruntime is None:
+            raise ImportError(
+                "The ONNX backend needs onnxruntime: pip install onnxruntime"
+            )
+        path = os.path.join(model_dir, INT8_FILE if quantized else FLOAT_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"No exported model at {path}; run python -m youtube_analytics.nlp.sentiment_onnx export"
+            )
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        with open(os.path.join(model_dir, FINGERPRINT_FILE), encoding="utf-8") as f:
+            exported = json.load(f)
+        # Quantized scores differ slightly from the PyTorch ones, so they get their own fingerprint
+        self.fingerprint = {**exported, "backend": "onnx-int8" if quantized else "onnx"}
+
+    def probs(self, inputs) -> "np.ndarray":
+        """Class probabilities for a padded batch from the tokenizer (return_tensors="np")."""
+        feed = {
+            name: np.asarray(inputs[name], dtype=np.int64) for name in self.input_names
+        }
+        logits = self.session.run(None, feed)[0]
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+
+def load_onnx_model(
+    model_dir: str = ONNX_DIR, quantized: bool = True, threads: Optional[int] = None
+):
+    """Returns (tokenizer, model, device) like `load_sentiment_model`, for the exported model."""
+    from transformers import AutoTokenizer
+
+    return (
+        AutoTokenizer.from_pretrained(model_dir),
+        OnnxSentimentModel(model_dir, quantized, threads),
+        "cpu",
+    )
+
+
+def _reservoir_sample(items: Iterable[str], n: int, rng: random.Random) -> List[str]:
+    """A uniform sample of `n` items from a stream of unknown length, holding only `n`."""
+    sample: List[str] = []
+    for i, item in enumerate(items):
+        if i < n:
+            sample.append(item)
+        else:
+            j = rng.randrange(i + 1)
+            if j < n:
+                sample[j] = item
+    return sample
+
+
+def _iter_comment_texts(data_root: str) -> Iterator[str]:
+    from youtube_analytics.data.video_io import iter_video_file, list_video_ids
+
+    if not os.path.isdir(data_root):
+        return
+    for channel_id in sorted(os.listdir(data_root)):
+        channel_dir = os.path.join(data_root, channel_id)
+        if not os.path.isdir(channel_dir):
+            continue
+        for video_id in list_video_ids(channel_dir):
+            _, comments = iter_video_file(channel_dir, video_id)
+            for comment in comments or ():
+                yield comment["comment"]
+
+
+def sample_comments(data_root: str = "data", n: int = 2000, seed: int = 0) -> List[str]:
+    """
+    A seeded random sample of `n` comment texts from the channels under
+    `data_root` (synthetic comments when there are none), for parity checks.
+    The files are streamed, so only the sample is held in memory.
+    """
+    texts = _reservoir_sample(_iter_comment_texts(data_root), n, random.Random(seed))
+    if not texts:
+        from youtube_analytics.data.synthetic import SyntheticDataset
+
+        dataset = SyntheticDataset.generate(
+            2, seed=seed, num_videos=20, max_comments=200
+        )
+        synthetic = (
+            c["comment"]
+            for ch in dataset.channels
+            for i in range(ch.num_videos)
+            for c in ch.iter_comments(i)
+        )
+        texts = _reservoir_sample(synthetic, n, random.Random(seed))
+    return texts
+
+
+def parity(
+    texts: List[str],
+    model_dir: str = ONNX_DIR,
+    quantized: bool = True,
+    batch_size: int = 64,
+) -> Dict:
+    """
+    Compares the ONNX model's scores with the PyTorch model's on `texts`: the
+    largest and mean absolute probability difference, and the share of texts
+    given the same top label.
+    """
+    tokenizer, model, device = load_sentiment_model()
+    reference = predict_sentiment(texts, tokenizer, model, device, batch_size)
+    onnx_tokenizer, onnx_model, _ = load_onnx_model(model_dir, quantized)
+    scores = predict_sentiment(texts, onnx_tokenizer, onnx_model, "cpu", batch_size)
+
+    labels = list(LABEL_MAPPING.values())
+    diffs = [
+        abs(a[label] - b[label]) for a, b in zip(reference, scores) for label in labels
+    ]
+    same_label = sum(
+        max(a, key=a.get) == max(b, key=b.get) for a, b in zip(reference, scores)
+    )
+    return {
+        "texts": len(texts),
+        "max_abs_diff": max(diffs, default=0.0),
+        "mean_abs_diff": sum(diffs) / max(len(diffs), 1),
+        "label_agreement": same_label / max(len(texts), 1),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description=f"Export {MODEL_NAME} to ONNX and check it against PyTorch"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser(
+        "export", help="Export (and quantize) the sentiment model"
+    )
+    export_parser.add_argument(
+        "--output-dir",
+        default=ONNX_DIR,
+        help=f"Where to write the model (default: {ONNX_DIR})",
+    )
+    export_parser.add_argument(
+        "--no-quantize", action="store_true", help="Only export the float model"
+    )
+    export_parser.add_argument("--opset", type=int, default=17)
+
+    parity_parser = subparsers.add_parser(
+        "parity", help="Compare ONNX and PyTorch scores on sampled comments"
+    )
+    parity_parser.add_argument(
+        "--model-dir", default=ONNX_DIR, help=f"Exported model (default: {ONNX_DIR})"
+    )
+    parity_parser.add_argument(
+        "--float", action="store_true", help="Check the float model instead of INT8"
+    )
+    parity_parser.add_argument(
+        "--data-root",
+        default="data",
+        help="Where to sample comments from (default: data)",
+    )
+    parity_parser.add_argument(
+        "--sample", type=int, default=2000, help="Number of comments (default: 2000)"
+    )
+    parity_parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+
+    if args.command == "export":
+        path = export_onnx(
+            args.output_dir, quantize=not args.no_quantize, opset=args.opset
+        )
+        print(f"Exported {MODEL_NAME} to {path}")
+    else:
+        result = parity(
+            sample_comments(args.data_root, args.sample, args.seed),
+            args.model_dir,
+            not args.float,
+        )
+        print(
+            f"{result['texts']} comments: top label agrees on {result['label_agreement']:.2%}, "
+            f"probabilities differ by {result['mean_abs_diff']:.4f} on average (max {result['max_abs_diff']:.2f})"
+        )
@@ -0,0 +1,272 @@
+"""
+Long-lived local sentiment inference service.
+
+Loads the sentiment model once and scores texts for any number of clients over
+localhost HTTP, so short runs (one channel at a time from a scheduler) do not
+pay for loading XLM-RoBERTa every time:
+
+    python -m youtube_analytics.nlp.sentiment_service --port 8765
+    python -m youtube_analytics.nlp.sentiment <channel_id> --service http://127.0.0.1:8765/
+
+Concurrent requests are coalesced (dynamic batching): once a request is
+pending, the batcher waits up to `max_wait` seconds for more, or until
+`max_texts` texts are pending, and scores them all in one length-bucketed
+`predict_sentiment` call.
+
+    POST /score  {"texts": [...]}  ->  {"sentiments": [{"Negative": p, ...}, ...]}
+    GET  /model                    ->  {"model": ..., "revision": ...}
+    GET  /stats                    ->  requests, batches and texts scored so far
+"""
+
+import json
+import queue
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+from youtube_analytics.nlp.sentiment import (
+    BACKENDS,
+    POOL_SIZE,
+    TOKEN_BUDGET,
+    load_sentiment_model,
+    model_fingerprint,
+    predict_sentiment,
+)
+
+# Texts per request sent by SentimentClient
+REQUEST_SIZE = 1024
+
+
+class DynamicBatcher:
+    """
+    Scores texts submitted from many threads in shared batches. `submit` blocks
+    until the batch holding its texts has been scored.
+    """
+
+    def __init__(
+        self,
+        predict: Callable[[List[str]], List[Dict]],
+        max_wait: float = 0.01,
+        max_texts: int = POOL_SIZE,
+    ):
+        self.predict = predict
+        self.max_wait = max_wait
+        self.max_texts = max_texts
+        self.queue: "queue.Queue[Dict]" = queue.Queue()
+        self.stats = {"requests": 0, "batches": 0, "texts": 0}
+        self.stats_lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, texts: List[str]) -> List[Dict]:
+        request = {"texts": texts, "done": threading.Event()}
+        self.queue.put(request)
+        request["done"].wait()
+        if "error" in request:
+            raise RuntimeError(request["error"])
+        return request["result"]
+
+    def _collect(self) -> List[Dict]:
+        """Waits for a request, then gathers more until the deadline or `max_texts`."""
+        pending = [self.queue.get()]
+        n_texts = len(pending[0]["texts"])
+        deadline = time.monotonic() + self.max_wait
+        while n_texts < self.max_texts:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(request)
+            n_texts += len(request["texts"])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            texts = [text for request in pending for text in request["texts"]]
+            try:
+                results = self.predict(texts) if texts else []
+            except Exception as e:
+                for request in pending:
+                    request["error"] = str(e)
+            else:
+                # Scatter back to the requests
+                start = 0
+                for request in pending:
+                    request["result"] = results[start : start + len(request["texts"])]
+                    start += len(request["texts"])
+            with self.stats_lock:
+                self.stats["requests"] += len(pending)
+                self.stats["batches"] += 1
+                self.stats["texts"] += len(texts)
+            for request in pending:
+                request["done"].set()
+
+
+def make_handler(batcher: DynamicBatcher, model_info: Dict):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload: Dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.rstrip("/")
+            if path == "/model":
+                self._send(200, model_info)
+            elif path == "/stats":
+                with batcher.stats_lock:
+                    self._send(200, dict(batcher.stats))
+            else:
+                self._send(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/score":
+                self._send(404, {"error": f"Unknown path {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                texts = json.loads(self.rfile.read(length))["texts"]
+                if not isinstance(texts, list) or not all(
+                    isinstance(t, str) for t in texts
+                ):
+                    raise ValueError("texts must be a list of strings")
+            except Exception as e:
+                self._send(400, {"error": f"Bad request: {e}"})
+                return
+            try:
+                self._send(200, {"sentiments": batcher.submit(texts)})
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+
+    return Handler
+
+
+def serve(
+    host="127.0.0.1",
+    port=8765,
+    max_wait=0.01,
+    max_texts=POOL_SIZE,
+    batch_size=64,
+    token_budget=TOKEN_BUDGET,
+    backend="torch",
+):
+    """
+    Loads the model and starts the service in a daemon thread. Returns
+    (server, base_url).
+    """
+    tokenizer, model, device = load_sentiment_model(backend)
+    batcher = DynamicBatcher(
+        lambda texts: predict_sentiment(
+            texts, tokenizer, model, device, batch_size, token_budget
+        ),
+        max_wait=max_wait,
+        max_texts=max_texts,
+    )
+    server = ThreadingHTTPServer(
+        (host, port), make_handler(batcher, model_fingerprint(model))
+    )
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+class SentimentClient:
+    """Client of a running sentiment service; `score` has the same results as `predict_sentiment`."""
+
+    def __init__(self, url: str, timeout: Optional[float] = 600):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path: str, payload: Optional[Dict] = None) -> Dict:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(
+            f"{self.url}/{path}",
+            data=data,
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def model_fingerprint(self) -> Dict:
+        return self._request("model")
+
+    def score(self, texts: List[str]) -> List[Dict]:
+        results: List[Dict] = []
+        for start in range(0, len(texts), REQUEST_SIZE):
+            results.extend(
+                self._request(
+                    "score", {"texts": list(texts[start : start + REQUEST_SIZE])}
+                )["sentiments"]
+            )
+        return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Serve the sentiment model over localhost HTTP"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        default=0.01,
+        help="Seconds to wait for more requests before scoring a batch (default: 0.01)",
+    )
+    parser.add_argument(
+        "--max-texts",
+        type=int,
+        default=POOL_SIZE,
+        help=f"Score a batch as soon as this many texts are pending (default: {POOL_SIZE})",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=64,
+        help="Maximum texts per model call (default: 64)",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=TOKEN_BUDGET,
+        help=f"Padded tokens per model call (default: {TOKEN_BUDGET})",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="torch",
+        help="Inference backend (default: torch)",
+    )
+    args = parser.parse_args()
+
+    server, url = serve(
+        args.host,
+        args.port,
+        args.max_wait,
+        args.max_texts,
+        args.batch_size,
+        args.token_budget,
+        args.backend,
+    )
+    print(f"Sentiment service listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
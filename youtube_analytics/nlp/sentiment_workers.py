@@ -0,0 +1,146 @@
+"""
+Multi-process sentiment inference for many-core CPU machines.
+
+One PyTorch process leaves most cores of a large box idle, because intra-op
+threading stops scaling after a few threads for a model this size. A
+`ShardedPredictor` starts `workers` processes, each with its own copy of the
+model and `threads` intra-op threads. Each pool of texts to score is split into
+length-sorted shards, which the workers take from a shared queue. Results are
+scattered back into input order.
+
+    python -m youtube_analytics.nlp.sentiment <channel_id> --workers 8 --threads 4
+"""
+
+import math
+import multiprocessing
+import os
+from typing import Dict, List, Optional
+
+from youtube_analytics.nlp.sentiment import (
+    TOKEN_BUDGET,
+    load_sentiment_model,
+    model_fingerprint,
+    predict_sentiment,
+)
+
+# Shards per worker in each pool of texts, so fast workers pick up more of them
+SHARDS_PER_WORKER = 4
+MIN_SHARD_SIZE = 64
+
+# (tokenizer, model, device, batch_size, token_budget) of this worker process
+_worker = {}
+
+
+def default_threads(workers: int) -> int:
+    """Intra-op threads per worker that use every core once."""
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _init_worker(threads, batch_size, token_budget, backend):
+    try:
+        if backend == "onnx":
+            from youtube_analytics.nlp.sentiment_onnx import load_onnx_model
+
+            tokenizer, model, device = load_onnx_model(threads=threads)
+        else:
+            import torch
+
+            torch.set_num_threads(threads)
+            tokenizer, model, device = load_sentiment_model()
+    except Exception as e:
+        # A failing initializer makes the pool respawn workers forever; report
+        # the error through this worker's tasks instead
+        _worker["error"] = e
+        return
+    _worker.update(
+        tokenizer=tokenizer,
+        model=model,
+        device=device,
+        batch_size=batch_size,
+        token_budget=token_budget,
+    )
+
+
+def _check_worker() -> None:
+    # Every task checks: any worker may be the one whose initializer failed
+    if "error" in _worker:
+        raise _worker["error"]
+
+
+def _worker_fingerprint(_=None) -> Dict:
+    _check_worker()
+    return model_fingerprint(_worker["model"])
+
+
+def _score_shard(shard):
+    _check_worker()
+    shard_id, texts = shard
+    return shard_id, predict_sentiment(
+        texts,
+        _worker["tokenizer"],
+        _worker["model"],
+        _worker["device"],
+        _worker["batch_size"],
+        _worker["token_budget"],
+    )
+
+
+class ShardedPredictor:
+    """
+    Scores texts on a pool of worker processes, each with its own model.
+    Call it like `predict_sentiment` bound to a model: texts -> sentiments.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        threads: Optional[int] = None,
+        batch_size: int = 64,
+        token_budget: Optional[int] = TOKEN_BUDGET,
+        backend: str = "torch",
+    ):
+        self.workers = workers
+        self.threads = threads or default_threads(workers)
+        # spawn: forking a process that already runs torch threads can deadlock
+        context = multiprocessing.get_context("spawn")
+        self.pool = context.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(self.threads, batch_size, token_budget, backend),
+        )
+        try:
+            self.fingerprint = self.pool.apply(_worker_fingerprint)
+        except Exception:
+            self.pool.terminate()
+            raise
+
+    def __call__(self, texts: List[str]) -> List[Dict]:
+        if not texts:
+            return []
+        # Length-sorted shards keep the workers' batches evenly padded
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        shard_size = max(
+            MIN_SHARD_SIZE,
+            math.ceil(len(texts) / (self.workers * SHARDS_PER_WORKER)),
+        )
+        shards = [
+            order[start : start + shard_size]
+            for start in range(0, len(order), shard_size)
+        ]
+
+        results = [None] * len(texts)
+        tasks = [(n, [texts[i] for i in shard]) for n, shard in enumerate(shards)]
+        for shard_id, sentiments in self.pool.imap_unordered(_score_shard, tasks):
+            for i, sentiment in zip(shards[shard_id], sentiments):
+                results[i] = sentiment
+        return results
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,480 @@
+"""
+Single-pass analysis pipeline.
+
+Runs the per-video analysis stages over a channel in one pass: each video is
+read once (the merged view, see `annotations.load_video`), streamed through
+every requested stage in memory, and each stage's results are then appended to
+its annotation sidecar. Stages skip the videos and comments whose input
+fingerprints match the last run (`--force` recomputes them). The channel rollup into `channel_metadata.json` runs
+once at the end. Requested stages pull in the stages they depend on.
+
+    python -m youtube_analytics.pipeline <channel_id> --stages engagement weighted
+"""
+
+import argparse
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from tqdm import tqdm
+
+from youtube_analytics.analytics.engagement_metrics import (
+    analyze_channel_engagement,
+    engagement_fingerprint,
+    video_engagement_metrics,
+    video_summary,
+    write_channel_engagement,
+)
+from youtube_analytics.analytics.weighted_metrics import (
+    calculate_weighted_metrics,
+    compute_video_weighted_metrics,
+    weighted_fingerprint,
+)
+from youtube_analytics.data.annotations import (
+    commit,
+    dirty_comments,
+    load_video,
+    video_is_current,
+)
+from youtube_analytics.data.comment_store import has_store
+from youtube_analytics.data.video_io import list_video_ids
+from youtube_analytics.nlp.sentiment_cache import DEFAULT_CACHE_DIR
+
+# stage -> stages it needs. "rollup" aggregates the channel once all videos are done
+DEPENDENCIES = {
+    "engagement": (),
+    "sentiment": (),
+    "weighted": ("sentiment",),
+    "flags": (),
+    "rollup": ("engagement",),
+}
+DEFAULT_STAGES = ("engagement", "sentiment", "weighted", "rollup")
+
+# (arguments of the sidecar commit, or None when there is nothing to write,
+#  units skipped because their inputs did not change, units seen)
+StageResult = Tuple[Optional[Dict], int, int]
+# what a stage counts in its skip report
+STAGE_UNITS = {
+    "engagement": "videos",
+    "sentiment": "comments",
+    "weighted": "videos",
+    "flags": "comments",
+}
+
+
+def resolve_stages(stages: Iterable[str]) -> List[str]:
+    """`stages` plus everything they depend on, in the order they must run."""
+    ordered: List[str] = []
+
+    def visit(stage, path=()):
+        if stage not in DEPENDENCIES:
+            raise ValueError(
+                f"Unknown stage {stage!r}, expected one of {list(DEPENDENCIES)}"
+            )
+        if stage in path:
+            raise ValueError(f"Dependency cycle: {' -> '.join(path + (stage,))}")
+        for dep in DEPENDENCIES[stage]:
+            visit(dep, path + (stage,))
+        if stage not in ordered:
+            ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+def _engagement_stage(
+    channel_dir: str, video_id: str, video_data: Dict, options: Dict
+) -> StageResult:
+    fingerprint = engagement_fingerprint(video_data)
+    if (
+        not options["force"]
+        and "engagement_metrics" in video_data
+        and video_is_current(channel_dir, "engagement", video_id, fingerprint)
+    ):
+        return None, 1, 1
+    video_data["engagement_metrics"] = video_engagement_metrics(video_data)
+    commit_args = {
+        "video": {"engagement_metrics": video_data["engagement_metrics"]},
+        "inputs": {"video": fingerprint},
+    }
+    return commit_args, 0, 1
+
+
+def _sentiment_stage(
+    channel_dir: str, video_id: str, video_data: Dict, options: Dict
+) -> StageResult:
+    comments = video_data.get("comments") or []
+    fingerprints = {
+        c["comment_id"]: options["sentiment"].fingerprint(c["comment"])
+        for c in comments
+    }
+    if not options["force"]:
+        dirty = dirty_comments(channel_dir, "sentiment", video_id, fingerprints)
+        comments = [c for c in comments if c["comment_id"] in dirty]
+    skipped = len(fingerprints) - len(comments)
+    if not comments:
+        return None, skipped, len(fingerprints)
+    sentiments = options["sentiment"].score([c["comment"] for c in comments])
+    for comment, sentiment in zip(comments, sentiments):
+        comment["sentiment"] = sentiment
+    commit_args = {
+        "comments": {c["comment_id"]: {"sentiment": c["sentiment"]} for c in comments},
+        "inputs": {
+            "comments": {
+                c["comment_id"]: fingerprints[c["comment_id"]] for c in comments
+            }
+        },
+    }
+    return commit_args, skipped, len(fingerprints)
+
+
+def _weighted_stage(
+    channel_dir: str, video_id: str, video_data: Dict, options: Dict
+) -> StageResult:
+    comments = video_data.get("comments") or []
+    if not comments:
+        return None, 0, 0
+    # Sees the sentiment computed by the sentiment stage of this same pass
+    fingerprint = weighted_fingerprint(
+        comments, options["like_weight"], options["reply_weight"]
+    )
+    if (
+        not options["force"]
+        and all(c.get("weight") is not None for c in comments)
+        and video_is_current(channel_dir, "weighted", video_id, fingerprint)
+    ):
+        return None, 1, 1
+    video_metrics = compute_video_weighted_metrics(
+        comments, options["like_weight"], options["reply_weight"]
+    )
+    video_data["weighted_metrics"] = {
+        **video_data.get("weighted_metrics", {}),
+        **video_metrics,
+    }
+    commit_args = {
+        "video": {"weighted_metrics": video_data["weighted_metrics"]},
+        "comments": {c["comment_id"]: {"weight": c["weight"]} for c in comments},
+        "inputs": {"video": fingerprint},
+    }
+    return commit_args, 0, 1
+
+
+def _flags_stage(
+    channel_dir: str, video_id: str, video_data: Dict, options: Dict
+) -> StageResult:
+    from youtube_analytics.nlp.comment_flags import flag_context
+
+    comments = video_data.get("comments") or []
+    # Shared by all comments of the video, and tokenized once per batch
+    context = flag_context(
+        video_data.get("title", ""), video_data.get("description", "")
+    )
+    fingerprints = {
+        c["comment_id"]: options["flags"].fingerprint(context, c["comment"])
+        for c in comments
+    }
+    if not options["force"]:
+        dirty = dirty_comments(channel_dir, "flags", video_id, fingerprints)
+        comments = [c for c in comments if c["comment_id"] in dirty]
+    skipped = len(fingerprints) - len(comments)
+    if not comments:
+        return None, skipped, len(fingerprints)
+    results = options["flags"].score([(context, c["comment"]) for c in comments])
+    for comment, result in zip(comments, results):
+        comment.update(result)
+    commit_args = {
+        "comments": {c["comment_id"]: result for c, result in zip(comments, results)},
+        "inputs": {
+            "comments": {
+                c["comment_id"]: fingerprints[c["comment_id"]] for c in comments
+            }
+        },
+    }
+    return commit_args, skipped, len(fingerprints)
+
+
+VIDEO_STAGES: Dict[str, Callable[[str, str, Dict, Dict], StageResult]] = {
+    "engagement": _engagement_stage,
+    "sentiment": _sentiment_stage,
+    "weighted": _weighted_stage,
+    "flags": _flags_stage,
+}
+
+
+def _load_sentiment(options: Dict) -> None:
+    # torch and transformers are only imported when the sentiment stage runs
+    from youtube_analytics.nlp.sentiment import SentimentScorer
+
+    options["sentiment"] = SentimentScorer(
+        options["batch_size"],
+        service_url=options["sentiment_service"],
+        backend=options["sentiment_backend"],
+        cache_dir=options["sentiment_cache"],
+        cascade=options["sentiment_cascade"],
+    )
+
+
+def _load_flags(options: Dict) -> None:
+    from youtube_analytics.nlp.comment_flags import MODEL_DIR, FlagClassifier
+
+    options["flags"] = FlagClassifier(options["flag_model"] or MODEL_DIR)
+
+
+def _run_per_stage(
+    channel_id: str, data_root: str, stages: List[str], options: Dict
+) -> Dict[str, float]:
+    """Columnar-store channels: run the standalone stages one after another."""
+    from youtube_analytics.nlp.comment_flags import MODEL_DIR, tag_channel_flags
+    from youtube_analytics.nlp.sentiment import analyze_channel_sentiment
+
+    runners = {
+        "engagement": lambda: analyze_channel_engagement(
+            channel_id, data_root, force=options["force"]
+        ),
+        "sentiment": lambda: analyze_channel_sentiment(
+            channel_id,
+            data_root,
+            options["batch_size"],
+            force=options["force"],
+            service_url=options["sentiment_service"],
+            backend=options["sentiment_backend"],
+            cache_dir=options["sentiment_cache"],
+            cascade=options["sentiment_cascade"],
+        ),
+        "weighted": lambda: calculate_weighted_metrics(
+            channel_id,
+            data_root,
+            options["like_weight"],
+            options["reply_weight"],
+            force=options["force"],
+        ),
+        "flags": lambda: tag_channel_flags(
+            channel_id,
+            data_root,
+            options["flag_model"] or MODEL_DIR,
+            force=options["force"],
+        ),
+        "rollup": lambda: None,  # written by analyze_channel_engagement
+    }
+    timings: Dict[str, float] = {}
+    for stage in stages:
+        start = time.perf_counter()
+        runners[stage]()
+        timings[stage] = time.perf_counter() - start
+    return timings
+
+
+def run_pipeline(
+    channel_id: str,
+    data_root: str = "data",
+    stages: Iterable[str] = DEFAULT_STAGES,
+    batch_size: int = 64,
+    like_weight: float = 1.0,
+    reply_weight: float = 1.5,
+    force: bool = False,
+    sentiment_service: Optional[str] = None,
+    sentiment_backend: str = "torch",
+    sentiment_cache: Optional[str] = DEFAULT_CACHE_DIR,
+    sentiment_cascade: bool = False,
+    flag_model: Optional[str] = None,
+) -> Optional[Dict[str, float]]:
+    """
+    Runs `stages` (and their dependencies) over a channel with one read per
+    video. Videos and comments whose inputs did not change since the last run
+    are skipped unless `force`. Returns the seconds spent per stage, plus
+    "read" and "write". With `sentiment_service` (a URL) comments are scored by
+    a running sentiment service instead of a model loaded here, and
+    `sentiment_backend="onnx"` scores with the exported INT8 ONNX model.
+    Comment texts scored before are taken from the sentiment cache in
+    `sentiment_cache` (None turns it off), and `sentiment_cascade` lets the
+    linear model of nlp/sentiment_cascade.py score short comments first.
+    The "flags" stage tags comments with the fine-tuned classifier in
+    `flag_model` (default: nlp/comment_flags.py's MODEL_DIR).
+    """
+    channel_dir = os.path.join(data_root, channel_id)
+    if not os.path.exists(channel_dir):
+        print(f"Channel directory not found: {channel_dir}")
+        return None
+
+    stages = resolve_stages(stages)
+    options = {
+        "batch_size": batch_size,
+        "like_weight": like_weight,
+        "reply_weight": reply_weight,
+        "force": force,
+        "sentiment_service": sentiment_service,
+        "sentiment_backend": sentiment_backend,
+        "sentiment_cache": sentiment_cache,
+        "sentiment_cascade": sentiment_cascade,
+        "flag_model": flag_model,
+    }
+    print(f"Running stages: {', '.join(stages)}")
+
+    if has_store(channel_dir):
+        timings = _run_per_stage(channel_id, data_root, stages, options)
+        _print_timings(timings)
+        return timings
+
+    video_stages = [stage for stage in stages if stage in VIDEO_STAGES]
+    channel_stages = [stage for stage in stages if stage not in VIDEO_STAGES]
+    timings = {
+        stage: 0.0 for stage in ["read"] + video_stages + ["write"] + channel_stages
+    }
+    if "sentiment" in stages:
+        start = time.perf_counter()
+        _load_sentiment(options)
+        timings["sentiment"] += time.perf_counter() - start
+    if "flags" in stages:
+        start = time.perf_counter()
+        _load_flags(options)
+        timings["flags"] += time.perf_counter() - start
+
+    per_video_summaries: List[Dict] = []
+    # stage -> [units skipped, units seen]
+    skipped = {stage: [0, 0] for stage in video_stages}
+
+    for video_id in tqdm(list_video_ids(channel_dir), desc=f"Processing {channel_id}"):
+        try:
+            start = time.perf_counter()
+            video_data = load_video(channel_dir, video_id)
+            timings["read"] += time.perf_counter() - start
+
+            # Later stages see the in-memory results of earlier ones
+            commits: Dict[str, Dict] = {}
+            for stage in video_stages:
+                start = time.perf_counter()
+                commit_args, n_skipped, n_seen = VIDEO_STAGES[stage](
+                    channel_dir, video_id, video_data, options
+                )
+                timings[stage] += time.perf_counter() - start
+                skipped[stage][0] += n_skipped
+                skipped[stage][1] += n_seen
+                if commit_args:
+                    commits[stage] = commit_args
+
+            start = time.perf_counter()
+            for stage, commit_args in commits.items():
+                commit(channel_dir, stage, video_id, **commit_args)
+            timings["write"] += time.perf_counter() - start
+
+            if "rollup" in stages:
+                per_video_summaries.append(video_summary(video_id, video_data))
+
+        except Exception as e:
+            print(f"Error processing {video_id}: {e}")
+
+    if "sentiment" in options:
+        options["sentiment"].close()
+    if "flags" in options:
+        options["flags"].report()
+
+    if "rollup" in stages:
+        start = time.perf_counter()
+        write_channel_engagement(channel_dir, per_video_summaries)
+        timings["rollup"] += time.perf_counter() - start
+
+    for stage, (n_skipped, n_seen) in skipped.items():
+        if n_skipped:
+            print(
+                f"{stage}: skipped {n_skipped} of {n_seen} {STAGE_UNITS[stage]} with unchanged inputs"
+            )
+    _print_timings(timings)
+    return timings
+
+
+def _print_timings(timings: Dict[str, float]) -> None:
+    total = sum(timings.values())
+    print(f"{'stage':<12} {'seconds':>9} {'share':>7}")
+    for stage, seconds in timings.items():
+        share = seconds / total if total else 0.0
+        print(f"{stage:<12} {seconds:>9.2f} {share:>7.1%}")
+    print(f"{'total':<12} {total:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run engagement, sentiment and weighted metrics in a single pass"
+    )
+    parser.add_argument(
+        "channel_id", help="The YouTube channel ID (folder name) to analyze"
+    )
+    parser.add_argument(
+        "--data-root",
+        default="data",
+        help="Root directory for data files (default: data)",
+    )
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=list(DEPENDENCIES),
+        default=list(DEFAULT_STAGES),
+        help=f"Stages to run; their dependencies are added (default: {' '.join(DEFAULT_STAGES)})",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=64,
+        help="Batch size for sentiment inference (default: 64)",
+    )
+    parser.add_argument(
+        "--like-weight",
+        type=float,
+        default=1.0,
+        help="Scaling coefficient for like count",
+    )
+    parser.add_argument(
+        "--reply-weight",
+        type=float,
+        default=1.5,
+        help="Scaling coefficient for reply count",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Recompute videos and comments whose inputs did not change",
+    )
+    parser.add_argument(
+        "--sentiment-service",
+        default=None,
+        help="URL of a running sentiment service to score with, e.g. http://127.0.0.1:8765/",
+    )
+
+    parser.add_argument(
+        "--sentiment-backend",
+        choices=["torch", "onnx"],
+        default="torch",
+        help="Inference backend for the sentiment stage (default: torch)",
+    )
+    parser.add_argument(
+        "--no-sentiment-cache",
+        action="store_true",
+        help="Score every comment with the model, without the sentiment cache",
+    )
+    parser.add_argument(
+        "--sentiment-cascade",
+        action="store_true",
+        help="Let a linear model score short comments it is sure about before the transformer",
+    )
+    parser.add_argument(
+        "--flag-model",
+        default=None,
+        help="Fine-tuned comment-flag model for the flags stage",
+    )
+
+    args = parser.parse_args()
+
+    run_pipeline(
+        channel_id=args.channel_id,
+        data_root=args.data_root,
+        stages=args.stages,
+        batch_size=args.batch_size,
+        like_weight=args.like_weight,
+        reply_weight=args.reply_weight,
+        force=args.force,
+        sentiment_service=args.sentiment_service,
+        sentiment_backend=args.sentiment_backend,
+        sentiment_cache=None if args.no_sentiment_cache else DEFAULT_CACHE_DIR,
+        sentiment_cascade=args.sentiment_cascade,
+        flag_model=args.flag_model,
+    )